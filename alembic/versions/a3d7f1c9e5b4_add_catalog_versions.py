@@ -0,0 +1,50 @@
+"""add catalog versions and product tombstones
+
+Revision ID: a3d7f1c9e5b4
+Revises: f5c1a7e3b9d2
+Create Date: 2026-10-19 15:06:41.208317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d7f1c9e5b4'
+down_revision: Union[str, Sequence[str], None] = 'f5c1a7e3b9d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('catalog_versions',
+    sa.Column('organization_id', sa.String(length=36), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('organization_id')
+    )
+    op.create_table('product_tombstones',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('organization_id', sa.String(length=36), nullable=False),
+    sa.Column('barcode', sa.String(length=100), nullable=True),
+    sa.Column('catalog_version', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_index('ix_product_tombstones_organization_id_catalog_version', 'product_tombstones', ['organization_id', 'catalog_version'], unique=False)
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('catalog_version', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index('ix_products_organization_id_catalog_version', ['organization_id', 'catalog_version'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('ix_products_organization_id_catalog_version')
+        batch_op.drop_column('catalog_version')
+    op.drop_index('ix_product_tombstones_organization_id_catalog_version', table_name='product_tombstones')
+    op.drop_table('product_tombstones')
+    op.drop_table('catalog_versions')
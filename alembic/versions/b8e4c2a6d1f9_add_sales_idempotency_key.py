@@ -0,0 +1,32 @@
+"""add sales idempotency key
+
+Revision ID: b8e4c2a6d1f9
+Revises: a3d7f1c9e5b4
+Create Date: 2026-10-19 16:12:27.540186
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e4c2a6d1f9'
+down_revision: Union[str, Sequence[str], None] = 'a3d7f1c9e5b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('sales', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('idempotency_key', sa.String(length=64), nullable=True))
+        batch_op.create_index('uq_sales_organization_id_idempotency_key', ['organization_id', 'idempotency_key'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('sales', schema=None) as batch_op:
+        batch_op.drop_index('uq_sales_organization_id_idempotency_key')
+        batch_op.drop_column('idempotency_key')
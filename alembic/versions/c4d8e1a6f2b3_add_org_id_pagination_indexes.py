@@ -0,0 +1,32 @@
+"""add organization_id/id indexes for keyset pagination
+
+Revision ID: c4d8e1a6f2b3
+Revises: b7e2d4f8a9c1
+Create Date: 2026-10-19 11:12:40.511873
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d8e1a6f2b3'
+down_revision: Union[str, Sequence[str], None] = 'b7e2d4f8a9c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('products', 'customers', 'purchases', 'sales', 'payments', 'cashier_shifts')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        op.create_index(f'ix_{table}_organization_id_id', table, ['organization_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_organization_id_id', table_name=table)
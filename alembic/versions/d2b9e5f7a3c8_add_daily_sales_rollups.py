@@ -0,0 +1,59 @@
+"""add daily sales rollups
+
+Revision ID: d2b9e5f7a3c8
+Revises: c6f2a8d4e1b7
+Create Date: 2026-10-19 17:48:10.392745
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2b9e5f7a3c8'
+down_revision: Union[str, Sequence[str], None] = 'c6f2a8d4e1b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('daily_product_sales',
+    sa.Column('organization_id', sa.String(length=36), nullable=False),
+    sa.Column('outlet_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('cost', sa.Float(), nullable=False),
+    sa.Column('discount', sa.Float(), nullable=False),
+    sa.Column('tax', sa.Float(), nullable=False),
+    sa.Column('sale_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('organization_id', 'outlet_id', 'day', 'product_id')
+    )
+    op.create_index('ix_daily_product_sales_organization_id_day', 'daily_product_sales', ['organization_id', 'day'], unique=False)
+    op.create_table('daily_cashier_sales',
+    sa.Column('organization_id', sa.String(length=36), nullable=False),
+    sa.Column('outlet_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('cashier_station_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('cost', sa.Float(), nullable=False),
+    sa.Column('discount', sa.Float(), nullable=False),
+    sa.Column('tax', sa.Float(), nullable=False),
+    sa.Column('sale_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('organization_id', 'outlet_id', 'day', 'user_id', 'cashier_station_id')
+    )
+    op.create_index('ix_daily_cashier_sales_organization_id_day', 'daily_cashier_sales', ['organization_id', 'day'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_daily_cashier_sales_organization_id_day', table_name='daily_cashier_sales')
+    op.drop_table('daily_cashier_sales')
+    op.drop_index('ix_daily_product_sales_organization_id_day', table_name='daily_product_sales')
+    op.drop_table('daily_product_sales')
@@ -0,0 +1,42 @@
+"""add product full-text search index
+
+Revision ID: d9a3f5b7c2e1
+Revises: c4d8e1a6f2b3
+Create Date: 2026-10-19 12:03:51.274016
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.product_search import POSTGRES_DDL, SQLITE_DDL, SQLITE_REBUILD
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9a3f5b7c2e1'
+down_revision: Union[str, Sequence[str], None] = 'c4d8e1a6f2b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        for statement in POSTGRES_DDL:
+            op.execute(statement)
+    else:
+        for statement in SQLITE_DDL:
+            op.execute(statement)
+        op.execute(SQLITE_REBUILD)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_products_search_vector")
+        op.execute("ALTER TABLE products DROP COLUMN IF EXISTS search_vector")
+    else:
+        for trigger in ('products_fts_ai', 'products_fts_ad', 'products_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS products_fts")
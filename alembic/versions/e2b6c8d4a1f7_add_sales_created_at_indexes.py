@@ -0,0 +1,30 @@
+"""add sales created_at indexes
+
+Revision ID: e2b6c8d4a1f7
+Revises: d9a3f5b7c2e1
+Create Date: 2026-10-19 13:40:22.918305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b6c8d4a1f7'
+down_revision: Union[str, Sequence[str], None] = 'd9a3f5b7c2e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_sales_organization_id_created_at', 'sales', ['organization_id', 'created_at'], unique=False)
+    op.create_index('ix_sales_organization_id_outlet_id_created_at', 'sales', ['organization_id', 'outlet_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sales_organization_id_outlet_id_created_at', table_name='sales')
+    op.drop_index('ix_sales_organization_id_created_at', table_name='sales')
@@ -0,0 +1,28 @@
+"""add sale_items sale_id index
+
+Revision ID: e7c3a9f1b5d2
+Revises: d2b9e5f7a3c8
+Create Date: 2026-10-19 18:31:05.118462
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7c3a9f1b5d2'
+down_revision: Union[str, Sequence[str], None] = 'd2b9e5f7a3c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_sale_items_sale_id'), 'sale_items', ['sale_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_sale_items_sale_id'), table_name='sale_items')
@@ -0,0 +1,30 @@
+"""add products low-stock partial index
+
+Revision ID: f5c1a7e3b9d2
+Revises: e2b6c8d4a1f7
+Create Date: 2026-10-19 14:22:08.663912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5c1a7e3b9d2'
+down_revision: Union[str, Sequence[str], None] = 'e2b6c8d4a1f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_products_low_stock', 'products', ['organization_id'], unique=False,
+                    sqlite_where=sa.text('stock_quantity <= reorder_level'),
+                    postgresql_where=sa.text('stock_quantity <= reorder_level'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_low_stock', table_name='products')
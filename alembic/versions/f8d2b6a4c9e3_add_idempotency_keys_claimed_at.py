@@ -0,0 +1,30 @@
+"""add idempotency_keys claimed_at
+
+Revision ID: f8d2b6a4c9e3
+Revises: e7c3a9f1b5d2
+Create Date: 2026-10-19 21:14:37.402856
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8d2b6a4c9e3'
+down_revision: Union[str, Sequence[str], None] = 'e7c3a9f1b5d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('idempotency_keys') as batch_op:
+        batch_op.add_column(sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('idempotency_keys') as batch_op:
+        batch_op.drop_column('claimed_at')
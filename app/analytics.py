@@ -0,0 +1,139 @@
+"""Product performance analysis: ABC classes, velocity, days of cover, sell-through.
+
+Every product of the organization is read once with a Core select (left-joined
+to its units and revenue for the period, summed from the daily product
+rollups) and streamed with ``fetchmany`` into NumPy columns. The analysis is
+then a handful of vectorized operations over thousands of SKUs instead of a
+Python loop over ORM objects:
+
+* ABC: products sorted by revenue; A until the revenue before a product reaches
+  ``a_share`` of the total, B until ``b_share``, the rest (and unsold products) C
+* velocity: units sold per day of the period
+* days of cover: current stock divided by velocity (None when nothing sold)
+* sell-through: units sold / (units sold + current stock)
+"""
+import math
+import os
+from datetime import date
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+ANALYTICS_BATCH_SIZE = int(os.environ.get("ANALYTICS_BATCH_SIZE", "10000"))
+
+_COLUMNS = {
+    "product_id": np.int64,
+    "name": object,
+    "category_id": np.int64,
+    "stock_quantity": np.float64,
+    "quantity": np.float64,
+    "revenue": np.float64,
+}
+
+
+def _fetch_columns(result) -> Dict[str, np.ndarray]:
+    """Drain `result` in batches of ANALYTICS_BATCH_SIZE rows into one array per column."""
+    chunks = {name: [] for name in _COLUMNS}
+    while True:
+        rows = result.fetchmany(ANALYTICS_BATCH_SIZE)
+        if not rows:
+            break
+        for (name, dtype), values in zip(_COLUMNS.items(), zip(*rows)):
+            chunks[name].append(np.array(values, dtype=dtype))
+    return {
+        name: np.concatenate(parts) if parts else np.empty(0, dtype=_COLUMNS[name])
+        for name, parts in chunks.items()
+    }
+
+
+def _product_columns(db: Session, organization_id: str, date_from: date, date_to: date,
+                     outlet_id: Optional[int], category_id: Optional[int]) -> Dict[str, np.ndarray]:
+    rollup = models.DailyProductSales
+    criteria = [rollup.organization_id == organization_id, rollup.day >= date_from, rollup.day <= date_to]
+    if outlet_id is not None:
+        criteria.append(rollup.outlet_id == outlet_id)
+    sold = (
+        select(rollup.product_id, func.sum(rollup.quantity).label("quantity"), func.sum(rollup.revenue).label("revenue"))
+        .where(*criteria).group_by(rollup.product_id).subquery()
+    )
+    product = models.Product
+    statement = (
+        select(
+            product.id,
+            product.name,
+            func.coalesce(product.category_id, 0),
+            func.coalesce(product.stock_quantity, 0),
+            func.coalesce(sold.c.quantity, 0),
+            func.coalesce(sold.c.revenue, 0),
+        )
+        .outerjoin(sold, sold.c.product_id == product.id)
+        .where(product.organization_id == organization_id)
+    )
+    if category_id is not None:
+        statement = statement.where(product.category_id == category_id)
+    result = db.execute(statement, execution_options={"stream_results": True})
+    try:
+        return _fetch_columns(result)
+    finally:
+        result.close()
+
+
+def product_abc_analysis(db: Session, organization_id: str, date_from: date, date_to: date,
+                         outlet_id: Optional[int] = None, category_id: Optional[int] = None,
+                         a_share: float = 0.8, b_share: float = 0.95) -> dict:
+    """ABC class, velocity, days of cover and sell-through of every product, by revenue descending."""
+    columns = _product_columns(db, organization_id, date_from, date_to, outlet_id, category_id)
+    days = (date_to - date_from).days + 1
+
+    order = np.argsort(-columns["revenue"], kind="stable")
+    columns = {name: values[order] for name, values in columns.items()}
+    revenue = columns["revenue"]
+    quantity = columns["quantity"]
+    stock = np.maximum(columns["stock_quantity"], 0)
+
+    total_revenue = float(revenue.sum())
+    share = revenue / total_revenue if total_revenue > 0 else np.zeros_like(revenue)
+    cumulative_share = np.cumsum(share)
+    share_before = cumulative_share - share
+    abc_class = np.where(
+        revenue <= 0, "C",
+        np.where(share_before < a_share, "A", np.where(share_before < b_share, "B", "C")),
+    )
+    velocity = quantity / days
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_of_cover = np.where(velocity > 0, stock / velocity, np.nan)
+        sell_through = np.where(quantity + stock > 0, quantity / (quantity + stock), 0.0)
+
+    classes, counts = np.unique(abc_class, return_counts=True)
+    products = [
+        {
+            "product_id": product_id,
+            "name": name,
+            "category_id": category or None,
+            "quantity": units,
+            "revenue": product_revenue,
+            "revenue_share": product_share,
+            "cumulative_share": cumulative,
+            "abc_class": product_class,
+            "velocity": product_velocity,
+            "stock_quantity": product_stock,
+            "days_of_cover": None if math.isnan(cover) else cover,
+            "sell_through": product_sell_through,
+        }
+        for product_id, name, category, units, product_revenue, product_share, cumulative, product_class,
+            product_velocity, product_stock, cover, product_sell_through in zip(
+            columns["product_id"].tolist(), columns["name"].tolist(), columns["category_id"].tolist(),
+            quantity.tolist(), revenue.tolist(), share.tolist(), cumulative_share.tolist(), abc_class.tolist(),
+            velocity.tolist(), columns["stock_quantity"].tolist(), days_of_cover.tolist(), sell_through.tolist(),
+        )
+    ]
+    return {
+        "days": days,
+        "total_revenue": total_revenue,
+        "class_counts": {"A": 0, "B": 0, "C": 0, **dict(zip(classes.tolist(), counts.tolist()))},
+        "products": products,
+    }
@@ -1,17 +1,25 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import NamedTuple, Optional
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
-import bcrypt
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
 from .database import SessionLocal
-from . import models
+from . import models, passwords
+from .token_revocation import is_revoked
 
 SECRET_KEY = "your-secret-key-here"  # Change this to a secure key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 3000
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.environ.get("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_MAX_SIZE = int(os.environ.get("PRINCIPAL_CACHE_MAX_SIZE", "1024"))
 
 
 security = HTTPBearer()
@@ -24,10 +32,13 @@ def get_db():
         db.close()
 
 def verify_password(plain_password, hashed_password):
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return passwords.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return passwords.hash_password(password)
+
+async def get_password_hash_async(password):
+    return await passwords.hash_password_async(password)
 
 def authenticate_user(db: Session, email: str, password: str):
     user = db.query(models.User).filter(models.User.email == email).first()
@@ -37,13 +48,55 @@ def authenticate_user(db: Session, email: str, password: str):
         return False
     return user
 
+def token_claims(user: models.User) -> dict:
+    """Signed claims that let requests be authorized without loading the user."""
+    return {
+        "sub": user.email,
+        "uid": user.id,
+        "org": user.organization_id,
+        "role": user.role,
+        "status": user.status,
+        "outlet": user.outlet_id,
+        "ver": user.token_version or 0,
+    }
+
+def _find_user_by_email(email: str) -> Optional[models.User]:
+    db = SessionLocal()
+    try:
+        return db.query(models.User).filter(models.User.email == email).first()
+    finally:
+        db.close()
+
+def _store_password_hash(user_id: int, hashed_password: str):
+    db = SessionLocal()
+    try:
+        db.query(models.User).filter(models.User.id == user_id).update({models.User.password: hashed_password})
+        db.commit()
+    finally:
+        db.close()
+
+async def authenticate_user_async(email: str, password: str):
+    """authenticate_user for async routes: bcrypt runs on the hashing pool, never the request threadpool.
+
+    Hashes made with a cost other than BCRYPT_ROUNDS are transparently upgraded.
+    """
+    user = await run_in_threadpool(_find_user_by_email, email)
+    if not user:
+        return False
+    if not await passwords.verify_async(password, user.password):
+        return False
+    if passwords.needs_rehash(user.password):
+        new_hash = await passwords.hash_password_async(password)
+        await run_in_threadpool(_store_password_hash, user.id, new_hash)
+    return user
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": str(uuid.uuid4())})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -53,35 +106,212 @@ def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire, "type": "refresh"})
+    to_encode.update({"exp": expire, "type": "refresh", "jti": str(uuid.uuid4())})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+class Principal(NamedTuple):
+    """Immutable, session-independent view of the authenticated user."""
+    id: int
+    email: str
+    organization_id: str
+    role: str
+    status: str
+    outlet_id: int
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            organization_id=user.organization_id,
+            role=user.role,
+            status=user.status,
+            outlet_id=user.outlet_id,
+        )
+
+
+class PrincipalCache:
+    """Thread-safe TTL + LRU cache of principals keyed by token subject (email)."""
+
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, subject: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic():
+                del self._entries[subject]
+                return None
+            self._entries.move_to_end(subject)
+            return principal
+
+    def put(self, subject: str, principal: Principal):
+        with self._lock:
+            self._entries[subject] = (time.monotonic() + self.ttl_seconds, principal)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, subject: str):
+        with self._lock:
+            self._entries.pop(subject, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_TTL_SECONDS, PRINCIPAL_CACHE_MAX_SIZE)
+
+
+class TokenVersions:
+    """In-process mirror of users.token_version, loaded lazily per user."""
+
+    _DELETED = -1
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def current(self, user_id: int) -> Optional[int]:
+        version = self._versions.get(user_id)
+        if version is None:
+            db = SessionLocal()
+            try:
+                row = db.query(models.User.token_version).filter(models.User.id == user_id).first()
+            finally:
+                db.close()
+            version = self._DELETED if row is None else (row[0] or 0)
+            with self._lock:
+                self._versions.setdefault(user_id, version)
+        return None if version == self._DELETED else version
+
+    def is_loaded(self, user_id: int) -> bool:
+        """True if current() can answer without a database query."""
+        return user_id in self._versions
+
+    def set(self, user_id: int, version: int):
+        with self._lock:
+            self._versions[user_id] = version
+
+    def forget(self, user_id: int):
+        with self._lock:
+            self._versions[user_id] = self._DELETED
+
+
+token_versions = TokenVersions()
+
+# Changing any of these makes previously issued claims stale
+TOKEN_VERSION_FIELDS = {"email", "role", "status", "outlet_id", "password"}
+
+
+def bump_token_version(user: models.User):
+    """Invalidate every token issued to `user`; takes effect once the session commits."""
+    user.token_version = (user.token_version or 0) + 1
+
+
+def publish_token_version(user: models.User):
+    """Propagate a committed token_version to the in-process mirror."""
+    token_versions.set(user.id, user.token_version or 0)
+
+
+def invalidate_principal(email: str):
+    """Drop a cached principal; call whenever the user's row changes or is deleted."""
+    principal_cache.invalidate(email)
+
+
+def load_principal(email: str) -> Optional[Principal]:
+    principal = principal_cache.get(email)
+    if principal is not None:
+        return principal
+    db = SessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.email == email).first()
+        if user is None:
+            return None
+        principal = Principal.from_user(user)
+    finally:
+        db.close()
+    principal_cache.put(email, principal)
+    return principal
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _access_token_payload(token: str) -> dict:
+    """Claims of a valid, unrevoked access token; needs no database."""
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        if payload.get("sub") is None or payload.get("type") == "refresh":
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
-    user = db.query(models.User).options(joinedload(models.User.outlet)).filter(models.User.email == email).first()
-    if user is None:
-        raise credentials_exception
-    return user
+        raise _credentials_exception()
+    if is_revoked(payload.get("jti")):
+        raise _credentials_exception()
+    return payload
 
-def get_current_active_user(current_user: models.User = Depends(get_current_user)):
+def _has_claims(payload: dict) -> bool:
+    return "ver" in payload and "uid" in payload
+
+def _payload_principal(payload: dict) -> Principal:
+    if _has_claims(payload):
+        # Fast path: authorize from signed claims, only checking the token is not stale
+        if token_versions.current(payload["uid"]) != payload["ver"]:
+            raise _credentials_exception()
+        return Principal(
+            id=payload["uid"],
+            email=payload["sub"],
+            organization_id=payload["org"],
+            role=payload["role"],
+            status=payload["status"],
+            outlet_id=payload["outlet"],
+        )
+    # Tokens issued before claims were embedded
+    principal = load_principal(payload["sub"])
+    if principal is None:
+        raise _credentials_exception()
+    return principal
+
+def authorize_token(token: str) -> Principal:
+    """Principal of a bearer access token; raises 401 if it is invalid, revoked or stale."""
+    return _payload_principal(_access_token_payload(token))
+
+async def authorize_token_async(token: str) -> Principal:
+    """authorize_token for async routes: stays on the event loop unless the database must be read."""
+    payload = _access_token_payload(token)
+    if _has_claims(payload) and token_versions.is_loaded(payload["uid"]):
+        return _payload_principal(payload)
+    return await run_in_threadpool(_payload_principal, payload)
+
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    return authorize_token(credentials.credentials)
+
+def check_active(current_user: Principal) -> Principal:
     if current_user.status != "active":
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+def get_current_active_user(current_user: Principal = Depends(get_current_user)) -> Principal:
+    return check_active(current_user)
+
+async def get_current_active_user_async(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    """get_current_active_user for async routes, so that authorizing does not take a threadpool hop."""
+    return check_active(await authorize_token_async(credentials.credentials))
+
 def check_role(required_role: str):
-    def role_checker(current_user: models.User = Depends(get_current_active_user)):
+    def role_checker(current_user: Principal = Depends(get_current_active_user)) -> Principal:
         if current_user.role != required_role:
             raise HTTPException(status_code=403, detail="Not enough permissions")
         return current_user
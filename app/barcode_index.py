@@ -0,0 +1,144 @@
+"""In-memory barcode index for till scans.
+
+Maps organization -> barcode -> a compact, immutable product record so a scan
+is a dictionary lookup instead of a query. The index is warmed at startup and
+kept current by the product and purchase endpoints after they commit. Stock is
+deliberately not part of the record: it changes with every sale and is checked
+against the database at checkout.
+"""
+import logging
+import threading
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class BarcodeRecord(NamedTuple):
+    id: int
+    organization_id: str
+    barcode: str
+    name: str
+    selling_price: float
+    tax_rate: float
+    unit_id: Optional[int]
+    category_id: Optional[int]
+    shelf_no: Optional[str]
+
+
+_COLUMNS = [getattr(models.Product, field) for field in BarcodeRecord._fields]
+
+
+def _record(row) -> BarcodeRecord:
+    return BarcodeRecord(*(getattr(row, field) for field in BarcodeRecord._fields))
+
+
+class BarcodeIndex:
+    """Per-organization barcode -> BarcodeRecord maps.
+
+    Reads are lock-free dictionary lookups; writers take a lock so that the
+    id -> (organization, barcode) reverse map stays consistent when a product's
+    barcode changes or it is deleted.
+    """
+
+    def __init__(self):
+        self._by_org: Dict[str, Dict[str, BarcodeRecord]] = {}
+        self._keys_by_id: Dict[int, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+        self.warmed = False
+
+    def warm(self, db: Optional[Session] = None):
+        """(Re)build the whole index from the products table."""
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            rows = db.execute(select(*_COLUMNS).where(models.Product.barcode.isnot(None))).all()
+        finally:
+            if own_session:
+                db.close()
+        by_org: Dict[str, Dict[str, BarcodeRecord]] = {}
+        keys_by_id: Dict[int, Tuple[str, str]] = {}
+        for row in rows:
+            record = _record(row)
+            by_org.setdefault(record.organization_id, {})[record.barcode] = record
+            keys_by_id[record.id] = (record.organization_id, record.barcode)
+        with self._lock:
+            self._by_org = by_org
+            self._keys_by_id = keys_by_id
+            self.warmed = True
+        logger.info(f"Barcode index warmed with {len(keys_by_id)} products")
+
+    def lookup(self, organization_id: str, barcode: str) -> Optional[BarcodeRecord]:
+        org = self._by_org.get(organization_id)
+        return org.get(barcode) if org is not None else None
+
+    def _discard(self, product_id: int):
+        key = self._keys_by_id.pop(product_id, None)
+        if key is not None:
+            org = self._by_org.get(key[0])
+            record = org.get(key[1]) if org is not None else None
+            if record is not None and record.id == product_id:
+                del org[key[1]]
+
+    def put(self, product):
+        """Insert or replace the entry for a committed product (model instance or row)."""
+        record = _record(product)
+        with self._lock:
+            self._discard(record.id)
+            if record.barcode:
+                self._by_org.setdefault(record.organization_id, {})[record.barcode] = record
+                self._keys_by_id[record.id] = (record.organization_id, record.barcode)
+
+    def remove(self, product_id: int):
+        with self._lock:
+            self._discard(product_id)
+
+    def refresh(self, db: Session, product_ids: Iterable[int]):
+        """Reload the given products from the database, e.g. after a purchase changed their prices."""
+        product_ids = set(product_ids)
+        if not product_ids:
+            return
+        rows = db.execute(select(*_COLUMNS).where(models.Product.id.in_(product_ids))).all()
+        for row in rows:
+            self.put(row)
+        for missing in product_ids - {row.id for row in rows}:
+            self.remove(missing)
+
+    def clear(self):
+        with self._lock:
+            self._by_org = {}
+            self._keys_by_id = {}
+            self.warmed = False
+
+
+barcode_index = BarcodeIndex()
+
+
+def warm_barcode_index():
+    try:
+        barcode_index.warm()
+    except Exception as e:
+        logger.warning(f"Failed to warm barcode index: {e}")
+
+
+def lookup_barcode(organization_id: str, barcode: str) -> Optional[BarcodeRecord]:
+    """Resolve a scanned barcode, falling back to the database for products the index has not seen."""
+    record = barcode_index.lookup(organization_id, barcode)
+    if record is not None:
+        return record
+    db = SessionLocal()
+    try:
+        row = db.execute(
+            select(*_COLUMNS).where(models.Product.organization_id == organization_id, models.Product.barcode == barcode)
+        ).first()
+    finally:
+        db.close()
+    if row is None:
+        return None
+    barcode_index.put(row)
+    return _record(row)
@@ -0,0 +1,287 @@
+"""Streaming catalog import from CSV or XLSX spreadsheets.
+
+Rows are read incrementally (csv module / openpyxl read-only mode), validated
+and upserted by barcode in chunks of IMPORT_CHUNK_SIZE, each chunk in its own
+transaction. Progress is reported per chunk, so memory stays bounded by the
+chunk size rather than the file size.
+"""
+import csv
+import io
+import json
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .barcode_index import barcode_index
+from .catalog_version import bump_catalog_version
+from .low_stock import low_stock
+from .ref_cache import ref_cache
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 500
+
+# Spreadsheet header -> product field; headers are matched case-insensitively
+HEADER_ALIASES = {
+    "name": "name",
+    "product": "name",
+    "product_name": "name",
+    "barcode": "barcode",
+    "sku": "barcode",
+    "category": "category",
+    "category_name": "category",
+    "category_id": "category_id",
+    "unit": "unit",
+    "unit_id": "unit_id",
+    "cost_price": "cost_price",
+    "cost": "cost_price",
+    "selling_price": "selling_price",
+    "price": "selling_price",
+    "stock_quantity": "stock_quantity",
+    "stock": "stock_quantity",
+    "quantity": "stock_quantity",
+    "reorder_level": "reorder_level",
+    "description": "description",
+    "shelf_no": "shelf_no",
+    "shelf": "shelf_no",
+    "tax_rate": "tax_rate",
+}
+
+_FLOAT_FIELDS = ("cost_price", "selling_price", "tax_rate")
+_INT_FIELDS = ("stock_quantity", "reorder_level", "category_id", "unit_id")
+_TEXT_LIMITS = {"name": 255, "barcode": 100, "shelf_no": 50}
+
+
+class RowError(ValueError):
+    """A row that cannot be imported."""
+
+
+def _normalize_header(header) -> Optional[str]:
+    key = str(header or "").strip().lower().replace(" ", "_").replace("-", "_")
+    return HEADER_ALIASES.get(key)
+
+
+def iter_csv_rows(file) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    header = next(reader, None) or []
+    fields = [_normalize_header(h) for h in header]
+    for line_no, values in enumerate(reader, start=2):
+        yield line_no, {field: value for field, value in zip(fields, values) if field}
+
+
+def iter_xlsx_rows(file) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    from openpyxl import load_workbook  # imported lazily: only needed for spreadsheet uploads
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        fields = [_normalize_header(h) for h in header]
+        for line_no, values in enumerate(rows, start=2):
+            yield line_no, {field: value for field, value in zip(fields, values) if field}
+    finally:
+        workbook.close()
+
+
+def _clean(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert one raw spreadsheet row to typed product fields; blank cells are dropped."""
+    row = {}
+    for field, value in raw.items():
+        if value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        if field in _FLOAT_FIELDS:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise RowError(f"{field} must be a number")
+        elif field in _INT_FIELDS:
+            try:
+                value = int(float(value))
+            except (TypeError, ValueError):
+                raise RowError(f"{field} must be a whole number")
+        else:
+            # Spreadsheets store numeric barcodes as numbers
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            value = str(value).strip()
+            limit = _TEXT_LIMITS.get(field)
+            if limit and len(value) > limit:
+                raise RowError(f"{field} exceeds {limit} characters")
+        row[field] = value
+    for field in ("cost_price", "selling_price"):
+        if field in row and row[field] <= 0:
+            raise RowError(f"{field} must be greater than 0")
+    for field in ("stock_quantity", "reorder_level"):
+        if field in row and row[field] < 0:
+            raise RowError(f"{field} cannot be negative")
+    if "tax_rate" in row and not 0 <= row["tax_rate"] <= 1:
+        raise RowError("tax_rate must be between 0 and 1")
+    return row
+
+
+class ReferenceResolver:
+    """Resolves category and unit names to ids, caching every lookup for the whole import."""
+
+    def __init__(self, db: Session, organization_id: str, create_missing_categories: bool):
+        self.db = db
+        self.organization_id = organization_id
+        self.create_missing_categories = create_missing_categories
+        self.categories = {
+            name.strip().lower(): id_
+            for id_, name in db.query(models.Category.id, models.Category.name)
+            .filter(models.Category.organization_id == organization_id)
+        }
+        self.category_ids = set(self.categories.values())
+        # Created in the current chunk; evicted from ref_cache once it commits
+        self.created_category_ids = []
+        self.units = {}
+        for id_, name, symbol in db.query(models.Unit.id, models.Unit.name, models.Unit.symbol):
+            self.units.setdefault(name.strip().lower(), id_)
+            if symbol:
+                self.units.setdefault(symbol.strip().lower(), id_)
+        self.unit_ids = set(self.units.values())
+
+    def category_id(self, row: Dict[str, Any]) -> Optional[int]:
+        if "category_id" in row:
+            if row["category_id"] not in self.category_ids:
+                raise RowError(f"Category with id {row['category_id']} does not exist")
+            return row["category_id"]
+        if "category" not in row:
+            return None
+        key = row["category"].lower()
+        if key not in self.categories:
+            if not self.create_missing_categories:
+                raise RowError(f"Category '{row['category']}' does not exist")
+            category = models.Category(organization_id=self.organization_id, name=row["category"])
+            self.db.add(category)
+            self.db.flush()
+            self.categories[key] = category.id
+            self.category_ids.add(category.id)
+            self.created_category_ids.append(category.id)
+        return self.categories[key]
+
+    def unit_id(self, row: Dict[str, Any]) -> Optional[int]:
+        if "unit_id" in row:
+            if row["unit_id"] not in self.unit_ids:
+                raise RowError(f"Unit with id {row['unit_id']} does not exist")
+            return row["unit_id"]
+        if "unit" not in row:
+            return None
+        unit_id = self.units.get(row["unit"].lower())
+        if unit_id is None:
+            raise RowError(f"Unit '{row['unit']}' does not exist")
+        return unit_id
+
+
+_PRODUCT_FIELDS = ("name", "barcode", "cost_price", "selling_price", "stock_quantity",
+                   "reorder_level", "description", "shelf_no", "tax_rate")
+
+
+def _import_chunk(db: Session, organization_id: str, resolver: ReferenceResolver,
+                  chunk: List[Tuple[int, Dict[str, Any]]]) -> Dict[str, Any]:
+    errors = []
+    prepared = []
+    known_categories = len(resolver.categories)
+    for line_no, raw in chunk:
+        try:
+            row = _clean(raw)
+            values = {field: row[field] for field in _PRODUCT_FIELDS if field in row}
+            category_id = resolver.category_id(row)
+            if category_id is not None:
+                values["category_id"] = category_id
+            unit_id = resolver.unit_id(row)
+            if unit_id is not None:
+                values["unit_id"] = unit_id
+            prepared.append((line_no, values))
+        except RowError as e:
+            errors.append({"row": line_no, "error": str(e)})
+
+    barcodes = {values["barcode"] for _, values in prepared if "barcode" in values}
+    existing = {}
+    if barcodes:
+        existing = {
+            barcode: (id_, org)
+            for id_, barcode, org in db.query(models.Product.id, models.Product.barcode, models.Product.organization_id)
+            .filter(models.Product.barcode.in_(barcodes))
+        }
+
+    inserts, updates, seen = [], {}, {}
+    for line_no, values in prepared:
+        barcode = values.get("barcode")
+        match = existing.get(barcode) if barcode else None
+        if match is not None:
+            product_id, owner = match
+            if owner != organization_id:
+                errors.append({"row": line_no, "error": f"Barcode {barcode} belongs to another organization"})
+                continue
+            # A later line for the same barcode wins
+            updates.setdefault(product_id, {"id": product_id}).update(values)
+            continue
+        missing = [field for field in ("name", "cost_price", "selling_price", "category_id", "unit_id") if field not in values]
+        if missing:
+            errors.append({"row": line_no, "error": f"New product is missing {', '.join(field.replace('_id', '') for field in missing)}"})
+            continue
+        values.setdefault("tax_rate", 0.0)
+        values["organization_id"] = organization_id
+        if barcode and barcode in seen:
+            inserts[seen[barcode]].update(values)
+            continue
+        if barcode:
+            seen[barcode] = len(inserts)
+        inserts.append(values)
+
+    if inserts or updates or len(resolver.categories) > known_categories:
+        version = bump_catalog_version(db, organization_id)
+        for values in inserts + list(updates.values()):
+            values["catalog_version"] = version
+
+    # ORM bulk statements: executemany batches grouped by the columns present in each row
+    touched = list(updates)
+    if inserts:
+        touched.extend(db.scalars(insert(models.Product).returning(models.Product.id), inserts))
+    if updates:
+        db.execute(update(models.Product), list(updates.values()))
+    db.commit()
+    for category_id in resolver.created_category_ids:
+        ref_cache.invalidate("category", organization_id, category_id)
+    resolver.created_category_ids.clear()
+    barcode_index.refresh(db, touched)
+    low_stock.refresh(db, touched)
+    errors.sort(key=lambda error: error["row"])
+    return {"created": len(inserts), "updated": len(updates), "errors": errors}
+
+
+def import_catalog(db: Session, organization_id: str, rows: Iterator[Tuple[int, Dict[str, Any]]],
+                   create_missing_categories: bool = True) -> Iterator[str]:
+    """Upsert products by barcode, yielding one NDJSON progress line per chunk and a final summary."""
+    totals = {"processed": 0, "created": 0, "updated": 0, "failed": 0}
+    try:
+        resolver = ReferenceResolver(db, organization_id, create_missing_categories)
+        chunk = []
+        for item in rows:
+            chunk.append(item)
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                yield _progress(db, organization_id, resolver, chunk, totals)
+                chunk = []
+        if chunk:
+            yield _progress(db, organization_id, resolver, chunk, totals)
+        yield json.dumps({"done": True, **totals}) + "\n"
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Catalog import failed after {totals['processed']} rows: {e}")
+        yield json.dumps({"done": False, "error": str(e), **totals}) + "\n"
+    finally:
+        db.close()
+
+
+def _progress(db, organization_id, resolver, chunk, totals) -> str:
+    result = _import_chunk(db, organization_id, resolver, chunk)
+    totals["processed"] += len(chunk)
+    totals["created"] += result["created"]
+    totals["updated"] += result["updated"]
+    totals["failed"] += len(result["errors"])
+    return json.dumps({**totals, "errors": result["errors"]}) + "\n"
@@ -0,0 +1,125 @@
+"""Per-organization catalog version.
+
+Every write to an organization's products, categories or prices bumps its
+version inside the same transaction, and stamps the touched products with it.
+Deleted products leave a tombstone carrying the version of the delete. This
+gives tills a cheap ETag for catalog lists and a delta feed
+(``/products/changes?since=``) instead of re-downloading the whole catalog.
+
+Units are shared by all organizations, so a unit change bumps every version
+plus the global UNITS_KEY version used for the unit list.
+
+Checkout moves stock without bumping the version (the version row would
+serialize every sale of the organization). Instead it bumps an in-process
+stock counter once the sale commits, and the product list ETag includes it,
+so a till never gets 304 for a list whose stock changed. The counter is per
+process, tagged with a per-run id so that restarts never reuse a tag. The
+delta feed only reports stock changed by catalog writes (purchases, edits,
+imports).
+"""
+import threading
+import uuid
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import event, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+UNITS_KEY = "*"
+
+_versions: Dict[str, int] = {}
+_stock_versions: Dict[str, int] = {}
+_RUN_ID = uuid.uuid4().hex[:8]
+_lock = threading.Lock()
+
+
+def bump_catalog_version(db: Session, organization_id: str) -> int:
+    """Increment the organization's version in the current transaction and return the new value."""
+    table = models.CatalogVersion.__table__
+    # A single upsert, so that concurrent first writes of an organization cannot both insert
+    insert_ = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    stmt = insert_(table).values(organization_id=organization_id, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.organization_id], set_={"version": table.c.version + 1},
+    ).returning(table.c.version)
+    version = db.execute(stmt).scalar_one()
+    db.info.setdefault("catalog_versions", {})[organization_id] = version
+    return version
+
+
+def bump_all_catalog_versions(db: Session):
+    """Bump every organization and the shared unit list, e.g. after a unit changed."""
+    table = models.CatalogVersion.__table__
+    bump_catalog_version(db, UNITS_KEY)
+    rows = db.execute(
+        update(table).where(table.c.organization_id != UNITS_KEY)
+        .values(version=table.c.version + 1).returning(table.c.organization_id, table.c.version)
+    ).all()
+    pending = db.info["catalog_versions"]
+    for organization_id, version in rows:
+        pending[organization_id] = version
+
+
+def mark_stock_changed(db: Session, organization_id: str):
+    """Record that the current transaction moved stock; changes the product list ETag once it commits."""
+    db.info.setdefault("stock_changes", set()).add(organization_id)
+
+
+def add_tombstone(db: Session, product: models.Product, version: int):
+    db.merge(models.ProductTombstone(
+        product_id=product.id, organization_id=product.organization_id,
+        barcode=product.barcode, catalog_version=version,
+    ))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_versions(session):
+    pending = session.info.pop("catalog_versions", None)
+    if pending:
+        with _lock:
+            for organization_id, version in pending.items():
+                if version > _versions.get(organization_id, 0):
+                    _versions[organization_id] = version
+    stock_changes = session.info.pop("stock_changes", None)
+    if stock_changes:
+        with _lock:
+            for organization_id in stock_changes:
+                _stock_versions[organization_id] = _stock_versions.get(organization_id, 0) + 1
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_versions(session):
+    session.info.pop("catalog_versions", None)
+    session.info.pop("stock_changes", None)
+
+
+def current_catalog_version(db: Session, organization_id: str) -> int:
+    version = _versions.get(organization_id)
+    if version is None:
+        version = db.execute(
+            select(models.CatalogVersion.version).where(models.CatalogVersion.organization_id == organization_id)
+        ).scalar() or 0
+        with _lock:
+            version = _versions.setdefault(organization_id, version)
+    return version
+
+
+def catalog_etag(db: Session, organization_id: str, resource: str, include_stock: bool = False) -> str:
+    # The organization is part of the tag so a till that switches organization never gets a false 304
+    tag = f"{resource}-{organization_id}-{current_catalog_version(db, organization_id)}"
+    if include_stock:
+        tag += f"-{_RUN_ID}.{_stock_versions.get(organization_id, 0)}"
+    return f'W/"{tag}"'
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Return a 304 response if the client already has `etag`, otherwise tag the response with it."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
@@ -0,0 +1,276 @@
+"""Single-transaction checkout.
+
+A sale, its items and the stock decrement are written in one transaction.
+Stock is taken with one conditional UPDATE covering the whole basket::
+
+    UPDATE products SET stock_quantity = stock_quantity - CASE id WHEN :id1 THEN :q1 ... END
+    WHERE id IN (:id1, ...) AND stock_quantity >= CASE id WHEN :id1 THEN :q1 ... END
+
+so a product is only decremented if it still has enough stock at the moment
+the row is written. If fewer rows were updated than the basket has products,
+another till got there first: the whole sale is rolled back and reported
+with 409. Concurrent tills can therefore never oversell.
+
+Editing a sale's lines or voiding the sale moves stock by the difference
+(``adjust_stock``): extra quantity is taken with the same conditional UPDATE
+and returned quantity is put back, in the transaction of the edit.
+
+Offline tills upload their sales in batches (``checkout_batch``): references
+are validated for the whole batch at once and the batch is written with a
+handful of set-based statements, each sale with the time the till recorded
+(``created_at``) so that it lands in the right day of the rollups and
+reports. Only when stock runs out part-way is it replayed sale by sale, each
+in its own savepoint, so that every sale that can be recorded is. The daily sales rollups are updated in the same
+transaction.
+"""
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import case, func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .auth import Principal
+from .catalog_version import mark_stock_changed
+from .ref_cache import get_cashier_station, get_outlet
+from .sales_rollup import add_sales
+
+
+def _basket_quantities(sales: Iterable[schemas.SaleCreate]) -> Dict[int, int]:
+    quantities: Dict[int, int] = {}
+    for sale in sales:
+        for item in sale.items:
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    return quantities
+
+
+def _insufficient_stock(db: Session, organization_id: str, quantities: Dict[int, int]) -> HTTPException:
+    available = dict(
+        db.query(models.Product.id, models.Product.stock_quantity)
+        .filter(models.Product.id.in_(quantities), models.Product.organization_id == organization_id)
+    )
+    shortages = [
+        {"product_id": product_id, "requested": quantity, "available": available.get(product_id) or 0}
+        for product_id, quantity in quantities.items()
+        if (available.get(product_id) or 0) < quantity
+    ]
+    return HTTPException(status_code=409, detail={"message": "Insufficient stock", "items": shortages})
+
+
+def decrement_stock(db: Session, organization_id: str, quantities: Dict[int, int]):
+    """Take `quantities` ({product_id: quantity}) out of stock in the current transaction, or raise 409."""
+    if not quantities:
+        return
+    requested = case(quantities, value=models.Product.id)
+    result = db.execute(
+        update(models.Product)
+        .where(
+            models.Product.id.in_(sorted(quantities)),
+            models.Product.organization_id == organization_id,
+            models.Product.stock_quantity >= requested,
+        )
+        .values(stock_quantity=models.Product.stock_quantity - requested)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(quantities):
+        raise _insufficient_stock(db, organization_id, quantities)
+    mark_stock_changed(db, organization_id)
+
+
+def sold_quantities(db: Session, sale_ids: Iterable[int]) -> Dict[int, int]:
+    """{product_id: quantity} sold by the given sales' items as they are in the session now."""
+    sale_ids = list(sale_ids)
+    if not sale_ids:
+        return {}
+    rows = (
+        db.query(models.SaleItem.product_id, func.sum(models.SaleItem.quantity))
+        .filter(models.SaleItem.sale_id.in_(sale_ids))
+        .group_by(models.SaleItem.product_id)
+    )
+    return {product_id: quantity for product_id, quantity in rows}
+
+
+def adjust_stock(db: Session, organization_id: str, before: Dict[int, int], after: Dict[int, int]):
+    """Move stock by the change from `before` to `after` ({product_id: quantity sold}) when sales are edited or voided.
+
+    Products sold more are decremented like a checkout, and raise 409 if short; products sold less are put
+    back with the matching increment. Products deleted since the sale are skipped.
+    """
+    deltas = {product_id: after.get(product_id, 0) - before.get(product_id, 0) for product_id in set(before) | set(after)}
+    decrement_stock(db, organization_id, {product_id: delta for product_id, delta in deltas.items() if delta > 0})
+    returned = {product_id: -delta for product_id, delta in deltas.items() if delta < 0}
+    if not returned:
+        return
+    db.execute(
+        update(models.Product)
+        .where(models.Product.id.in_(sorted(returned)), models.Product.organization_id == organization_id)
+        .values(stock_quantity=models.Product.stock_quantity + case(returned, value=models.Product.id))
+        .execution_options(synchronize_session=False)
+    )
+    mark_stock_changed(db, organization_id)
+
+
+class SaleReferences:
+    """Products, customers and payments referenced by a set of sales, loaded with one IN query each."""
+
+    def __init__(self, db: Session, current_user: Principal, sales: List[schemas.SaleCreate]):
+        self.db = db
+        self.current_user = current_user
+        organization_id = current_user.organization_id
+        product_ids = {item.product_id for sale in sales for item in sale.items}
+        customer_ids = {sale.customer_id for sale in sales if sale.customer_id is not None}
+        payment_ids = {sale.payment_id for sale in sales if sale.payment_id}
+        self.cost_prices = dict(
+            db.query(models.Product.id, models.Product.cost_price)
+            .filter(models.Product.id.in_(product_ids), models.Product.organization_id == organization_id)
+        ) if product_ids else {}
+        self.customer_ids = {
+            id_ for (id_,) in db.query(models.Customer.id)
+            .filter(models.Customer.id.in_(customer_ids), models.Customer.organization_id == organization_id)
+        } if customer_ids else set()
+        self.payment_ids = {
+            id_ for (id_,) in db.query(models.Payment.id)
+            .filter(models.Payment.id.in_(payment_ids), models.Payment.organization_id == organization_id)
+        } if payment_ids else set()
+
+    def check(self, sale: schemas.SaleCreate):
+        """Raise the HTTPException the sale would fail with, if any."""
+        organization_id = self.current_user.organization_id
+        # Role-based validation for cashier_station_id
+        if self.current_user.role == "cashier":
+            if sale.cashier_station_id is None:
+                raise HTTPException(status_code=400, detail="cashier_station_id is required for cashiers")
+        elif sale.cashier_station_id is not None:
+            raise HTTPException(status_code=400, detail="cashier_station_id should not be provided for non-cashier users")
+        if not get_outlet(self.db, organization_id, sale.outlet_id):
+            raise HTTPException(status_code=404, detail=f"Outlet {sale.outlet_id} not found")
+        if sale.cashier_station_id is not None and not get_cashier_station(self.db, organization_id, sale.cashier_station_id):
+            raise HTTPException(status_code=404, detail=f"Cashier station {sale.cashier_station_id} not found")
+        if sale.customer_id is not None and sale.customer_id not in self.customer_ids:
+            raise HTTPException(status_code=404, detail=f"Customer {sale.customer_id} not found")
+        if sale.payment_id and sale.payment_id not in self.payment_ids:
+            raise HTTPException(status_code=404, detail="Payment not found")
+        for item in sale.items:
+            if item.product_id not in self.cost_prices:
+                raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
+
+
+def _insert_sales(db: Session, organization_id: str, sales: List[schemas.SaleCreate], cost_prices: Dict[int, float],
+                  idempotency_keys: Optional[List[str]] = None) -> List[int]:
+    """Bulk-insert sales with their items and payment links and add them to the rollups; returns the new sale ids in order."""
+    rows = []
+    now = datetime.now(timezone.utc)
+    for index, sale in enumerate(sales):
+        row = sale.dict(exclude={"items", "payment_id", "idempotency_key"})
+        row["organization_id"] = organization_id
+        if "created_at" in row and row["created_at"] is None:
+            # Offline sales without a till timestamp; every row of a multi-row INSERT needs the same columns
+            row["created_at"] = now
+        if idempotency_keys is not None:
+            row["idempotency_key"] = idempotency_keys[index]
+        rows.append(row)
+    if idempotency_keys is None:
+        # Unkeyed sales are inserted one statement each, which keeps RETURNING in parameter order
+        sale_ids = [db.scalar(insert(models.Sale).returning(models.Sale.id), row) for row in rows]
+    else:
+        # One multi-row INSERT; RETURNING order is unspecified, so ids are matched back by key
+        ids_by_key = dict(db.execute(insert(models.Sale).returning(models.Sale.idempotency_key, models.Sale.id), rows).all())
+        sale_ids = [ids_by_key[key] for key in idempotency_keys]
+
+    items = []
+    sale_payments = []
+    for sale_id, sale in zip(sale_ids, sales):
+        for item in sale.items:
+            item_row = item.dict()
+            item_row["sale_id"] = sale_id
+            # Record the cost at the time of sale for profit reporting
+            if item_row.get("cost_price") is None:
+                item_row["cost_price"] = cost_prices[item.product_id]
+            items.append(item_row)
+        if sale.payment_id:
+            sale_payments.append({"sale_id": sale_id, "payment_id": sale.payment_id,
+                                  "amount": sale.total_amount + sale.tax - sale.discount})
+    if items:
+        db.execute(insert(models.SaleItem), items)
+    if sale_payments:
+        db.execute(insert(models.SalePayment), sale_payments)
+    add_sales(db, sale_ids)
+    return sale_ids
+
+
+def checkout(db: Session, current_user: Principal, sale: schemas.SaleCreate) -> models.Sale:
+    """Validate and record a sale with its items and stock decrement; the caller commits or rolls back."""
+    references = SaleReferences(db, current_user, [sale])
+    references.check(sale)
+    decrement_stock(db, current_user.organization_id, _basket_quantities([sale]))
+    (sale_id,) = _insert_sales(db, current_user.organization_id, [sale], references.cost_prices)
+    return db.get(models.Sale, sale_id)
+
+
+def _result(index: int, key: str, status: str, **fields) -> dict:
+    return {"index": index, "idempotency_key": key, "status": status, **fields}
+
+
+def checkout_batch(db: Session, current_user: Principal, sales: List[schemas.SaleBatchItem]) -> List[dict]:
+    """Record a batch of offline sales and commit; returns one result per sale, in order.
+
+    A sale whose idempotency key is already recorded, by an earlier upload or earlier in
+    the batch, is reported as a duplicate with the existing sale id and not recorded again.
+    """
+    organization_id = current_user.organization_id
+    results: List[Optional[dict]] = [None] * len(sales)
+    existing = dict(
+        db.query(models.Sale.idempotency_key, models.Sale.id)
+        .filter(models.Sale.organization_id == organization_id, models.Sale.idempotency_key.in_({sale.idempotency_key for sale in sales}))
+    )
+    references = SaleReferences(db, current_user, sales)
+
+    pending = []
+    first_index = {}
+    repeats = []
+    now = datetime.now(timezone.utc)
+    for index, sale in enumerate(sales):
+        key = sale.idempotency_key
+        if key in existing:
+            results[index] = _result(index, key, "duplicate", sale_id=existing[key])
+        elif key in first_index:
+            repeats.append((index, first_index[key]))
+        else:
+            first_index[key] = index
+            try:
+                if sale.created_at is not None and sale.created_at > now:
+                    raise HTTPException(status_code=400, detail="created_at cannot be in the future")
+                references.check(sale)
+                pending.append(index)
+            except HTTPException as e:
+                results[index] = _result(index, key, "error", status_code=e.status_code, error=e.detail)
+
+    def record(indexes: List[int]):
+        batch = [sales[index] for index in indexes]
+        decrement_stock(db, organization_id, _basket_quantities(batch))
+        sale_ids = _insert_sales(db, organization_id, batch, references.cost_prices, [sale.idempotency_key for sale in batch])
+        for index, sale_id in zip(indexes, sale_ids):
+            results[index] = _result(index, sales[index].idempotency_key, "created", sale_id=sale_id)
+
+    if pending:
+        try:
+            with db.begin_nested():
+                record(pending)
+        except (HTTPException, IntegrityError):
+            # Stock ran out or a concurrent upload recorded some keys: replay one sale at a time, in order
+            for index in pending:
+                key = sales[index].idempotency_key
+                try:
+                    with db.begin_nested():
+                        record([index])
+                except HTTPException as e:
+                    results[index] = _result(index, key, "error", status_code=e.status_code, error=e.detail)
+                except IntegrityError:
+                    sale_id = db.query(models.Sale.id).filter(models.Sale.organization_id == organization_id, models.Sale.idempotency_key == key).scalar()
+                    results[index] = _result(index, key, "duplicate", sale_id=sale_id)
+    db.commit()
+    for index, first in repeats:
+        results[index] = _result(index, sales[index].idempotency_key, "duplicate", sale_id=results[first].get("sale_id"))
+    return results
@@ -0,0 +1,311 @@
+"""Idempotency-Key handling for POST endpoints that create records.
+
+A client that retries ``POST /api/sales/``, ``/api/payments/`` or
+``/api/purchases/`` after a network error sends the same ``Idempotency-Key``
+header with each attempt. The first attempt claims the key in
+``idempotency_keys`` (scoped to the token subject) and stores its response;
+retries get that response back, marked with ``Idempotent-Replayed: true``,
+without the request being executed again. Completed responses are mirrored in
+an in-memory LRU so that replays do not touch the database.
+
+Reusing a key for a different request body is rejected with 422, and a retry
+that arrives while the first attempt is still running with 409. Failed
+requests (non-2xx) roll back completely, so their key is released and may be
+retried. A claim whose attempt never finished (the process crashed or was
+restarted mid-request) is taken over by the next retry once it is older than
+``IDEMPOTENCY_CLAIM_LEASE_SECONDS``. The token is checked as the routes check it (signature, revocation,
+token version, status) before a key is looked up, so a logged-out token gets
+401 rather than a replay. Keys expire after ``IDEMPOTENCY_KEY_TTL_HOURS`` and are pruned by a
+scheduled job.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+
+from . import models
+from .auth import authorize_token, check_active
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.environ.get("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+IDEMPOTENCY_CLAIM_LEASE_SECONDS = float(os.environ.get("IDEMPOTENCY_CLAIM_LEASE_SECONDS", "60"))
+IDEMPOTENCY_CACHE_MAX_ENTRIES = int(os.environ.get("IDEMPOTENCY_CACHE_MAX_ENTRIES", "10000"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+IDEMPOTENT_PATHS = {"/api/sales/", "/api/payments/", "/api/purchases/"}
+
+
+class StoredResponse(NamedTuple):
+    request_hash: str
+    status_code: Optional[int]
+    content_type: Optional[str]
+    body: bytes
+    expires_at: datetime
+
+
+class IdempotencyCache:
+    """LRU of (subject, key) -> completed StoredResponse."""
+
+    def __init__(self, max_entries: int = IDEMPOTENCY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, StoredResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, subject: str, key: str) -> Optional[StoredResponse]:
+        with self._lock:
+            stored = self._entries.get((subject, key))
+            if stored is None:
+                return None
+            if stored.expires_at < datetime.utcnow():
+                del self._entries[(subject, key)]
+                return None
+            self._entries.move_to_end((subject, key))
+            return stored
+
+    def put(self, subject: str, key: str, stored: StoredResponse):
+        with self._lock:
+            self._entries[(subject, key)] = stored
+            self._entries.move_to_end((subject, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def prune(self, now: datetime):
+        with self._lock:
+            for cache_key in [k for k, stored in self._entries.items() if stored.expires_at < now]:
+                del self._entries[cache_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+idempotency_cache = IdempotencyCache()
+
+
+def _authorize(headers: dict) -> Optional[str]:
+    """Subject of the bearer token, checked as the routes check it; None when there is no bearer token (the route answers)."""
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return check_active(authorize_token(token)).email
+
+
+def request_hash(method: str, path: str, body: bytes) -> str:
+    digest = hashlib.sha256(f"{method} {path}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def _stored_response(row: models.IdempotencyKey) -> StoredResponse:
+    return StoredResponse(row.request_hash, row.status_code, row.content_type, row.response_body, row.expires_at)
+
+
+def _lease_start(now: datetime) -> datetime:
+    return now - timedelta(seconds=IDEMPOTENCY_CLAIM_LEASE_SECONDS)
+
+
+def _is_reclaimable(row: models.IdempotencyKey, now: datetime) -> bool:
+    if row.expires_at < now:
+        return True
+    return row.status_code is None and (row.claimed_at is None or row.claimed_at < _lease_start(now))
+
+
+def _reclaimable(now: datetime):
+    """Rows a new claim may replace: expired keys and in-progress claims older than the lease."""
+    lease_start = _lease_start(now)
+    return or_(
+        models.IdempotencyKey.expires_at < now,
+        and_(
+            models.IdempotencyKey.status_code.is_(None),
+            or_(models.IdempotencyKey.claimed_at.is_(None), models.IdempotencyKey.claimed_at < lease_start),
+        ),
+    )
+
+
+def claim_key(subject: str, key: str, hashed: str):
+    """Claim `key` for a new request; returns the StoredResponse or in-progress row of an earlier attempt, if any."""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        existing = db.get(models.IdempotencyKey, (subject, key))
+        if existing is not None:
+            if not _is_reclaimable(existing, now):
+                return _stored_response(existing)
+            # Conditional, so that of several retries taking over an abandoned claim only one succeeds;
+            # the others then fail to insert below and see the new claim
+            db.expunge(existing)
+            db.query(models.IdempotencyKey).filter(
+                models.IdempotencyKey.subject == subject, models.IdempotencyKey.key == key, _reclaimable(now),
+            ).delete(synchronize_session=False)
+        db.add(models.IdempotencyKey(
+            subject=subject,
+            key=key,
+            request_hash=hashed,
+            claimed_at=now,
+            expires_at=now + timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS),
+        ))
+        try:
+            db.commit()
+            return None
+        except IntegrityError:
+            # A concurrent attempt claimed it first
+            db.rollback()
+            existing = db.get(models.IdempotencyKey, (subject, key))
+            if existing is None:
+                return None
+            return _stored_response(existing)
+    finally:
+        db.close()
+
+
+def complete_key(subject: str, key: str, status_code: int, content_type: Optional[str], body: bytes) -> Optional[StoredResponse]:
+    """Store the response of a successful request, or release the key of a failed one."""
+    db = SessionLocal()
+    try:
+        row = db.get(models.IdempotencyKey, (subject, key))
+        if row is None:
+            return None
+        if not 200 <= status_code < 300:
+            db.delete(row)
+            db.commit()
+            return None
+        row.status_code = status_code
+        row.content_type = content_type
+        row.response_body = body
+        db.commit()
+        return _stored_response(row)
+    finally:
+        db.close()
+
+
+def release_key(subject: str, key: str):
+    db = SessionLocal()
+    try:
+        db.query(models.IdempotencyKey).filter(
+            models.IdempotencyKey.subject == subject, models.IdempotencyKey.key == key,
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def prune_idempotency_keys():
+    """Scheduled job: drop expired idempotency keys."""
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        deleted = db.query(models.IdempotencyKey).filter(models.IdempotencyKey.expires_at < now).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    idempotency_cache.prune(now)
+    if deleted:
+        logger.info(f"Pruned {deleted} expired idempotency keys.")
+
+
+def _replay(stored: StoredResponse) -> Response:
+    headers = {"Idempotent-Replayed": "true"}
+    return Response(stored.body, status_code=stored.status_code, headers=headers, media_type=stored.content_type)
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware that applies Idempotency-Key semantics to POSTs on IDEMPOTENT_PATHS."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in IDEMPOTENT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        key = headers.get(b"idempotency-key", b"").decode("latin-1").strip()
+        if not key:
+            await self.app(scope, receive, send)
+            return
+        # Reject logged-out, stale or inactive tokens before a stored response is looked up
+        try:
+            subject = await run_in_threadpool(_authorize, headers)
+        except HTTPException as exc:
+            response = JSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers)
+            await response(scope, receive, send)
+            return
+        if subject is None:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            response = JSONResponse({"detail": f"Idempotency-Key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters"}, status_code=400)
+            await response(scope, receive, send)
+            return
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        hashed = request_hash(scope["method"], scope["path"], body)
+
+        stored = idempotency_cache.get(subject, key)
+        if stored is None:
+            stored = await run_in_threadpool(claim_key, subject, key, hashed)
+        if stored is not None:
+            if stored.request_hash != hashed:
+                response = JSONResponse({"detail": "Idempotency-Key was already used for a different request"}, status_code=422)
+            elif stored.status_code is None:
+                response = JSONResponse({"detail": "A request with this Idempotency-Key is still in progress"}, status_code=409)
+            else:
+                idempotency_cache.put(subject, key, stored)
+                response = _replay(stored)
+            await response(scope, receive, send)
+            return
+
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        status_code = None
+        content_type = None
+        chunks = []
+        completed = False
+
+        async def send_wrapper(message):
+            nonlocal status_code, content_type, completed
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"").decode("latin-1") or None
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    # Store before the client sees the end of the response, so an immediate retry is replayed
+                    stored = await run_in_threadpool(complete_key, subject, key, status_code, content_type, b"".join(chunks))
+                    if stored is not None:
+                        idempotency_cache.put(subject, key, stored)
+                    completed = True
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+        finally:
+            if not completed:
+                await run_in_threadpool(release_key, subject, key)
@@ -0,0 +1,160 @@
+"""Invoice documents for ``GET /sales/{id}/invoice`` and ``POST /sales/{id}/print``.
+
+Both endpoints need the same payload: the sale with its items and outlet, and
+the outlet's default printer and invoice template. ``build_invoice`` loads it
+once and keeps the finished dict in an LRU keyed by (organization, sale id,
+sale version, template version), so reprints and preview-then-print are
+served without queries.
+
+Versions are per process, like ``ref_cache``: the sales routers bump a sale's
+version after changing it or its items, and the settings and outlets routers
+bump the organization's template version after changing printers, templates or
+outlets. Entries of older versions are dropped at once; a build that raced
+with a bump is stored under the old version and never served. Product names
+are those at the time of the first build.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session, joinedload
+
+from . import models
+from .ref_cache import get_default_printer, get_default_template
+
+INVOICE_CACHE_MAX_ENTRIES = int(os.environ.get("INVOICE_CACHE_MAX_ENTRIES", "1000"))
+
+
+class InvoiceCache:
+    """LRU of (organization_id, sale_id, sale_version, template_version) -> invoice payload."""
+
+    def __init__(self, max_entries: int = INVOICE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        # Only sales changed since startup have a version; bounded like the entries
+        self._sale_versions: "OrderedDict[tuple, int]" = OrderedDict()
+        self._template_versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def key(self, organization_id: str, sale_id: int) -> tuple:
+        with self._lock:
+            return (
+                organization_id,
+                sale_id,
+                self._sale_versions.get((organization_id, sale_id), 0),
+                self._template_versions.get(organization_id, 0),
+            )
+
+    def get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            invoice = self._entries.get(key)
+            if invoice is not None:
+                self._entries.move_to_end(key)
+            return invoice
+
+    def put(self, key: tuple, invoice: Dict[str, Any]):
+        organization_id, sale_id, sale_version, template_version = key
+        with self._lock:
+            if (sale_version != self._sale_versions.get((organization_id, sale_id), 0)
+                    or template_version != self._template_versions.get(organization_id, 0)):
+                return
+            self._entries[key] = invoice
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_sale(self, organization_id: str, sale_id: int):
+        """Call after a sale or its items change or the sale is deleted."""
+        with self._lock:
+            version_key = (organization_id, sale_id)
+            self._sale_versions[version_key] = self._sale_versions.pop(version_key, 0) + 1
+            while len(self._sale_versions) > self.max_entries:
+                self._sale_versions.popitem(last=False)
+            for key in [k for k in self._entries if k[0] == organization_id and k[1] == sale_id]:
+                del self._entries[key]
+
+    def invalidate_templates(self, organization_id: str):
+        """Call after the organization's printers, invoice templates or outlets change."""
+        with self._lock:
+            self._template_versions[organization_id] = self._template_versions.get(organization_id, 0) + 1
+            for key in [k for k in self._entries if k[0] == organization_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sale_versions.clear()
+            self._template_versions.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+invoice_cache = InvoiceCache()
+
+
+def _load_invoice(db: Session, organization_id: str, sale_id: int) -> Dict[str, Any]:
+    sale = db.query(models.Sale).options(
+        joinedload(models.Sale.items).joinedload(models.SaleItem.product), joinedload(models.Sale.outlet),
+    ).filter(models.Sale.id == sale_id, models.Sale.organization_id == organization_id).first()
+    if sale is None:
+        raise HTTPException(status_code=404, detail="Sale not found")
+    if sale.outlet is None:
+        raise HTTPException(status_code=404, detail="Sale outlet not found")
+
+    default_printer = get_default_printer(db, organization_id, sale.outlet_id)
+    default_template = get_default_template(db, organization_id, sale.outlet_id)
+    if not default_template:
+        raise HTTPException(status_code=404, detail="Default template not configured for this outlet")
+
+    # If no default printer, default to PDF printing
+    if not default_printer:
+        printer_type, printer_name, settings = "a4", "PDF", None
+    else:
+        printer_type, printer_name, settings = default_printer.printer_type, default_printer.printer_name, default_printer.settings
+
+    return {
+        "sale_id": sale.id,
+        "outlet": {
+            "name": sale.outlet.name,
+            "address": sale.outlet.address,
+            "phone": sale.outlet.phone,
+            "email": sale.outlet.email
+        },
+        "total_amount": sale.total_amount,
+        "discount": sale.discount,
+        "tax": sale.tax,
+        "net_total": sale.net_total,
+        "items": [
+            {
+                "product_name": item.product.name,
+                "quantity": item.quantity,
+                "selling_price": item.selling_price,
+                "total": item.total
+            } for item in sale.items
+        ],
+        "printer_settings": {
+            "type": printer_type,
+            "name": printer_name,
+            "settings": settings
+        },
+        "template": {
+            "name": default_template.name,
+            "header_text": default_template.header_text,
+            "footer_text": default_template.footer_text
+        }
+    }
+
+
+def build_invoice(db: Session, organization_id: str, sale_id: int) -> Dict[str, Any]:
+    """The invoice payload of a sale, from the cache when unchanged; raises 404 as the endpoints do.
+
+    The returned dict is shared between requests and must not be modified.
+    """
+    key = invoice_cache.key(organization_id, sale_id)
+    invoice = invoice_cache.get(key)
+    if invoice is None:
+        invoice = _load_invoice(db, organization_id, sale_id)
+        invoice_cache.put(key, invoice)
+    return invoice
@@ -0,0 +1,151 @@
+"""Low-stock tracking and reorder alerts.
+
+The low-stock products of an organization are loaded once (through the
+``ix_products_low_stock`` partial index) and then maintained incrementally:
+whatever changes ``stock_quantity`` or ``reorder_level`` calls ``refresh`` with
+the affected product ids after committing. Changes are pushed to subscribers
+of the organization as server-sent events.
+"""
+import asyncio
+import json
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class LowStockRecord(NamedTuple):
+    id: int
+    organization_id: str
+    name: str
+    barcode: Optional[str]
+    stock_quantity: int
+    reorder_level: int
+
+
+_COLUMNS = [getattr(models.Product, field) for field in LowStockRecord._fields]
+
+
+def _record(row) -> LowStockRecord:
+    return LowStockRecord(*(getattr(row, field) for field in LowStockRecord._fields))
+
+
+def _is_low(record: LowStockRecord) -> bool:
+    return (record.stock_quantity or 0) <= (record.reorder_level or 0)
+
+
+class LowStockTracker:
+    """Per-organization {product_id: LowStockRecord} of products at or below their reorder level."""
+
+    def __init__(self):
+        self._by_org: Dict[str, Dict[int, LowStockRecord]] = {}
+        self._subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session, organization_id: str) -> Dict[int, LowStockRecord]:
+        rows = db.execute(
+            select(*_COLUMNS).where(
+                models.Product.organization_id == organization_id,
+                models.Product.stock_quantity <= models.Product.reorder_level,
+            )
+        ).all()
+        return {row.id: _record(row) for row in rows}
+
+    def products(self, db: Session, organization_id: str) -> List[LowStockRecord]:
+        org = self._by_org.get(organization_id)
+        if org is None:
+            # Load under the lock: a refresh applied between the load and the insert would be lost
+            with self._lock:
+                org = self._by_org.get(organization_id)
+                if org is None:
+                    org = self._by_org[organization_id] = self._load(db, organization_id)
+        return sorted(org.values(), key=lambda record: (record.stock_quantity - record.reorder_level, record.id))
+
+    def refresh(self, db: Session, product_ids: Iterable[int]):
+        """Re-read the given products after their stock or reorder level changed and publish transitions.
+
+        Organizations that were never loaded are skipped: nobody has asked for their list or subscribed
+        to it yet, and it is read fresh when they do.
+        """
+        product_ids = set(product_ids)
+        if not product_ids:
+            return
+        rows = db.execute(select(*_COLUMNS).where(models.Product.id.in_(product_ids))).all()
+        events = []
+        with self._lock:
+            for row in rows:
+                record = _record(row)
+                org = self._by_org.get(record.organization_id)
+                if org is None:
+                    continue
+                previous = org.get(record.id)
+                if _is_low(record):
+                    org[record.id] = record
+                    if previous != record:
+                        events.append(("low" if previous is None else "changed", record))
+                elif previous is not None:
+                    del org[record.id]
+                    events.append(("restocked", record))
+            deleted = product_ids - {row.id for row in rows}
+            for org in self._by_org.values():
+                for product_id in deleted & org.keys():
+                    events.append(("removed", org.pop(product_id)))
+        for kind, record in events:
+            self._publish(record.organization_id, {"event": kind, "product": record._asdict()})
+
+    def clear(self):
+        with self._lock:
+            self._by_org = {}
+
+    def subscribe(self, organization_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(organization_id, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, organization_id: str, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(organization_id, set())
+            for entry in [entry for entry in subscribers if entry[1] is queue]:
+                subscribers.discard(entry)
+
+    def _publish(self, organization_id: str, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(organization_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                pass  # event loop already closed
+
+
+def _offer(queue: asyncio.Queue, event: dict):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # A stalled client misses events; it can resync from GET /products/low-stock
+        pass
+
+
+low_stock = LowStockTracker()
+
+
+async def low_stock_events(organization_id: str, keepalive_seconds: float = 15.0):
+    """Server-sent event stream of low-stock changes for one organization."""
+    queue = low_stock.subscribe(organization_id)
+    try:
+        yield ": subscribed\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event['event']}\ndata: {json.dumps(event['product'])}\n\n"
+    finally:
+        low_stock.unsubscribe(organization_id, queue)
@@ -2,14 +2,24 @@ from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from .database import Base, engine, SessionLocal
 from . import models
-from .routers import users, outlets, products, suppliers, sales, auth, settings, cashier_shifts, purchases, payments, organizations, licenses, customers
+from .routers import users, outlets, products, suppliers, sales, auth, settings, cashier_shifts, purchases, payments, organizations, licenses, customers, admin, exports, reports
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from .sync import sync_data
+from . import passwords
+from .token_revocation import load_revocations, prune_revocations
+from .query_stats import QueryStatsMiddleware
+from .idempotency import IdempotencyMiddleware, prune_idempotency_keys
+from .product_search import setup_product_search
+from .barcode_index import warm_barcode_index
 import logging
 
 app = FastAPI(title="Inventory POS System")
 
+# Replay responses of retried POSTs that carry an Idempotency-Key. Added before
+# CORS so that CORS wraps it and replayed or rejected responses get its headers.
+app.add_middleware(IdempotencyMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -17,16 +27,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "Idempotent-Replayed"],
 )
 
+# Per-request SQL statement count, DB time and N+1 detection (Server-Timing header)
+app.add_middleware(QueryStatsMiddleware)
+
 # Create tables
 Base.metadata.create_all(bind=engine)
+setup_product_search(engine)
 
 # Create tables in central DB if online
 from .database import central_engine, is_online
 try:
     if is_online():
         Base.metadata.create_all(bind=central_engine)
+        setup_product_search(central_engine)
         logging.info("Central database tables created or verified.")
     else:
         logging.info("Offline: Central database tables not created.")
@@ -40,12 +56,17 @@ scheduler = AsyncIOScheduler()
 async def startup_event():
     # Schedule sync every 30 minutes
     scheduler.add_job(sync_data, trigger=IntervalTrigger(minutes=30), id="sync_job")
+    load_revocations()
+    warm_barcode_index()
+    scheduler.add_job(prune_revocations, trigger=IntervalTrigger(hours=1), id="prune_revocations_job")
+    scheduler.add_job(prune_idempotency_keys, trigger=IntervalTrigger(hours=1), id="prune_idempotency_keys_job")
     scheduler.start()
     logging.info("Scheduler started: Sync job scheduled every 30 minutes.")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     scheduler.shutdown()
+    passwords.shutdown()
     logging.info("Scheduler shut down.")
 
 @app.get("/")
@@ -65,3 +86,6 @@ app.include_router(payments.router, prefix="/api", tags=["payments"])
 app.include_router(organizations.router, prefix="/api", tags=["organizations"])
 app.include_router(licenses.router, prefix="/api", tags=["licenses"])
 app.include_router(customers.router, prefix="/api/customers", tags=["customers"])
+app.include_router(admin.router, prefix="/api", tags=["admin"])
+app.include_router(exports.router, prefix="/api", tags=["exports"])
+app.include_router(reports.router, prefix="/api", tags=["reports"])
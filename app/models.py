@@ -1,8 +1,8 @@
 import uuid
 from sqlalchemy import (
-    Column, Integer, String, Float, Text, ForeignKey, DateTime, Boolean, CheckConstraint
+    Column, Integer, String, Float, Text, ForeignKey, DateTime, Boolean, CheckConstraint, Index, LargeBinary, Date, case
 )
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from sqlalchemy.orm import relationship, validates
 from sqlalchemy.ext.hybrid import hybrid_property
 from .database import Base
@@ -63,6 +63,8 @@ class User(Base):
         return verify_password(password, self.password)
     role = Column(String(50), default="cashier")
     status = Column(String(50), default="active")
+    # Bumped whenever claims embedded in issued tokens become stale (role, status, outlet, password)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     sales = relationship("Sale", back_populates="user")
     logs = relationship("UserActivityLog", back_populates="user")
@@ -131,6 +133,16 @@ class Unit(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Keyset pagination: organization filter + id ordering in one index
+        Index("ix_products_organization_id_id", "organization_id", "id"),
+        # Low-stock list: only products at or below their reorder level are indexed
+        Index("ix_products_low_stock", "organization_id",
+              sqlite_where=text("stock_quantity <= reorder_level"),
+              postgresql_where=text("stock_quantity <= reorder_level")),
+        # Delta feed: products changed since a catalog version
+        Index("ix_products_organization_id_catalog_version", "organization_id", "catalog_version"),
+    )
 
     id = Column(Integer, primary_key=True)
     organization_id = Column(String(36), ForeignKey("organizations.id"), nullable=False)
@@ -146,6 +158,7 @@ class Product(Base):
     description = Column(Text)
     shelf_no = Column(String(50))
     tax_rate = Column(Float, default=0.0)
+    catalog_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     category = relationship("Category", back_populates="products")
@@ -168,6 +181,13 @@ class Product(Base):
             return ((self.selling_price - self.cost_price) / self.cost_price) * 100
         return 0.0
 
+    @profit_margin_calc.expression
+    def profit_margin_calc(cls):
+        return case(
+            (cls.cost_price > 0, (cls.selling_price - cls.cost_price) / cls.cost_price * 100),
+            else_=0.0,
+        )
+
     @hybrid_property
     def is_low_stock(self):
         return self.stock_quantity <= self.reorder_level
@@ -185,6 +205,8 @@ class Product(Base):
 
 class Customer(Base):
     __tablename__ = "customers"
+    # Keyset pagination: organization filter + id ordering in one index
+    __table_args__ = (Index("ix_customers_organization_id_id", "organization_id", "id"),)
 
     id = Column(Integer, primary_key=True)
     organization_id = Column(String(36), ForeignKey("organizations.id"), nullable=False)
@@ -215,6 +237,8 @@ class Supplier(Base):
 
 class Purchase(Base):
     __tablename__ = "purchases"
+    # Keyset pagination: organization filter + id ordering in one index
+    __table_args__ = (Index("ix_purchases_organization_id_id", "organization_id", "id"),)
 
     id = Column(Integer, primary_key=True)
     organization_id = Column(String(36), ForeignKey("organizations.id"), nullable=False)
@@ -248,6 +272,15 @@ class PurchaseItem(Base):
 
 class Sale(Base):
     __tablename__ = "sales"
+    __table_args__ = (
+        # Keyset pagination: organization filter + id ordering in one index
+        Index("ix_sales_organization_id_id", "organization_id", "id"),
+        # Date-range exports and reports, per organization or per outlet
+        Index("ix_sales_organization_id_created_at", "organization_id", "created_at"),
+        Index("ix_sales_organization_id_outlet_id_created_at", "organization_id", "outlet_id", "created_at"),
+        # Offline uploads: a till's key identifies its sale across retries
+        Index("uq_sales_organization_id_idempotency_key", "organization_id", "idempotency_key", unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     organization_id = Column(String(36), ForeignKey("organizations.id"), nullable=False)
@@ -260,6 +293,7 @@ class Sale(Base):
     tax = Column(Float, default=0.0)
     payment_status = Column(String(50), default="paid")
     sale_type = Column(String(50), default="cash")
+    idempotency_key = Column(String(64))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     outlet = relationship("Outlet", back_populates="sales")
@@ -297,7 +331,8 @@ class SaleItem(Base):
     __tablename__ = "sale_items"
 
     id = Column(Integer, primary_key=True)
-    sale_id = Column(Integer, ForeignKey("sales.id"))
+    # Items of a sale: eager loading, reports and rollups join on it
+    sale_id = Column(Integer, ForeignKey("sales.id"), index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Integer, nullable=False)
     selling_price = Column(Float, nullable=False)
@@ -315,9 +350,19 @@ class SaleItem(Base):
             return self.quantity * (self.selling_price - self.cost_price)
         return 0.0
 
+    @profit.expression
+    def profit(cls):
+        # Lines without a recorded cost count as no profit, as above
+        return case(
+            (func.coalesce(cls.cost_price, 0) != 0, cls.quantity * (cls.selling_price - cls.cost_price)),
+            else_=0.0,
+        )
+
 
 class Payment(Base):
     __tablename__ = "payments"
+    # Keyset pagination: organization filter + id ordering in one index
+    __table_args__ = (Index("ix_payments_organization_id_id", "organization_id", "id"),)
 
     id = Column(Integer, primary_key=True)
     organization_id = Column(String(36), ForeignKey("organizations.id"), nullable=False)
@@ -405,6 +450,8 @@ class SalePayment(Base):
 
 class CashierShift(Base):
     __tablename__ = "cashier_shifts"
+    # Keyset pagination: organization filter + id ordering in one index
+    __table_args__ = (Index("ix_cashier_shifts_organization_id_id", "organization_id", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     organization_id = Column(String(36), ForeignKey("organizations.id"), nullable=False)
@@ -422,3 +469,85 @@ class CashierShift(Base):
     cashier_station = relationship("CashierStation", back_populates="cashier_shifts")
     outlet = relationship("Outlet", back_populates="cashier_shifts")
     organization = relationship("Organization", back_populates="cashier_shifts")
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(36), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
+    token_type = Column(String(20), nullable=False, default="access")
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    revoked_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class CatalogVersion(Base):
+    __tablename__ = "catalog_versions"
+
+    # Organization id, or "*" for the shared unit list
+    organization_id = Column(String(36), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class ProductTombstone(Base):
+    __tablename__ = "product_tombstones"
+    __table_args__ = (Index("ix_product_tombstones_organization_id_catalog_version", "organization_id", "catalog_version"),)
+
+    product_id = Column(Integer, primary_key=True)
+    organization_id = Column(String(36), ForeignKey("organizations.id"), nullable=False)
+    barcode = Column(String(100))
+    catalog_version = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # Token subject the key belongs to
+    subject = Column(String(255), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # sha256 of method, path and body; a retry must match it
+    request_hash = Column(String(64), nullable=False)
+    # Null while the first attempt is in progress
+    status_code = Column(Integer)
+    content_type = Column(String(100))
+    response_body = Column(LargeBinary)
+    created_at = Column(DateTime, server_default=func.now())
+    # When the in-progress attempt took the key; a claim older than the lease is abandoned
+    claimed_at = Column(DateTime)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class DailyProductSales(Base):
+    """Sales of one product at one outlet on one UTC day; see app.sales_rollup."""
+    __tablename__ = "daily_product_sales"
+    __table_args__ = (Index("ix_daily_product_sales_organization_id_day", "organization_id", "day"),)
+
+    organization_id = Column(String(36), primary_key=True)
+    outlet_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    cost = Column(Float, nullable=False, default=0.0)
+    discount = Column(Float, nullable=False, default=0.0)
+    tax = Column(Float, nullable=False, default=0.0)
+    sale_count = Column(Integer, nullable=False, default=0)
+
+
+class DailyCashierSales(Base):
+    """Sales by one user at one cashier station and outlet on one UTC day; see app.sales_rollup."""
+    __tablename__ = "daily_cashier_sales"
+    __table_args__ = (Index("ix_daily_cashier_sales_organization_id_day", "organization_id", "day"),)
+
+    organization_id = Column(String(36), primary_key=True)
+    outlet_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    cashier_station_id = Column(Integer, primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    cost = Column(Float, nullable=False, default=0.0)
+    discount = Column(Float, nullable=False, default=0.0)
+    tax = Column(Float, nullable=False, default=0.0)
+    sale_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,50 @@
+"""Keyset (cursor) pagination for list endpoints.
+
+Every list is ordered by primary key so pages are deterministic. Clients pass
+back the opaque cursor from the ``X-Next-Cursor`` response header to get the
+following page; the database then seeks directly to the key instead of
+skipping ``skip`` rows, so deep pages cost the same as the first one.
+``skip`` keeps working for existing clients.
+"""
+import base64
+import json
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(key) -> str:
+    return base64.urlsafe_b64encode(json.dumps([key]).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        (key,) = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Keys are integer primary keys; anything else would be compared as-is in SQL
+    if not isinstance(key, int) or isinstance(key, bool):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+
+def paginate(query: Query, key_column, response: Response, limit: int, cursor: Optional[str] = None,
+             skip: int = 0, descending: bool = False) -> list:
+    """Return one page of `query` ordered by `key_column`, setting X-Next-Cursor when more rows may follow.
+
+    Use descending=True for histories (sales, payments, ...) so the newest rows come first.
+    """
+    if cursor is not None:
+        last_key = decode_cursor(cursor)
+        query = query.filter(key_column < last_key if descending else key_column > last_key)
+    query = query.order_by(key_column.desc() if descending else key_column.asc())
+    if cursor is None and skip:
+        query = query.offset(skip)
+    rows = query.limit(limit).all()
+    if limit and len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(rows[-1], key_column.key))
+    return rows
@@ -0,0 +1,53 @@
+"""SQL expressions for set-based repricing.
+
+The new selling price is computed by the database inside a single
+``UPDATE products SET selling_price = <expression> WHERE ...``, so repricing
+a whole category is one statement regardless of its size.
+"""
+from typing import Optional
+
+from sqlalchemy import Float
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement, FunctionElement
+
+from . import models
+
+# Absorbs binary float error, e.g. 1.10 / 0.05 = 22.000000000000004
+_EPSILON = 1e-9
+
+
+class _floor(FunctionElement):
+    type = Float()
+    inherit_cache = True
+
+
+@compiles(_floor)
+def _compile_floor(element, compiler, **kw):
+    return "floor(%s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(_floor, "sqlite")
+def _compile_floor_sqlite(element, compiler, **kw):
+    # floor() needs SQLite's optional math functions; truncation is equal for the positive prices rounded here
+    return "CAST(%s AS INTEGER)" % compiler.process(element.clauses, **kw)
+
+
+def reprice_expression(rule: str, value: float, round_to: Optional[float] = None,
+                       round_mode: str = "nearest") -> ColumnElement:
+    """New selling price for `rule` (percent, amount or markup), rounded to a multiple of `round_to`."""
+    if rule == "percent":
+        price = models.Product.selling_price * (1 + value / 100)
+    elif rule == "amount":
+        price = models.Product.selling_price + value
+    else:
+        price = models.Product.cost_price * (1 + value / 100)
+    if not round_to:
+        return price
+    steps = price / round_to
+    if round_mode == "up":
+        steps = _floor(steps - _EPSILON) + 1
+    elif round_mode == "down":
+        steps = _floor(steps + _EPSILON)
+    else:
+        steps = _floor(steps + 0.5)
+    return steps * round_to
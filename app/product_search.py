@@ -0,0 +1,135 @@
+"""Full-text product search.
+
+SQLite keeps an FTS5 index (``products_fts``) over name, description, barcode
+and shelf number, maintained by triggers on ``products``. PostgreSQL keeps a
+generated ``search_vector`` tsvector column with a GIN index. Both support
+prefix matching of every search term and rank results by relevance.
+"""
+import logging
+import re
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Column weights for bm25 / ts_rank: a name hit outranks a barcode, shelf or description hit
+_SQLITE_RANK = "bm25(products_fts, 10.0, 1.0, 5.0, 2.0)"
+
+# Shared with the d9a3f5b7c2e1 migration, so the index is defined in one place
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description, barcode, shelf_no,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description, barcode, shelf_no)
+        VALUES (new.id, new.name, new.description, new.barcode, new.shelf_no);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description, barcode, shelf_no)
+        VALUES ('delete', old.id, old.name, old.description, old.barcode, old.shelf_no);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description, barcode, shelf_no ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description, barcode, shelf_no)
+        VALUES ('delete', old.id, old.name, old.description, old.barcode, old.shelf_no);
+        INSERT INTO products_fts(rowid, name, description, barcode, shelf_no)
+        VALUES (new.id, new.name, new.description, new.barcode, new.shelf_no);
+    END
+    """,
+]
+
+POSTGRES_DDL = [
+    """
+    ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(barcode, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(shelf_no, '')), 'C') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'D')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING GIN (search_vector)",
+]
+
+# Indexes the rows that existed before the FTS table was created
+SQLITE_REBUILD = "INSERT INTO products_fts(products_fts) VALUES ('rebuild')"
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+# Dialects on which setup succeeded; others fall back to LIKE matching
+_ready = set()
+
+
+def setup_product_search(bind: Engine):
+    """Create the search index and its triggers if missing. Safe to run on every startup."""
+    dialect = bind.dialect.name
+    try:
+        with bind.begin() as conn:
+            if dialect == "sqlite":
+                created = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+                )).first() is None
+                for statement in SQLITE_DDL:
+                    conn.execute(text(statement))
+                if created:
+                    conn.execute(text(SQLITE_REBUILD))
+            elif dialect == "postgresql":
+                for statement in POSTGRES_DDL:
+                    conn.execute(text(statement))
+            else:
+                return
+        _ready.add(dialect)
+    except Exception as e:
+        logger.warning(f"Full-text product search unavailable on {dialect}: {e}")
+
+
+def search_terms(q: str) -> List[str]:
+    return _TERM.findall(q.lower())[:10]
+
+
+def search_products(db: Session, organization_id: str, q: str, limit: int = 20) -> List[models.Product]:
+    """Products of one organization matching every term of `q` as a prefix, best match first."""
+    terms = search_terms(q)
+    if not terms:
+        return []
+    dialect = db.get_bind().dialect.name
+    params = {"org": organization_id, "limit": limit}
+
+    if dialect == "sqlite" and dialect in _ready:
+        params["match"] = " ".join(f'"{term}"*' for term in terms)
+        statement = text(
+            "SELECT products.* FROM products_fts JOIN products ON products.id = products_fts.rowid "
+            "WHERE products_fts MATCH :match AND products.organization_id = :org "
+            f"ORDER BY {_SQLITE_RANK} LIMIT :limit"
+        )
+        return db.query(models.Product).from_statement(statement).params(**params).all()
+
+    if dialect == "postgresql" and dialect in _ready:
+        params["query"] = " & ".join(f"{term}:*" for term in terms)
+        statement = text(
+            "SELECT products.* FROM products "
+            "WHERE products.search_vector @@ to_tsquery('simple', :query) AND products.organization_id = :org "
+            "ORDER BY ts_rank(products.search_vector, to_tsquery('simple', :query)) DESC LIMIT :limit"
+        )
+        return db.query(models.Product).from_statement(statement).params(**params).all()
+
+    query = db.query(models.Product).filter(models.Product.organization_id == organization_id)
+    for term in terms:
+        pattern = f"%{term}%"
+        query = query.filter(
+            models.Product.name.ilike(pattern) | models.Product.barcode.ilike(pattern) |
+            models.Product.shelf_no.ilike(pattern) | models.Product.description.ilike(pattern)
+        )
+    return query.order_by(models.Product.name).limit(limit).all()
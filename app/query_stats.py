@@ -0,0 +1,114 @@
+"""Per-request SQL instrumentation.
+
+Counts the statements and database time spent serving each HTTP request,
+reports them in the ``Server-Timing`` response header and flags statements
+that are repeated with different parameters (the typical N+1 pattern of
+lazy-loaded relationships during serialization).
+"""
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+QUERY_STATS_ENABLED = os.environ.get("QUERY_STATS_ENABLED", "1") != "0"
+# Number of executions of one statement with distinct parameters before it is reported as N+1
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD", "5"))
+
+
+class QueryStats:
+    """Statement counters collected for a single request."""
+
+    __slots__ = ("route", "count", "duration", "_params_by_statement")
+
+    def __init__(self, route: Optional[str] = None):
+        self.route = route
+        self.count = 0
+        self.duration = 0.0
+        self._params_by_statement: Dict[str, Set[int]] = {}
+
+    def record(self, statement: str, parameters, elapsed: float):
+        self.count += 1
+        self.duration += elapsed
+        try:
+            key = hash(repr(parameters))
+        except Exception:
+            key = id(parameters)
+        self._params_by_statement.setdefault(statement, set()).add(key)
+
+    def repeated_statements(self) -> List[Tuple[str, int]]:
+        """Statements executed with at least N_PLUS_ONE_THRESHOLD distinct parameter sets."""
+        return [
+            (statement, len(params))
+            for statement, params in self._params_by_statement.items()
+            if len(params) >= N_PLUS_ONE_THRESHOLD
+        ]
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    stats.record(statement, parameters, time.perf_counter() - start_times.pop())
+
+
+def _server_timing(stats: QueryStats, repeated: List[Tuple[str, int]]) -> bytes:
+    entries = [f'db;desc="{stats.count} queries";dur={stats.duration * 1000:.2f}']
+    if repeated:
+        entries.append(f'db-repeat;desc="{len(repeated)} repeated statements"')
+    return ", ".join(entries).encode("latin-1")
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware that activates query counting for each HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not QUERY_STATS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(route=f"{scope['method']} {scope['path']}")
+        token = _current_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                repeated = stats.repeated_statements()
+                for statement, times in repeated:
+                    logger.warning(
+                        "Possible N+1 on %s %s: statement executed %d times with different parameters: %s",
+                        scope["method"], scope["path"], times, " ".join(statement.split())[:300],
+                    )
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(stats, repeated)))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_stats.reset(token)
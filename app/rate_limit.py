@@ -0,0 +1,60 @@
+"""In-process token-bucket rate limiting."""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets holding up to `capacity` tokens, refilled at `refill_per_second`.
+
+    The number of tracked keys is bounded; the least recently used buckets are
+    evicted first, which at worst grants an evicted key a fresh bucket.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float, max_keys: int = 10000):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        """Take one token for `key`. Returns 0 on success, otherwise seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.capacity, now]
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                tokens, last = bucket
+                bucket[0] = min(self.capacity, tokens + (now - last) * self.refill_per_second)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.refill_per_second
+
+    def reset(self, key: str):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+# Login attempts: a burst per source address (shared tills) and a tighter one per account
+LOGIN_IP_BURST = int(os.environ.get("LOGIN_IP_BURST", "30"))
+LOGIN_IP_PER_MINUTE = float(os.environ.get("LOGIN_IP_PER_MINUTE", "30"))
+LOGIN_EMAIL_BURST = int(os.environ.get("LOGIN_EMAIL_BURST", "5"))
+LOGIN_EMAIL_PER_MINUTE = float(os.environ.get("LOGIN_EMAIL_PER_MINUTE", "5"))
+
+login_ip_limiter = TokenBucketLimiter(LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE / 60)
+login_email_limiter = TokenBucketLimiter(LOGIN_EMAIL_BURST, LOGIN_EMAIL_PER_MINUTE / 60)
+
+
+def check_login_allowed(client_ip: str, email: str) -> int:
+    """Return 0 if a login attempt may proceed, otherwise the Retry-After seconds."""
+    wait = max(login_ip_limiter.acquire(client_ip), login_email_limiter.acquire(email.lower()))
+    return int(math.ceil(wait))
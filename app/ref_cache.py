@@ -0,0 +1,146 @@
+"""Read-through cache for small, rarely changing reference tables.
+
+Categories, units, outlets, cashier stations and the default printer and
+invoice template of an outlet are looked up on hot paths (product creation,
+shift opening, every invoice print). Lookups go through ``ref_cache``, keyed
+by kind, organization and id, and cache immutable row snapshots. "Not found"
+is cached too, but only for REF_CACHE_MISS_TTL_SECONDS, since rows can be
+created by paths that do not invalidate (imports, other processes). The
+routers that write these tables invalidate the affected entries after
+committing.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+
+REF_CACHE_MAX_ENTRIES = int(os.environ.get("REF_CACHE_MAX_ENTRIES", "10000"))
+REF_CACHE_MISS_TTL_SECONDS = float(os.environ.get("REF_CACHE_MISS_TTL_SECONDS", "5"))
+
+# Units are shared by all organizations
+GLOBAL_SCOPE = ""
+
+
+class RefCache:
+    """LRU of (kind, organization_id, key) -> row snapshot or None, with per-kind hit/miss counters."""
+
+    def __init__(self, max_entries: int = REF_CACHE_MAX_ENTRIES, miss_ttl_seconds: float = REF_CACHE_MISS_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.miss_ttl_seconds = miss_ttl_seconds
+        # Values are (row, None) or (None, monotonic expiry) for "not found"
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+        # Bumped by every invalidation; a load that raced with one is not stored
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, organization_id: str, key: Hashable, load: Callable[[], Any]) -> Any:
+        cache_key = (kind, organization_id, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                self._entries.move_to_end(cache_key)
+                self._hits[kind] = self._hits.get(kind, 0) + 1
+                return entry[0]
+            self._misses[kind] = self._misses.get(kind, 0) + 1
+            generation = self._generation
+        value = load()
+        with self._lock:
+            if generation == self._generation:
+                self._entries[cache_key] = (value, None if value is not None else time.monotonic() + self.miss_ttl_seconds)
+                self._entries.move_to_end(cache_key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, kind: str, organization_id: str, key: Optional[Hashable] = None):
+        """Drop one entry, or every entry of `kind` for the organization when `key` is None."""
+        with self._lock:
+            self._generation += 1
+            if key is not None:
+                self._entries.pop((kind, organization_id, key), None)
+                return
+            for cache_key in [k for k in self._entries if k[0] == kind and k[1] == organization_id]:
+                del self._entries[cache_key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            sizes: Dict[str, int] = {}
+            for kind, _, _ in self._entries:
+                sizes[kind] = sizes.get(kind, 0) + 1
+            kinds = sorted(set(self._hits) | set(self._misses) | set(sizes))
+            return {
+                "max_entries": self.max_entries,
+                "size": len(self._entries),
+                "kinds": {
+                    kind: {
+                        "hits": self._hits.get(kind, 0),
+                        "misses": self._misses.get(kind, 0),
+                        "size": sizes.get(kind, 0),
+                    }
+                    for kind in kinds
+                },
+            }
+
+
+ref_cache = RefCache()
+
+
+def _first(db: Session, model, *criteria):
+    return db.execute(select(*model.__table__.columns).where(*criteria).limit(1)).first()
+
+
+def get_category(db: Session, organization_id: str, category_id: int):
+    return ref_cache.get("category", organization_id, category_id, lambda: _first(
+        db, models.Category, models.Category.id == category_id, models.Category.organization_id == organization_id))
+
+
+def get_unit(db: Session, unit_id: int):
+    return ref_cache.get("unit", GLOBAL_SCOPE, unit_id, lambda: _first(db, models.Unit, models.Unit.id == unit_id))
+
+
+def get_outlet(db: Session, organization_id: str, outlet_id: int):
+    return ref_cache.get("outlet", organization_id, outlet_id, lambda: _first(
+        db, models.Outlet, models.Outlet.id == outlet_id, models.Outlet.organization_id == organization_id))
+
+
+def get_cashier_station(db: Session, organization_id: str, station_id: int):
+    return ref_cache.get("cashier_station", organization_id, station_id, lambda: _first(
+        db, models.CashierStation, models.CashierStation.id == station_id,
+        models.CashierStation.organization_id == organization_id))
+
+
+def _outlet_in_organization(outlet_id: int, organization_id: str):
+    return select(models.Outlet.id).where(models.Outlet.id == outlet_id, models.Outlet.organization_id == organization_id).exists()
+
+
+def get_default_printer(db: Session, organization_id: str, outlet_id: int, printer_type: Optional[str] = None):
+    """The outlet's default printer, of `printer_type` if given."""
+    def load():
+        criteria = [
+            models.PrinterSettings.outlet_id == outlet_id,
+            models.PrinterSettings.is_default == True,
+            _outlet_in_organization(outlet_id, organization_id),
+        ]
+        if printer_type is not None:
+            criteria.append(models.PrinterSettings.printer_type == printer_type)
+        return _first(db, models.PrinterSettings, *criteria)
+    return ref_cache.get("default_printer", organization_id, (outlet_id, printer_type), load)
+
+
+def get_default_template(db: Session, organization_id: str, outlet_id: int):
+    return ref_cache.get("default_template", organization_id, outlet_id, lambda: _first(
+        db, models.InvoiceTemplate, models.InvoiceTemplate.outlet_id == outlet_id,
+        models.InvoiceTemplate.is_default == True, _outlet_in_organization(outlet_id, organization_id)))
@@ -0,0 +1,239 @@
+"""Sales reports bucketed by time and grouped by a dimension.
+
+Day, week and month buckets grouped by outlet, cashier, product or category
+are read from the daily rollups (app.sales_rollup), a few thousand rows for a
+year. Hour buckets and payment-method grouping are not in the rollups and are
+aggregated from ``sales`` over the (organization_id, created_at) index, with
+the same revenue, discount and tax allocation as the rollups. ``net_total``
+is ``revenue + tax - discount``, as ``Sale.net_total``. Buckets are UTC.
+
+Grouped by product or category, ``sale_count`` is summed over products: a
+sale with two products of a category counts twice in that category's row.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+
+from sqlalchemy import case, distinct, func, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import Date, DateTime
+
+from . import models
+from .sales_rollup import product_totals, sale_totals, utc_day
+
+BUCKETS = ("hour", "day", "week", "month")
+GROUP_BYS = ("outlet", "product", "category", "cashier", "payment_method")
+PROFIT_GROUP_BYS = ("outlet", "product", "category")
+MEASURES = ("quantity", "revenue", "cost", "discount", "tax", "sale_count")
+
+
+class week_start(FunctionElement):
+    """Monday of the week of a date."""
+    type = Date()
+    inherit_cache = True
+
+
+class month_start(FunctionElement):
+    """First day of the month of a date."""
+    type = Date()
+    inherit_cache = True
+
+
+class utc_hour(FunctionElement):
+    """UTC hour of a timestamp."""
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(week_start)
+def _compile_week_start(element, compiler, **kw):
+    return "CAST(date_trunc('week', %s) AS DATE)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(week_start, "sqlite")
+def _compile_week_start_sqlite(element, compiler, **kw):
+    # Forward to Sunday, then back to its Monday
+    return "date(%s, 'weekday 0', '-6 days')" % compiler.process(element.clauses, **kw)
+
+
+@compiles(month_start)
+def _compile_month_start(element, compiler, **kw):
+    return "CAST(date_trunc('month', %s) AS DATE)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(month_start, "sqlite")
+def _compile_month_start_sqlite(element, compiler, **kw):
+    return "date(%s, 'start of month')" % compiler.process(element.clauses, **kw)
+
+
+@compiles(utc_hour)
+def _compile_utc_hour(element, compiler, **kw):
+    return "date_trunc('hour', timezone('UTC', %s))" % compiler.process(element.clauses, **kw)
+
+
+@compiles(utc_hour, "sqlite")
+def _compile_utc_hour_sqlite(element, compiler, **kw):
+    return "strftime('%%Y-%%m-%%d %%H:00:00', %s)" % compiler.process(element.clauses, **kw)
+
+
+def _day_bucket(bucket: str, day):
+    if bucket == "week":
+        return week_start(day)
+    if bucket == "month":
+        return month_start(day)
+    return day
+
+
+def _bucket_label(value) -> str:
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value).replace(" ", "T")
+
+
+def uses_rollups(bucket: str, group_by: Optional[str]) -> bool:
+    return bucket != "hour" and group_by != "payment_method"
+
+
+def _rollup_query(organization_id: str, date_from: date, date_to: date, bucket: str,
+                  group_by: Optional[str], outlet_id: Optional[int]):
+    rollup = models.DailyProductSales if group_by in ("product", "category") else models.DailyCashierSales
+    keys = [_day_bucket(bucket, rollup.day)]
+    joins = []
+    if group_by == "outlet":
+        keys += [rollup.outlet_id, models.Outlet.name]
+        joins.append((models.Outlet, models.Outlet.id == rollup.outlet_id))
+    elif group_by == "cashier":
+        keys += [rollup.user_id, models.User.name]
+        joins.append((models.User, models.User.id == rollup.user_id))
+    elif group_by == "product":
+        keys += [rollup.product_id, models.Product.name]
+        joins.append((models.Product, models.Product.id == rollup.product_id))
+    elif group_by == "category":
+        keys += [models.Product.category_id, models.Category.name]
+        joins.append((models.Product, models.Product.id == rollup.product_id))
+        joins.append((models.Category, models.Category.id == models.Product.category_id))
+    query = select(*keys, *(func.sum(getattr(rollup, measure)).label(measure) for measure in MEASURES)).select_from(rollup)
+    for target, onclause in joins:
+        query = query.outerjoin(target, onclause)
+    criteria = [rollup.organization_id == organization_id, rollup.day >= date_from, rollup.day <= date_to]
+    if outlet_id is not None:
+        criteria.append(rollup.outlet_id == outlet_id)
+    return query.where(*criteria).group_by(*keys).order_by(*keys[:2])
+
+
+def _sale_criteria(organization_id: str, date_from: date, date_to: date, outlet_id: Optional[int]):
+    sale = models.Sale
+    criteria = [
+        sale.organization_id == organization_id,
+        sale.created_at >= datetime.combine(date_from, time.min),
+        sale.created_at < datetime.combine(date_to + timedelta(days=1), time.min),
+    ]
+    if outlet_id is not None:
+        criteria.append(sale.outlet_id == outlet_id)
+    return criteria
+
+
+def _sales_query(organization_id: str, date_from: date, date_to: date, bucket: str,
+                 group_by: Optional[str], outlet_id: Optional[int]):
+    sale = models.Sale
+    criteria = _sale_criteria(organization_id, date_from, date_to, outlet_id)
+    keys = [utc_hour(sale.created_at) if bucket == "hour" else _day_bucket(bucket, utc_day(sale.created_at))]
+
+    if group_by == "payment_method":
+        # A sale paid in parts counts under each method with the linked amount
+        method = func.coalesce(models.Payment.method, sale.sale_type)
+        amount = case((models.SalePayment.id.isnot(None), models.SalePayment.amount), else_=sale.net_total)
+        keys += [method, method]
+        return (
+            select(*keys, func.sum(amount).label("net_total"), func.count(distinct(sale.id)).label("sale_count"))
+            .select_from(sale)
+            .outerjoin(models.SalePayment, models.SalePayment.sale_id == sale.id)
+            .outerjoin(models.Payment, models.Payment.id == models.SalePayment.payment_id)
+            .where(*criteria).group_by(*keys[:2]).order_by(*keys[:2])
+        )
+
+    joins = []
+    if group_by == "outlet":
+        keys += [sale.outlet_id, models.Outlet.name]
+        joins.append((models.Outlet, models.Outlet.id == sale.outlet_id))
+    elif group_by == "cashier":
+        keys += [sale.user_id, models.User.name]
+        joins.append((models.User, models.User.id == sale.user_id))
+    elif group_by == "product":
+        keys += [models.SaleItem.product_id, models.Product.name]
+        joins.append((models.Product, models.Product.id == models.SaleItem.product_id))
+    elif group_by == "category":
+        keys += [models.Product.category_id, models.Category.name]
+        joins.append((models.Product, models.Product.id == models.SaleItem.product_id))
+        joins.append((models.Category, models.Category.id == models.Product.category_id))
+    totals = product_totals if group_by in ("product", "category") else sale_totals
+    query = totals(keys, criteria)
+    for target, onclause in joins:
+        query = query.outerjoin(target, onclause)
+    return query.order_by(*keys[:2])
+
+
+def sales_report(db: Session, organization_id: str, date_from: date, date_to: date, bucket: str = "day",
+                 group_by: Optional[str] = None, outlet_id: Optional[int] = None) -> List[dict]:
+    """One row per bucket (and group key) with at least one sale, ordered by bucket then key."""
+    build = _rollup_query if uses_rollups(bucket, group_by) else _sales_query
+    rows = []
+    for row in db.execute(build(organization_id, date_from, date_to, bucket, group_by, outlet_id)):
+        values = row._mapping
+        result = {
+            "bucket": _bucket_label(row[0]),
+            "key": row[1] if group_by else None,
+            "label": row[2] if group_by else None,
+            "sale_count": values["sale_count"],
+        }
+        if "net_total" in values:
+            result["net_total"] = values["net_total"]
+        else:
+            result.update({measure: values[measure] for measure in MEASURES})
+            result["net_total"] = values["revenue"] + values["tax"] - values["discount"]
+        rows.append(result)
+    return rows
+
+
+def gross_profit_report(db: Session, organization_id: str, date_from: date, date_to: date, bucket: str = "month",
+                        group_by: Optional[str] = None, outlet_id: Optional[int] = None) -> List[dict]:
+    """Quantity, revenue and gross profit per bucket (and group key), summed in SQL from sale items.
+
+    Profit is ``SaleItem.profit``: lines without a recorded cost count as no profit.
+    """
+    sale, item = models.Sale, models.SaleItem
+    keys = [utc_hour(sale.created_at) if bucket == "hour" else _day_bucket(bucket, utc_day(sale.created_at))]
+    joins = []
+    if group_by == "outlet":
+        keys += [sale.outlet_id, models.Outlet.name]
+        joins.append((models.Outlet, models.Outlet.id == sale.outlet_id))
+    elif group_by == "product":
+        keys += [item.product_id, models.Product.name]
+        joins.append((models.Product, models.Product.id == item.product_id))
+    elif group_by == "category":
+        keys += [models.Product.category_id, models.Category.name]
+        joins.append((models.Product, models.Product.id == item.product_id))
+        joins.append((models.Category, models.Category.id == models.Product.category_id))
+    query = select(
+        *keys,
+        func.sum(item.quantity).label("quantity"),
+        func.sum(item.total).label("revenue"),
+        func.sum(item.profit).label("gross_profit"),
+    ).select_from(sale).join(item, item.sale_id == sale.id)
+    for target, onclause in joins:
+        query = query.outerjoin(target, onclause)
+    query = query.where(*_sale_criteria(organization_id, date_from, date_to, outlet_id)).group_by(*keys).order_by(*keys[:2])
+    rows = []
+    for row in db.execute(query):
+        revenue, gross_profit = row.revenue or 0.0, row.gross_profit or 0.0
+        rows.append({
+            "bucket": _bucket_label(row[0]),
+            "key": row[1] if group_by else None,
+            "label": row[2] if group_by else None,
+            "quantity": row.quantity,
+            "revenue": revenue,
+            "gross_profit": gross_profit,
+            "margin": gross_profit / revenue * 100 if revenue else 0.0,
+        })
+    return rows
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+from .. import auth
+from ..slow_queries import aggregate_slow_queries, SLOW_QUERY_THRESHOLD_MS
+from ..ref_cache import ref_cache
+
+router = APIRouter()
+
+@router.get("/admin/slow-queries")
+def read_slow_queries(limit: int = 50, current_user: auth.Principal = Depends(auth.check_role("admin"))):
+    """Slow statements from the local slow-query log, aggregated by fingerprint."""
+    return {
+        "threshold_ms": SLOW_QUERY_THRESHOLD_MS,
+        "queries": aggregate_slow_queries(limit),
+    }
+
+@router.get("/admin/ref-cache")
+def read_ref_cache_stats(current_user: auth.Principal = Depends(auth.check_role("admin"))):
+    """Size and per-kind hit/miss counters of the reference-data cache."""
+    return ref_cache.stats()
@@ -1,9 +1,14 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 from ..database import SessionLocal
 from .. import models, schemas, auth
+from ..token_revocation import is_revoked, revoke_token
+from ..rate_limit import check_login_allowed, login_email_limiter
 
 router = APIRouter()
 
@@ -15,9 +20,17 @@ def get_db():
         db.close()
 
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(user: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login_for_access_token(user: schemas.UserLogin, request: Request):
+    # Throttle before any bcrypt work so bursts cannot starve the hashing pool
+    retry_after = check_login_allowed(request.client.host if request.client else "unknown", user.email)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts. Please try again later.",
+            headers={"Retry-After": str(retry_after)},
+        )
     try:
-        authenticated_user = auth.authenticate_user(db, user.email, user.password)
+        authenticated_user = await auth.authenticate_user_async(user.email, user.password)
         if not authenticated_user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -25,10 +38,10 @@ def login_for_access_token(user: schemas.UserLogin, db: Session = Depends(get_db
                 headers={"WWW-Authenticate": "Bearer"},
             )
         access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = auth.create_access_token(
-            data={"sub": authenticated_user.email}, expires_delta=access_token_expires
-        )
-        refresh_token = auth.create_refresh_token(data={"sub": authenticated_user.email})
+        login_email_limiter.reset(user.email.lower())
+        claims = auth.token_claims(authenticated_user)
+        access_token = auth.create_access_token(data=claims, expires_delta=access_token_expires)
+        refresh_token = auth.create_refresh_token(data=claims)
         return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
     except Exception as e:
         # Handle any unexpected errors (e.g., database issues) gracefully
@@ -38,8 +51,7 @@ def login_for_access_token(user: schemas.UserLogin, db: Session = Depends(get_db
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-@router.post("/register", response_model=schemas.UserResponse)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+def _registration_outlet(db: Session, user: schemas.UserCreate) -> models.Outlet:
     # Check if user already exists
     db_user = db.query(models.User).filter(models.User.email == user.email).first()
     if db_user:
@@ -56,19 +68,29 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         outlet = db.query(models.Outlet).filter(models.Outlet.id == user.outlet_id).first()
         if not outlet:
             raise HTTPException(status_code=404, detail="Outlet not found")
+    return outlet
 
-    # Hash the password
-    hashed_password = auth.get_password_hash(user.password)
-    user_data = user.dict()
-    user_data["password"] = hashed_password
-    user_data["organization_id"] = outlet.organization_id
-
+def _insert_user(db: Session, user_data: dict) -> models.User:
     db_user = models.User(**user_data)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    # The id may be one a deleted user had; replace its "deleted" mark
+    auth.publish_token_version(db_user)
     return db_user
 
+@router.post("/register", response_model=schemas.UserResponse)
+async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    # Database work runs on the threadpool and bcrypt on the hashing pool, like login
+    outlet = await run_in_threadpool(_registration_outlet, db, user)
+
+    # Hash the password
+    hashed_password = await auth.get_password_hash_async(user.password)
+    user_data = user.dict()
+    user_data["password"] = hashed_password
+    user_data["organization_id"] = outlet.organization_id
+    return await run_in_threadpool(_insert_user, db, user_data)
+
 @router.post("/refresh", response_model=schemas.Token)
 def refresh_access_token(refresh_token: str, db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
@@ -84,16 +106,42 @@ def refresh_access_token(refresh_token: str, db: Session = Depends(get_db)):
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    if is_revoked(payload.get("jti")):
+        raise credentials_exception
     user = db.query(models.User).filter(models.User.email == email).first()
     if user is None:
         raise credentials_exception
+    if "ver" in payload and payload["ver"] != (user.token_version or 0):
+        raise credentials_exception
+    # Rotation: the presented refresh token cannot be used again; of two concurrent uses only one wins
+    if not revoke_token(db, payload):
+        raise credentials_exception
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = auth.create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-    new_refresh_token = auth.create_refresh_token(data={"sub": user.email})
+    claims = auth.token_claims(user)
+    access_token = auth.create_access_token(data=claims, expires_delta=access_token_expires)
+    new_refresh_token = auth.create_refresh_token(data=claims)
     return {"access_token": access_token, "refresh_token": new_refresh_token, "token_type": "bearer"}
 
+@router.post("/logout")
+def logout(refresh_token: Optional[str] = None, credentials: HTTPAuthorizationCredentials = Depends(auth.security), db: Session = Depends(get_db)):
+    """Revoke the presented access token and, if given, the matching refresh token."""
+    for token in (credentials.credentials, refresh_token):
+        if not token:
+            continue
+        try:
+            payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+        except JWTError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        revoke_token(db, payload)
+    return {"message": "Logged out"}
+
 @router.get("/me", response_model=schemas.UserResponse)
-def read_users_me(current_user: models.User = Depends(auth.get_current_active_user)):
-    return current_user
+def read_users_me(db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
+    user = db.query(models.User).filter(models.User.id == current_user.id).first()
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from ..database import SessionLocal
 from .. import models, schemas, auth
+from ..pagination import paginate
+from ..ref_cache import get_cashier_station, get_outlet
 
 router = APIRouter()
 
@@ -14,8 +16,8 @@ def get_db():
         db.close()
 
 @router.get("/cashier-shifts/", response_model=List[schemas.CashierShiftResponse])
-def read_cashier_shifts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    shifts = db.query(models.CashierShift).filter(models.CashierShift.organization_id == current_user.organization_id).offset(skip).limit(limit).all()
+def read_cashier_shifts(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    shifts = paginate(db.query(models.CashierShift).filter(models.CashierShift.organization_id == current_user.organization_id), models.CashierShift.id, response, limit, cursor, skip, descending=True)
     return shifts
 
 @router.get("/cashier-shifts/{shift_id}", response_model=schemas.CashierShiftResponse)
@@ -33,12 +35,12 @@ def create_cashier_shift(shift: schemas.CashierShiftCreate, db: Session = Depend
         raise HTTPException(status_code=400, detail=f"User with id {shift.user_id} does not exist")
 
     # Check if cashier station exists
-    station = db.query(models.CashierStation).filter(models.CashierStation.id == shift.cashier_station_id, models.CashierStation.organization_id == current_user.organization_id).first()
+    station = get_cashier_station(db, current_user.organization_id, shift.cashier_station_id)
     if not station:
         raise HTTPException(status_code=400, detail=f"Cashier station with id {shift.cashier_station_id} does not exist")
 
     # Check if outlet exists
-    outlet = db.query(models.Outlet).filter(models.Outlet.id == shift.outlet_id, models.Outlet.organization_id == current_user.organization_id).first()
+    outlet = get_outlet(db, current_user.organization_id, shift.outlet_id)
     if not outlet:
         raise HTTPException(status_code=400, detail=f"Outlet with id {shift.outlet_id} does not exist")
 
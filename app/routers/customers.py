@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from ..database import SessionLocal
 from .. import models, schemas, auth
+from ..pagination import paginate
 
 router = APIRouter()
 
@@ -15,8 +16,8 @@ def get_db():
 
 # ✅ Clean paths: just "/" or "/{id}"
 @router.get("/", response_model=List[schemas.CustomerResponse])
-def read_customers(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    customers = db.query(models.Customer).filter(models.Customer.organization_id == current_user.organization_id).offset(skip).limit(limit).all()
+def read_customers(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    customers = paginate(db.query(models.Customer).filter(models.Customer.organization_id == current_user.organization_id), models.Customer.id, response, limit, cursor, skip)
     return customers
 
 @router.get("/{customer_id}", response_model=schemas.CustomerResponse)
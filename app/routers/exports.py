@@ -0,0 +1,47 @@
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from ..database import engine
+from .. import models, auth
+from ..exports import EXPORT_FORMATS, stream_export
+
+router = APIRouter()
+
+def _export_response(statement, export_format: str, name: str):
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    return StreamingResponse(
+        stream_export(engine, statement, export_format),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{export_format}"'},
+    )
+
+@router.get("/exports/products")
+def export_products(format: str = "csv", current_user: auth.Principal = Depends(auth.check_role("admin"))):
+    statement = (
+        select(*models.Product.__table__.columns)
+        .where(models.Product.organization_id == current_user.organization_id)
+        .order_by(models.Product.id)
+    )
+    return _export_response(statement, format, "products")
+
+@router.get("/exports/sales")
+def export_sales(
+    format: str = "csv",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    outlet_id: Optional[int] = None,
+    current_user: auth.Principal = Depends(auth.check_role("admin")),
+):
+    """Sales of the organization, optionally limited to [date_from, date_to] (inclusive) and one outlet."""
+    sale = models.Sale
+    statement = select(*sale.__table__.columns).where(sale.organization_id == current_user.organization_id)
+    if outlet_id is not None:
+        statement = statement.where(sale.outlet_id == outlet_id)
+    if date_from is not None:
+        statement = statement.where(sale.created_at >= datetime.combine(date_from, time.min))
+    if date_to is not None:
+        statement = statement.where(sale.created_at < datetime.combine(date_to + timedelta(days=1), time.min))
+    return _export_response(statement.order_by(sale.created_at, sale.id), format, "sales")
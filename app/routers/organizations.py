@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from ..database import get_db
 from ..models import Organization
 from ..schemas import OrganizationCreate, OrganizationUpdate, OrganizationResponse
 from ..auth import get_current_user
+from ..pagination import paginate
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -45,12 +46,14 @@ def create_organization(
 
 @router.get("/", response_model=List[OrganizationResponse])
 def read_organizations(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    organizations = db.query(Organization).offset(skip).limit(limit).all()
+    organizations = paginate(db.query(Organization), Organization.id, response, limit, cursor, skip)
     return organizations
 
 @router.get("/{organization_id}", response_model=OrganizationResponse)
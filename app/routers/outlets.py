@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from ..database import SessionLocal
 from .. import models, schemas, auth
+from ..pagination import paginate
+from ..invoice import invoice_cache
+from ..ref_cache import ref_cache
 
 router = APIRouter()
 
@@ -14,8 +17,8 @@ def get_db():
         db.close()
 
 @router.get("/outlets/", response_model=List[schemas.OutletResponse])
-def read_outlets(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    outlets = db.query(models.Outlet).filter(models.Outlet.organization_id == current_user.organization_id).offset(skip).limit(limit).all()
+def read_outlets(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    outlets = paginate(db.query(models.Outlet).filter(models.Outlet.organization_id == current_user.organization_id), models.Outlet.id, response, limit, cursor, skip)
     return outlets
 
 @router.get("/outlets/{outlet_id}", response_model=schemas.OutletResponse)
@@ -33,6 +36,7 @@ def create_outlet(outlet: schemas.OutletCreate, db: Session = Depends(get_db), c
     db.add(db_outlet)
     db.commit()
     db.refresh(db_outlet)
+    ref_cache.invalidate("outlet", current_user.organization_id, db_outlet.id)
     return db_outlet
 
 @router.put("/outlets/{outlet_id}", response_model=schemas.OutletResponse)
@@ -44,6 +48,8 @@ def update_outlet(outlet_id: int, outlet: schemas.OutletUpdate, db: Session = De
         setattr(db_outlet, key, value)
     db.commit()
     db.refresh(db_outlet)
+    ref_cache.invalidate("outlet", current_user.organization_id, outlet_id)
+    invoice_cache.invalidate_templates(current_user.organization_id)
     return db_outlet
 
 @router.delete("/outlets/{outlet_id}")
@@ -53,11 +59,15 @@ def delete_outlet(outlet_id: int, db: Session = Depends(get_db), current_user: m
         raise HTTPException(status_code=404, detail="Outlet not found")
     db.delete(db_outlet)
     db.commit()
+    ref_cache.invalidate("outlet", current_user.organization_id, outlet_id)
+    ref_cache.invalidate("default_printer", current_user.organization_id)
+    ref_cache.invalidate("default_template", current_user.organization_id)
+    invoice_cache.invalidate_templates(current_user.organization_id)
     return {"message": "Outlet deleted"}
 
 @router.get("/cashier-stations/", response_model=List[schemas.CashierStationResponse])
-def read_cashier_stations(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    stations = db.query(models.CashierStation).filter(models.CashierStation.organization_id == current_user.organization_id).offset(skip).limit(limit).all()
+def read_cashier_stations(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    stations = paginate(db.query(models.CashierStation).filter(models.CashierStation.organization_id == current_user.organization_id), models.CashierStation.id, response, limit, cursor, skip)
     return stations
 
 @router.get("/cashier-stations/{station_id}", response_model=schemas.CashierStationResponse)
@@ -75,6 +85,7 @@ def create_cashier_station(station: schemas.CashierStationCreate, db: Session =
     db.add(db_station)
     db.commit()
     db.refresh(db_station)
+    ref_cache.invalidate("cashier_station", current_user.organization_id, db_station.id)
     return db_station
 
 @router.put("/cashier-stations/{station_id}", response_model=schemas.CashierStationResponse)
@@ -86,6 +97,7 @@ def update_cashier_station(station_id: int, station: schemas.CashierStationUpdat
         setattr(db_station, key, value)
     db.commit()
     db.refresh(db_station)
+    ref_cache.invalidate("cashier_station", current_user.organization_id, station_id)
     return db_station
 
 @router.delete("/cashier-stations/{station_id}")
@@ -95,4 +107,5 @@ def delete_cashier_station(station_id: int, db: Session = Depends(get_db), curre
         raise HTTPException(status_code=404, detail="Cashier Station not found")
     db.delete(db_station)
     db.commit()
+    ref_cache.invalidate("cashier_station", current_user.organization_id, station_id)
     return {"message": "Cashier Station deleted"}
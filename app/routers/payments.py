@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from ..database import SessionLocal
 from .. import models, schemas, auth
+from ..pagination import paginate
 
 router = APIRouter()
 
@@ -14,8 +15,8 @@ def get_db():
         db.close()
 
 @router.get("/payments/", response_model=List[schemas.PaymentResponse])
-def read_payments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    payments = db.query(models.Payment).filter(models.Payment.organization_id == current_user.organization_id).offset(skip).limit(limit).all()
+def read_payments(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    payments = paginate(db.query(models.Payment).filter(models.Payment.organization_id == current_user.organization_id), models.Payment.id, response, limit, cursor, skip, descending=True)
     return payments
 
 @router.get("/payments/{payment_id}", response_model=schemas.PaymentResponse)
@@ -81,8 +82,8 @@ def delete_payment(payment_id: int, db: Session = Depends(get_db), current_user:
     return {"message": "Payment deleted"}
 
 @router.get("/sale-payments/", response_model=List[schemas.SalePaymentResponse])
-def read_sale_payments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    sale_payments = db.query(models.SalePayment).join(models.Sale).filter(models.Sale.organization_id == current_user.organization_id).offset(skip).limit(limit).all()
+def read_sale_payments(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    sale_payments = paginate(db.query(models.SalePayment).join(models.Sale).filter(models.Sale.organization_id == current_user.organization_id), models.SalePayment.id, response, limit, cursor, skip, descending=True)
     return sale_payments
 
 @router.get("/sale-payments/{sale_payment_id}", response_model=schemas.SalePaymentResponse)
@@ -1,8 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, UploadFile, File
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from ..database import SessionLocal
 from .. import models, schemas, auth
+from ..pagination import paginate
+from ..product_search import search_products
+from ..barcode_index import BarcodeRecord, barcode_index, lookup_barcode
+from ..low_stock import low_stock, low_stock_events
+from ..catalog_version import (
+    UNITS_KEY, add_tombstone, bump_all_catalog_versions, bump_catalog_version, catalog_etag,
+    current_catalog_version, not_modified,
+)
+from ..pricing import reprice_expression
+from ..ref_cache import GLOBAL_SCOPE, get_category, get_unit, ref_cache
+from ..catalog_import import import_catalog, iter_csv_rows, iter_xlsx_rows
 
 router = APIRouter()
 
@@ -14,8 +29,11 @@ def get_db():
         db.close()
 
 @router.get("/categories/", response_model=List[schemas.CategoryResponse])
-def read_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    categories = db.query(models.Category).filter(models.Category.organization_id == current_user.organization_id).offset(skip).limit(limit).all()
+def read_categories(request: Request, response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    cached = not_modified(request, response, catalog_etag(db, current_user.organization_id, "categories"))
+    if cached is not None:
+        return cached
+    categories = paginate(db.query(models.Category).filter(models.Category.organization_id == current_user.organization_id), models.Category.id, response, limit, cursor, skip)
     return categories
 
 @router.get("/categories/{category_id}", response_model=schemas.CategoryResponse)
@@ -31,8 +49,10 @@ def create_category(category: schemas.CategoryCreate, db: Session = Depends(get_
     category_data["organization_id"] = current_user.organization_id
     db_category = models.Category(**category_data)
     db.add(db_category)
+    bump_catalog_version(db, current_user.organization_id)
     db.commit()
     db.refresh(db_category)
+    ref_cache.invalidate("category", current_user.organization_id, db_category.id)
     return db_category
 
 @router.put("/categories/{category_id}", response_model=schemas.CategoryResponse)
@@ -42,8 +62,10 @@ def update_category(category_id: int, category: schemas.CategoryUpdate, db: Sess
         raise HTTPException(status_code=404, detail="Category not found")
     for key, value in category.dict(exclude_unset=True).items():
         setattr(db_category, key, value)
+    bump_catalog_version(db, current_user.organization_id)
     db.commit()
     db.refresh(db_category)
+    ref_cache.invalidate("category", current_user.organization_id, category_id)
     return db_category
 
 @router.delete("/categories/{category_id}")
@@ -52,12 +74,17 @@ def delete_category(category_id: int, db: Session = Depends(get_db), current_use
     if db_category is None:
         raise HTTPException(status_code=404, detail="Category not found")
     db.delete(db_category)
+    bump_catalog_version(db, current_user.organization_id)
     db.commit()
+    ref_cache.invalidate("category", current_user.organization_id, category_id)
     return {"message": "Category deleted"}
 
 @router.get("/units/", response_model=List[schemas.UnitResponse])
-def read_units(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    units = db.query(models.Unit).offset(skip).limit(limit).all()
+def read_units(request: Request, response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    cached = not_modified(request, response, catalog_etag(db, UNITS_KEY, "units"))
+    if cached is not None:
+        return cached
+    units = paginate(db.query(models.Unit), models.Unit.id, response, limit, cursor, skip)
     return units
 
 @router.get("/units/{unit_id}", response_model=schemas.UnitResponse)
@@ -71,8 +98,10 @@ def read_unit(unit_id: int, db: Session = Depends(get_db)):
 def create_unit(unit: schemas.UnitCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.check_role("admin"))):
     db_unit = models.Unit(**unit.dict())
     db.add(db_unit)
+    bump_all_catalog_versions(db)
     db.commit()
     db.refresh(db_unit)
+    ref_cache.invalidate("unit", GLOBAL_SCOPE, db_unit.id)
     return db_unit
 
 @router.put("/units/{unit_id}", response_model=schemas.UnitResponse)
@@ -82,8 +111,10 @@ def update_unit(unit_id: int, unit: schemas.UnitUpdate, db: Session = Depends(ge
         raise HTTPException(status_code=404, detail="Unit not found")
     for key, value in unit.dict(exclude_unset=True).items():
         setattr(db_unit, key, value)
+    bump_all_catalog_versions(db)
     db.commit()
     db.refresh(db_unit)
+    ref_cache.invalidate("unit", GLOBAL_SCOPE, unit_id)
     return db_unit
 
 @router.delete("/units/{unit_id}")
@@ -92,14 +123,67 @@ def delete_unit(unit_id: int, db: Session = Depends(get_db), current_user: model
     if db_unit is None:
         raise HTTPException(status_code=404, detail="Unit not found")
     db.delete(db_unit)
+    bump_all_catalog_versions(db)
     db.commit()
+    ref_cache.invalidate("unit", GLOBAL_SCOPE, unit_id)
     return {"message": "Unit deleted"}
 
 @router.get("/products/", response_model=List[schemas.ProductResponse])
-def read_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    products = db.query(models.Product).filter(models.Product.organization_id == current_user.organization_id).offset(skip).limit(limit).all()
+def read_products(request: Request, response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    cached = not_modified(request, response, catalog_etag(db, current_user.organization_id, "products", include_stock=True))
+    if cached is not None:
+        return cached
+    products = paginate(db.query(models.Product).filter(models.Product.organization_id == current_user.organization_id), models.Product.id, response, limit, cursor, skip)
     return products
 
+@router.get("/products/search", response_model=List[schemas.ProductResponse])
+def search_products_endpoint(q: str, limit: int = 20, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
+    if limit < 1 or limit > 100:
+        raise HTTPException(status_code=400, detail="Invalid limit")
+    return search_products(db, current_user.organization_id, q, limit)
+
+@router.get("/products/by-barcode/{code}", response_model=schemas.ProductBarcodeResponse)
+async def read_product_by_barcode(code: str, current_user: auth.Principal = Depends(auth.get_current_active_user_async)):
+    # Served from memory on the event loop; only an index miss goes to the database
+    record = barcode_index.lookup(current_user.organization_id, code)
+    if record is None:
+        record = await run_in_threadpool(lookup_barcode, current_user.organization_id, code)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return record._asdict()
+
+@router.get("/products/low-stock", response_model=List[schemas.ProductLowStockResponse])
+def read_low_stock_products(db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
+    """Products at or below their reorder level, most urgent first."""
+    return [record._asdict() for record in low_stock.products(db, current_user.organization_id)]
+
+@router.get("/products/low-stock/stream")
+def stream_low_stock_products(db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
+    """Server-sent events (low, changed, restocked, removed) as products cross their reorder level."""
+    low_stock.products(db, current_user.organization_id)  # load the set so changes are tracked from now on
+    return StreamingResponse(low_stock_events(current_user.organization_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@router.get("/products/changes", response_model=schemas.ProductChangesResponse)
+def read_product_changes(since: int = 0, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
+    """Products changed and deleted after catalog version `since`; since=0 returns the whole catalog."""
+    version = current_catalog_version(db, current_user.organization_id)
+    if since < 0 or since > version:
+        raise HTTPException(status_code=400, detail=f"since must be between 0 and the current version {version}")
+    query = db.query(models.Product).filter(models.Product.organization_id == current_user.organization_id)
+    if since:
+        query = query.filter(models.Product.catalog_version > since)
+    changed = query.order_by(models.Product.id).all()
+    changed_ids = {product.id for product in changed}
+    deleted = [
+        product_id for (product_id,) in db.query(models.ProductTombstone.product_id).filter(
+            models.ProductTombstone.organization_id == current_user.organization_id,
+            models.ProductTombstone.catalog_version > since,
+        )
+        if product_id not in changed_ids  # ids reused by a newer product count as changed
+    ] if since else []
+    return {"version": version, "changed": changed, "deleted": deleted}
+
 @router.get("/products/{product_id}", response_model=schemas.ProductResponse)
 def read_product(product_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
     product = db.query(models.Product).filter(models.Product.id == product_id, models.Product.organization_id == current_user.organization_id).first()
@@ -110,21 +194,24 @@ def read_product(product_id: int, db: Session = Depends(get_db), current_user: m
 @router.post("/products/", response_model=schemas.ProductResponse)
 def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.check_role("admin"))):
     # Check if category exists
-    category = db.query(models.Category).filter(models.Category.id == product.category_id, models.Category.organization_id == current_user.organization_id).first()
+    category = get_category(db, current_user.organization_id, product.category_id)
     if not category:
         raise HTTPException(status_code=400, detail=f"Category with id {product.category_id} does not exist")
 
     # Check if unit exists
-    unit = db.query(models.Unit).filter(models.Unit.id == product.unit_id).first()
+    unit = get_unit(db, product.unit_id)
     if not unit:
         raise HTTPException(status_code=400, detail=f"Unit with id {product.unit_id} does not exist")
 
     product_data = product.dict()
     product_data["organization_id"] = current_user.organization_id
+    product_data["catalog_version"] = bump_catalog_version(db, current_user.organization_id)
     db_product = models.Product(**product_data)
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
+    barcode_index.put(db_product)
+    low_stock.refresh(db, [db_product.id])
     return db_product
 
 @router.put("/products/{product_id}", response_model=schemas.ProductResponse)
@@ -134,8 +221,11 @@ def update_product(product_id: int, product: schemas.ProductUpdate, db: Session
         raise HTTPException(status_code=404, detail="Product not found")
     for key, value in product.dict(exclude_unset=True).items():
         setattr(db_product, key, value)
+    db_product.catalog_version = bump_catalog_version(db, current_user.organization_id)
     db.commit()
     db.refresh(db_product)
+    barcode_index.put(db_product)
+    low_stock.refresh(db, [db_product.id])
     return db_product
 
 @router.delete("/products/{product_id}")
@@ -143,45 +233,145 @@ def delete_product(product_id: int, db: Session = Depends(get_db), current_user:
     db_product = db.query(models.Product).filter(models.Product.id == product_id, models.Product.organization_id == current_user.organization_id).first()
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
+    add_tombstone(db, db_product, bump_catalog_version(db, current_user.organization_id))
     db.delete(db_product)
     db.commit()
+    barcode_index.remove(product_id)
+    low_stock.refresh(db, [product_id])
     return {"message": "Product deleted"}
 
-@router.post("/products/bulk/", response_model=List[schemas.ProductResponse])
-def create_products_bulk(products: List[schemas.ProductBulkCreate], db: Session = Depends(get_db), current_user: models.User = Depends(auth.check_role("admin"))):
-    created_products = []
-    errors = []
+BULK_MODES = ("all_or_nothing", "best_effort")
+BULK_IN_CHUNK = 5000  # below SQLite's 32766 bound-parameter limit
+
+@router.post("/products/bulk/", response_model=List[schemas.ProductResponse], responses={207: {"model": schemas.ProductBulkCreateResult}})
+def create_products_bulk(products: List[schemas.ProductBulkCreate], mode: str = "all_or_nothing", db: Session = Depends(get_db), current_user: models.User = Depends(auth.check_role("admin"))):
+    """Validate the whole batch in memory, then insert it with one multi-row statement.
+
+    all_or_nothing inserts nothing if any row is invalid and reports the per-row errors with a 400.
+    best_effort inserts the valid rows; if some rows failed, the created products and the per-row
+    errors are returned with a 207, since a 4xx would make clients retry rows that were committed.
+    """
+    if mode not in BULK_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(BULK_MODES)}")
+
+    # One IN query per referenced table instead of two lookups per row
+    category_ids = {row.category_id for row in products}
+    unit_ids = {row.unit_id for row in products}
+    barcodes = {row.barcode for row in products if row.barcode}
+    known_categories = {id_ for (id_,) in db.query(models.Category.id).filter(models.Category.id.in_(category_ids), models.Category.organization_id == current_user.organization_id)}
+    known_units = {id_ for (id_,) in db.query(models.Unit.id).filter(models.Unit.id.in_(unit_ids))}
+    taken_barcodes = set()
+    barcode_list = list(barcodes)
+    for start in range(0, len(barcode_list), BULK_IN_CHUNK):
+        chunk = barcode_list[start:start + BULK_IN_CHUNK]
+        taken_barcodes.update(code for (code,) in db.query(models.Product.barcode).filter(models.Product.barcode.in_(chunk)))
 
+    rows = []
+    errors = []
     for idx, product_data in enumerate(products):
+        if product_data.category_id not in known_categories:
+            errors.append({"index": idx, "error": f"Category with id {product_data.category_id} does not exist"})
+            continue
+        if product_data.unit_id not in known_units:
+            errors.append({"index": idx, "error": f"Unit with id {product_data.unit_id} does not exist"})
+            continue
+        if product_data.barcode and product_data.barcode in taken_barcodes:
+            errors.append({"index": idx, "error": f"Barcode {product_data.barcode} already exists"})
+            continue
+        if product_data.barcode:
+            taken_barcodes.add(product_data.barcode)
+
+        # tax_rate is already in decimal format (0-1), default to 0.0 if None
+        product_dict = product_data.dict()
+        product_dict['tax_rate'] = product_data.tax_rate if product_data.tax_rate is not None else 0.0
+        product_dict["organization_id"] = current_user.organization_id
+        rows.append(product_dict)
+
+    created_products = []
+    if rows and (mode == "best_effort" or not errors):
         try:
-            # Check if category exists
-            category = db.query(models.Category).filter(models.Category.id == product_data.category_id, models.Category.organization_id == current_user.organization_id).first()
-            if not category:
-                errors.append({"index": idx, "error": f"Category with id {product_data.category_id} does not exist"})
-                continue
-
-            # Check if unit exists
-            unit = db.query(models.Unit).filter(models.Unit.id == product_data.unit_id).first()
-            if not unit:
-                errors.append({"index": idx, "error": f"Unit with id {product_data.unit_id} does not exist"})
-                continue
-
-            # tax_rate is already in decimal format (0-1), default to 0.0 if None
-            product_dict = product_data.dict()
-            product_dict['tax_rate'] = product_data.tax_rate if product_data.tax_rate is not None else 0.0
-            product_dict["organization_id"] = current_user.organization_id
-
-            db_product = models.Product(**product_dict)
-            db.add(db_product)
+            version = bump_catalog_version(db, current_user.organization_id)
+            for row in rows:
+                row["catalog_version"] = version
+            created_products = list(db.scalars(insert(models.Product).returning(models.Product), rows))
+            # Detach the returned rows so the commit does not expire them and serialization needs no reloads
+            db.expunge_all()
             db.commit()
-            db.refresh(db_product)
-            created_products.append(db_product)
-
-        except Exception as e:
+        except (IntegrityError, ValueError) as e:
             db.rollback()
-            errors.append({"index": idx, "error": str(e)})
+            raise HTTPException(status_code=400, detail={"message": "Products could not be created", "errors": [{"index": None, "error": str(e)}], "created_count": 0})
+        for db_product in created_products:
+            barcode_index.put(db_product)
+        low_stock.refresh(db, [db_product.id for db_product in created_products])
 
+    if errors and mode == "best_effort":
+        result = schemas.ProductBulkCreateResult(
+            created=[schemas.ProductResponse.model_validate(db_product) for db_product in created_products],
+            errors=errors,
+            created_count=len(created_products),
+        )
+        return JSONResponse(result.model_dump(mode="json"), status_code=207)
     if errors:
-        raise HTTPException(status_code=400, detail={"message": "Some products failed to create", "errors": errors, "created_count": len(created_products)})
+        raise HTTPException(status_code=400, detail={"message": "Some products failed to create", "errors": errors, "created_count": 0})
 
     return created_products
+
+@router.post("/products/reprice", response_model=schemas.ProductRepriceResponse)
+def reprice_products(reprice: schemas.ProductRepriceRequest, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.check_role("admin"))):
+    """Apply a pricing rule to every matching product with one UPDATE statement in one transaction.
+
+    Products whose new price would not be positive are left unchanged and counted as skipped.
+    """
+    if reprice.category_id is None and reprice.supplier_id is None and not reprice.product_ids:
+        raise HTTPException(status_code=400, detail="Specify category_id, supplier_id or product_ids")
+    organization_id = current_user.organization_id
+    filters = [models.Product.organization_id == organization_id]
+    if reprice.category_id is not None:
+        if not get_category(db, organization_id, reprice.category_id):
+            raise HTTPException(status_code=400, detail=f"Category with id {reprice.category_id} does not exist")
+        filters.append(models.Product.category_id == reprice.category_id)
+    if reprice.supplier_id is not None:
+        supplier = db.query(models.Supplier.id).filter(models.Supplier.id == reprice.supplier_id, models.Supplier.organization_id == organization_id).first()
+        if not supplier:
+            raise HTTPException(status_code=400, detail=f"Supplier with id {reprice.supplier_id} does not exist")
+        # Products the supplier has ever delivered
+        filters.append(models.Product.id.in_(
+            select(models.PurchaseItem.product_id).join(models.Purchase, models.Purchase.id == models.PurchaseItem.purchase_id)
+            .where(models.Purchase.supplier_id == reprice.supplier_id, models.Purchase.organization_id == organization_id)
+        ))
+    if reprice.product_ids:
+        filters.append(models.Product.id.in_(reprice.product_ids))
+
+    raw_price = reprice_expression(reprice.rule, reprice.value)
+    new_price = reprice_expression(reprice.rule, reprice.value, reprice.round_to, reprice.round_mode)
+    valid = (raw_price > 0) & (new_price > 0)
+    skipped_count = db.query(func.count(models.Product.id)).filter(*filters, ~valid).scalar()
+    version = bump_catalog_version(db, organization_id)
+    # RETURNING the scan fields refreshes the barcode index without reading the products again
+    updated = db.execute(
+        update(models.Product).where(*filters, valid)
+        .values(selling_price=new_price, catalog_version=version)
+        .returning(*(getattr(models.Product, field) for field in BarcodeRecord._fields))
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not updated:
+        db.rollback()
+        return {"updated_count": 0, "skipped_count": skipped_count, "catalog_version": current_catalog_version(db, organization_id)}
+    db.commit()
+    for row in updated:
+        barcode_index.put(row)
+    return {"updated_count": len(updated), "skipped_count": skipped_count, "catalog_version": version}
+
+@router.post("/products/import")
+def import_products(file: UploadFile = File(...), create_missing_categories: bool = True, current_user: auth.Principal = Depends(auth.check_role("admin"))):
+    """Upsert products by barcode from a CSV or XLSX upload, streaming NDJSON progress per chunk."""
+    filename = (file.filename or "").lower()
+    if filename.endswith(".csv"):
+        rows = iter_csv_rows(file.file)
+    elif filename.endswith((".xlsx", ".xlsm")):
+        rows = iter_xlsx_rows(file.file)
+    else:
+        raise HTTPException(status_code=400, detail="Only .csv and .xlsx files are supported")
+    # The import outlives this handler, so it gets its own session
+    progress = import_catalog(SessionLocal(), current_user.organization_id, rows, create_missing_categories)
+    return StreamingResponse(progress, media_type="application/x-ndjson")
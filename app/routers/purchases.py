@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.orm import Session, raiseload, selectinload
 from sqlalchemy.exc import IntegrityError, DataError
-from typing import List
+from typing import List, Optional
 from ..database import SessionLocal
 from .. import models, schemas, auth
+from ..pagination import paginate
+from ..barcode_index import barcode_index
+from ..low_stock import low_stock
+from ..catalog_version import bump_catalog_version
 
 router = APIRouter()
 
@@ -15,13 +19,23 @@ def get_db():
         db.close()
 
 @router.get("/purchases/", response_model=List[schemas.PurchaseResponse])
-def read_purchases(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    purchases = db.query(models.Purchase).filter(models.Purchase.organization_id == current_user.organization_id).offset(skip).limit(limit).all()
+def read_purchases(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    query = (
+        db.query(models.Purchase)
+        .options(selectinload(models.Purchase.items), raiseload("*"))
+        .filter(models.Purchase.organization_id == current_user.organization_id)
+    )
+    purchases = paginate(query, models.Purchase.id, response, limit, cursor, skip, descending=True)
     return purchases
 
 @router.get("/purchases/{purchase_id}", response_model=schemas.PurchaseResponse)
 def read_purchase(purchase_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    purchase = db.query(models.Purchase).filter(models.Purchase.id == purchase_id, models.Purchase.organization_id == current_user.organization_id).first()
+    purchase = (
+        db.query(models.Purchase)
+        .options(selectinload(models.Purchase.items), raiseload("*"))
+        .filter(models.Purchase.id == purchase_id, models.Purchase.organization_id == current_user.organization_id)
+        .first()
+    )
     if purchase is None:
         raise HTTPException(status_code=404, detail="Purchase not found")
     return purchase
@@ -46,6 +60,7 @@ def create_purchase(purchase: schemas.PurchaseCreate, current_user: models.User
         print("Purchase object created")
 
         # Process each item and update product prices
+        version = bump_catalog_version(db, current_user.organization_id)
         for item_data in items:
             print(f"Processing item: {item_data}")
             product = db.query(models.Product).filter(models.Product.id == item_data['product_id'], models.Product.organization_id == current_user.organization_id).first()
@@ -59,6 +74,7 @@ def create_purchase(purchase: schemas.PurchaseCreate, current_user: models.User
 
             # Update stock quantity
             product.stock_quantity += item_data['quantity']
+            product.catalog_version = version
             db.add(product)
             print(f"Updated product cost: {product.cost_price}, selling: {product.selling_price}, stock: {product.stock_quantity}")
 
@@ -77,6 +93,8 @@ def create_purchase(purchase: schemas.PurchaseCreate, current_user: models.User
         print("About to commit")
         db.commit()
         print("Committed")
+        barcode_index.refresh(db, [item_data['product_id'] for item_data in items])
+        low_stock.refresh(db, [item_data['product_id'] for item_data in items])
         db.refresh(db_purchase)
         print("Refreshed")
         print(f"Purchase created with id: {db_purchase.id}")
@@ -129,8 +147,8 @@ def delete_purchase(purchase_id: int, db: Session = Depends(get_db), current_use
     return {"message": "Purchase deleted"}
 
 @router.get("/purchase-items/", response_model=List[schemas.PurchaseItemResponse])
-def read_purchase_items(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    items = db.query(models.PurchaseItem).join(models.Purchase).filter(models.Purchase.organization_id == current_user.organization_id).offset(skip).limit(limit).all()
+def read_purchase_items(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    items = paginate(db.query(models.PurchaseItem).join(models.Purchase).filter(models.Purchase.organization_id == current_user.organization_id), models.PurchaseItem.id, response, limit, cursor, skip, descending=True)
     return items
 
 @router.get("/purchase-items/{item_id}", response_model=schemas.PurchaseItemResponse)
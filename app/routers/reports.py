@@ -0,0 +1,90 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from ..database import SessionLocal
+from .. import schemas, auth
+from ..reports import BUCKETS, GROUP_BYS, PROFIT_GROUP_BYS, gross_profit_report, sales_report, uses_rollups
+from ..analytics import product_abc_analysis
+
+router = APIRouter()
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _date_range(date_from: Optional[date], date_to: Optional[date]):
+    """Default to the last 30 days (UTC)."""
+    if date_to is None:
+        date_to = datetime.utcnow().date()
+    if date_from is None:
+        date_from = date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+    return date_from, date_to
+
+@router.get("/reports/sales", response_model=schemas.SalesReportResponse)
+def read_sales_report(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    bucket: str = "day",
+    group_by: Optional[str] = None,
+    outlet_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.check_role("admin")),
+):
+    """Sales totals per time bucket in [from, to] (inclusive, UTC days; default the last 30 days), optionally grouped."""
+    if bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(BUCKETS)}")
+    if group_by is not None and group_by not in GROUP_BYS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(GROUP_BYS)}")
+    date_from, date_to = _date_range(date_from, date_to)
+    rows = sales_report(db, current_user.organization_id, date_from, date_to, bucket, group_by, outlet_id)
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "bucket": bucket,
+        "group_by": group_by,
+        "source": "rollups" if uses_rollups(bucket, group_by) else "sales",
+        "rows": rows,
+    }
+
+@router.get("/reports/gross-profit", response_model=schemas.GrossProfitResponse)
+def read_gross_profit_report(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    bucket: str = "month",
+    group_by: Optional[str] = None,
+    outlet_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.check_role("admin")),
+):
+    """Revenue, gross profit and margin per time bucket in [from, to], optionally by product, category or outlet."""
+    if bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(BUCKETS)}")
+    if group_by is not None and group_by not in PROFIT_GROUP_BYS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(PROFIT_GROUP_BYS)}")
+    date_from, date_to = _date_range(date_from, date_to)
+    rows = gross_profit_report(db, current_user.organization_id, date_from, date_to, bucket, group_by, outlet_id)
+    return {"date_from": date_from, "date_to": date_to, "bucket": bucket, "group_by": group_by, "rows": rows}
+
+@router.get("/reports/products/abc", response_model=schemas.ProductAbcResponse)
+def read_product_abc_report(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    outlet_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    a_share: float = 0.8,
+    b_share: float = 0.95,
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.check_role("admin")),
+):
+    """ABC class, velocity, days of cover and sell-through of every product over [from, to]."""
+    if not 0 < a_share < b_share <= 1:
+        raise HTTPException(status_code=400, detail="Shares must satisfy 0 < a_share < b_share <= 1")
+    date_from, date_to = _date_range(date_from, date_to)
+    analysis = product_abc_analysis(db, current_user.organization_id, date_from, date_to, outlet_id, category_id, a_share, b_share)
+    return {"date_from": date_from, "date_to": date_to, **analysis}
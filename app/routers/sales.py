@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.orm import Session, raiseload, selectinload
 from typing import List, Optional
 from ..database import SessionLocal
 from .. import models, schemas, auth
 from ..printer_utils import print_receipt, print_invoice_pdf
+from ..pagination import paginate
+from ..invoice import build_invoice, invoice_cache
+from ..checkout import adjust_stock, checkout, checkout_batch, sold_quantities
+from ..low_stock import low_stock
+from ..sales_rollup import add_sales, remove_sales
 
 router = APIRouter()
 
@@ -15,66 +20,65 @@ def get_db():
         db.close()
 
 @router.get("/sales/", response_model=List[schemas.SaleResponse])
-def read_sales(skip: int = 0, limit: int = 100, customer_id: Optional[int] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    query = db.query(models.Sale).filter(models.Sale.organization_id == current_user.organization_id)
+def read_sales(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, customer_id: Optional[int] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    # Items and payment links for the whole page in one extra query each; any other lazy load is an N+1 and raises
+    query = (
+        db.query(models.Sale)
+        .options(selectinload(models.Sale.items), selectinload(models.Sale.sale_payments), raiseload("*"))
+        .filter(models.Sale.organization_id == current_user.organization_id)
+    )
     if customer_id is not None:
         query = query.filter(models.Sale.customer_id == customer_id)
-    sales = query.offset(skip).limit(limit).all()
+    sales = paginate(query, models.Sale.id, response, limit, cursor, skip, descending=True)
     return sales
 
 @router.get("/sales/{sale_id}", response_model=schemas.SaleResponse)
 def read_sale(sale_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    sale = db.query(models.Sale).filter(models.Sale.id == sale_id, models.Sale.organization_id == current_user.organization_id).first()
+    sale = (
+        db.query(models.Sale)
+        .options(selectinload(models.Sale.items), selectinload(models.Sale.sale_payments), raiseload("*"))
+        .filter(models.Sale.id == sale_id, models.Sale.organization_id == current_user.organization_id)
+        .first()
+    )
     if sale is None:
         raise HTTPException(status_code=404, detail="Sale not found")
     return sale
 
 @router.post("/sales/", response_model=schemas.SaleResponse)
 def create_sale(sale: schemas.SaleCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    # Role-based validation for cashier_station_id
-    if current_user.role == "cashier":
-        if sale.cashier_station_id is None:
-            raise HTTPException(status_code=400, detail="cashier_station_id is required for cashiers")
-    else:  # admin or manager
-        if sale.cashier_station_id is not None:
-            raise HTTPException(status_code=400, detail="cashier_station_id should not be provided for non-cashier users")
-
-    # Create the sale first
-    sale_data = sale.dict()
-    sale_data["organization_id"] = current_user.organization_id
-    items = sale_data.pop('items')
-    payment_id = sale_data.pop('payment_id', None)
-
-    # If payment_id is provided, validate it exists and belongs to user's organization
-    if payment_id:
-        payment = db.query(models.Payment).filter(models.Payment.id == payment_id, models.Payment.organization_id == current_user.organization_id).first()
-        if not payment:
-            raise HTTPException(status_code=404, detail="Payment not found")
-        sale_data['payment_id'] = payment_id
-
-    db_sale = models.Sale(**sale_data)
-    db.add(db_sale)
-    db.commit()
-    db.refresh(db_sale)
-
-    # Create sale items
-    for item_data in items:
-        item_data['sale_id'] = db_sale.id
-        db_item = models.SaleItem(**item_data)
-        db.add(db_item)
-
+    # Sale, items and stock decrement commit together; any error leaves nothing behind
+    db_sale = checkout(db, current_user, sale)
     db.commit()
+    low_stock.refresh(db, {item.product_id for item in sale.items})
     db.refresh(db_sale)
     return db_sale
 
+@router.post("/sales/batch", response_model=schemas.SaleBatchResponse)
+def create_sales_batch(batch: schemas.SaleBatchCreate, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
+    """Upload sales recorded offline; each carries a till-generated idempotency key so retries are safe."""
+    results = checkout_batch(db, current_user, batch.sales)
+    created = [result for result in results if result["status"] == "created"]
+    if created:
+        low_stock.refresh(db, {item.product_id for result in created for item in batch.sales[result["index"]].items})
+    return {
+        "created": len(created),
+        "duplicates": sum(1 for result in results if result["status"] == "duplicate"),
+        "failed": sum(1 for result in results if result["status"] == "error"),
+        "results": results,
+    }
+
 @router.put("/sales/{sale_id}", response_model=schemas.SaleResponse)
 def update_sale(sale_id: int, sale: schemas.SaleUpdate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
     db_sale = db.query(models.Sale).filter(models.Sale.id == sale_id, models.Sale.organization_id == current_user.organization_id).first()
     if db_sale is None:
         raise HTTPException(status_code=404, detail="Sale not found")
+    remove_sales(db, [sale_id])
     for key, value in sale.dict(exclude_unset=True).items():
         setattr(db_sale, key, value)
+    db.flush()
+    add_sales(db, [sale_id])
     db.commit()
+    invoice_cache.invalidate_sale(current_user.organization_id, sale_id)
     db.refresh(db_sale)
     return db_sale
 
@@ -83,13 +87,19 @@ def delete_sale(sale_id: int, db: Session = Depends(get_db), current_user: model
     db_sale = db.query(models.Sale).filter(models.Sale.id == sale_id, models.Sale.organization_id == current_user.organization_id).first()
     if db_sale is None:
         raise HTTPException(status_code=404, detail="Sale not found")
+    # Voiding puts the sold quantities back in stock in the same transaction
+    sold = sold_quantities(db, [sale_id])
+    adjust_stock(db, current_user.organization_id, sold, {})
+    remove_sales(db, [sale_id])
     db.delete(db_sale)
     db.commit()
+    invoice_cache.invalidate_sale(current_user.organization_id, sale_id)
+    low_stock.refresh(db, sold)
     return {"message": "Sale deleted"}
 
 @router.get("/sale-items/", response_model=List[schemas.SaleItemResponse])
-def read_sale_items(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    items = db.query(models.SaleItem).join(models.Sale).filter(models.Sale.organization_id == current_user.organization_id).offset(skip).limit(limit).all()
+def read_sale_items(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    items = paginate(db.query(models.SaleItem).join(models.Sale).filter(models.Sale.organization_id == current_user.organization_id), models.SaleItem.id, response, limit, cursor, skip, descending=True)
     return items
 
 @router.get("/sale-items/{item_id}", response_model=schemas.SaleItemResponse)
@@ -105,9 +115,15 @@ def create_sale_item(item: schemas.SaleItemCreate, db: Session = Depends(get_db)
     sale = db.query(models.Sale).filter(models.Sale.id == item.sale_id, models.Sale.organization_id == current_user.organization_id).first()
     if not sale:
         raise HTTPException(status_code=404, detail="Sale not found or does not belong to your organization")
+    remove_sales(db, [sale.id])
     db_item = models.SaleItem(**item.dict())
     db.add(db_item)
+    db.flush()
+    adjust_stock(db, current_user.organization_id, {}, {item.product_id: item.quantity})
+    add_sales(db, [sale.id])
     db.commit()
+    invoice_cache.invalidate_sale(current_user.organization_id, sale.id)
+    low_stock.refresh(db, {item.product_id})
     db.refresh(db_item)
     return db_item
 
@@ -116,9 +132,17 @@ def update_sale_item(item_id: int, item: schemas.SaleItemUpdate, db: Session = D
     db_item = db.query(models.SaleItem).join(models.Sale).filter(models.SaleItem.id == item_id, models.Sale.organization_id == current_user.organization_id).first()
     if db_item is None:
         raise HTTPException(status_code=404, detail="Sale Item not found")
+    before = {db_item.product_id: db_item.quantity}
+    remove_sales(db, [db_item.sale_id])
     for key, value in item.dict(exclude_unset=True).items():
         setattr(db_item, key, value)
+    db.flush()
+    after = {db_item.product_id: db_item.quantity}
+    adjust_stock(db, current_user.organization_id, before, after)
+    add_sales(db, [db_item.sale_id])
     db.commit()
+    invoice_cache.invalidate_sale(current_user.organization_id, db_item.sale_id)
+    low_stock.refresh(db, set(before) | set(after))
     db.refresh(db_item)
     return db_item
 
@@ -127,13 +151,21 @@ def delete_sale_item(item_id: int, db: Session = Depends(get_db), current_user:
     db_item = db.query(models.SaleItem).join(models.Sale).filter(models.SaleItem.id == item_id, models.Sale.organization_id == current_user.organization_id).first()
     if db_item is None:
         raise HTTPException(status_code=404, detail="Sale Item not found")
+    sale_id = db_item.sale_id
+    sold = {db_item.product_id: db_item.quantity}
+    remove_sales(db, [sale_id])
     db.delete(db_item)
+    db.flush()
+    adjust_stock(db, current_user.organization_id, sold, {})
+    add_sales(db, [sale_id])
     db.commit()
+    invoice_cache.invalidate_sale(current_user.organization_id, sale_id)
+    low_stock.refresh(db, sold)
     return {"message": "Sale Item deleted"}
 
 @router.get("/payments/", response_model=List[schemas.PaymentResponse])
-def read_payments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    payments = db.query(models.Payment).filter(models.Payment.organization_id == current_user.organization_id).offset(skip).limit(limit).all()
+def read_payments(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    payments = paginate(db.query(models.Payment).filter(models.Payment.organization_id == current_user.organization_id), models.Payment.id, response, limit, cursor, skip, descending=True)
     return payments
 
 @router.get("/payments/{payment_id}", response_model=schemas.PaymentResponse)
@@ -182,128 +214,14 @@ def delete_payment(payment_id: int, db: Session = Depends(get_db), current_user:
 
 @router.get("/sales/{sale_id}/invoice")
 def generate_invoice(sale_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    sale = db.query(models.Sale).options(joinedload(models.Sale.items).joinedload(models.SaleItem.product), joinedload(models.Sale.outlet)).filter(models.Sale.id == sale_id, models.Sale.organization_id == current_user.organization_id).first()
-    if sale is None:
-        raise HTTPException(status_code=404, detail="Sale not found")
-
-    # Get default printer and template for the outlet
-    default_printer = db.query(models.PrinterSettings).filter(
-        models.PrinterSettings.outlet_id == sale.outlet_id,
-        models.PrinterSettings.is_default == True
-    ).first()
-
-    default_template = db.query(models.InvoiceTemplate).filter(
-        models.InvoiceTemplate.outlet_id == sale.outlet_id,
-        models.InvoiceTemplate.is_default == True
-    ).first()
-
-    if not default_template:
-        raise HTTPException(status_code=404, detail="Default template not configured for this outlet")
-
-    # If no default printer, default to PDF printing
-    if not default_printer:
-        printer_type = "a4"
-        printer_name = "PDF"
-        settings = None
-    else:
-        printer_type = default_printer.printer_type
-        printer_name = default_printer.printer_name
-        settings = default_printer.settings
-
-    # Generate invoice data (simplified for now)
-    invoice_data = {
-        "sale_id": sale.id,
-        "outlet": {
-            "name": sale.outlet.name,
-            "address": sale.outlet.address,
-            "phone": sale.outlet.phone,
-            "email": sale.outlet.email
-        },
-        "total_amount": sale.total_amount,
-        "discount": sale.discount,
-        "tax": sale.tax,
-        "net_total": sale.net_total,
-        "items": [
-            {
-                "product_name": item.product.name,
-                "quantity": item.quantity,
-                "selling_price": item.selling_price,
-                "total": item.total
-            } for item in sale.items
-        ],
-        "printer_settings": {
-            "type": printer_type,
-            "name": printer_name,
-            "settings": settings
-        },
-        "template": {
-            "name": default_template.name,
-            "header_text": default_template.header_text,
-            "footer_text": default_template.footer_text
-        }
-    }
-
-    return invoice_data
+    return build_invoice(db, current_user.organization_id, sale_id)
 
 @router.post("/sales/{sale_id}/print")
 def print_sale_invoice(sale_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
     """Print invoice for a sale using configured printer. Falls back to PDF if no printer configured."""
-    sale = db.query(models.Sale).options(joinedload(models.Sale.items).joinedload(models.SaleItem.product), joinedload(models.Sale.outlet)).filter(models.Sale.id == sale_id, models.Sale.organization_id == current_user.organization_id).first()
-    if sale is None:
-        raise HTTPException(status_code=404, detail="Sale not found")
-    if sale.outlet is None:
-        raise HTTPException(status_code=404, detail="Sale outlet not found")
-
-    # Get default printer and template for the outlet
-    default_printer = db.query(models.PrinterSettings).filter(
-        models.PrinterSettings.outlet_id == sale.outlet_id,
-        models.PrinterSettings.is_default == True
-    ).first()
-
-    default_template = db.query(models.InvoiceTemplate).filter(
-        models.InvoiceTemplate.outlet_id == sale.outlet_id,
-        models.InvoiceTemplate.is_default == True
-    ).first()
-
-    if not default_template:
-        raise HTTPException(status_code=404, detail="Default template not configured for this outlet")
-
-    # If no default printer, default to PDF printing
-    if not default_printer:
-        printer_type = "a4"
-        printer_name = "PDF"
-        settings = None
-    else:
-        printer_type = default_printer.printer_type
-        printer_name = default_printer.printer_name
-        settings = default_printer.settings
-
-    # Prepare invoice data
-    invoice_data = {
-        "sale_id": sale.id,
-        "outlet": {
-            "name": sale.outlet.name,
-            "address": sale.outlet.address,
-            "phone": sale.outlet.phone,
-            "email": sale.outlet.email
-        },
-        "total_amount": sale.total_amount,
-        "discount": sale.discount,
-        "tax": sale.tax,
-        "net_total": sale.net_total,
-        "items": [
-            {
-                "product_name": item.product.name,
-                "quantity": item.quantity,
-                "selling_price": item.selling_price,
-                "total": item.total
-            } for item in sale.items
-        ],
-        "template": {
-            "header_text": default_template.header_text,
-            "footer_text": default_template.footer_text
-        }
-    }
+    invoice_data = build_invoice(db, current_user.organization_id, sale_id)
+    printer = invoice_data["printer_settings"]
+    printer_type, printer_name, settings = printer["type"], printer["name"], printer["settings"]
 
     # Print based on printer type
     if printer_type == "thermal":
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from ..database import SessionLocal
 from .. import models, schemas, auth
 from ..printer_utils import get_installed_printers
+from ..pagination import paginate
+from ..invoice import invoice_cache
+from ..ref_cache import get_outlet, ref_cache
+from ..ref_cache import get_default_printer as cached_default_printer, get_default_template as cached_default_template
 
 router = APIRouter()
 
@@ -15,8 +19,8 @@ def get_db():
         db.close()
 
 @router.get("/printer-settings/", response_model=List[schemas.PrinterSettingsResponse])
-def read_printer_settings(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    settings = db.query(models.PrinterSettings).join(models.Outlet).filter(models.Outlet.organization_id == current_user.organization_id).offset(skip).limit(limit).all()
+def read_printer_settings(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    settings = paginate(db.query(models.PrinterSettings).join(models.Outlet).filter(models.Outlet.organization_id == current_user.organization_id), models.PrinterSettings.id, response, limit, cursor, skip)
     return settings
 
 @router.get("/printer-settings/{setting_id}", response_model=schemas.PrinterSettingsResponse)
@@ -29,7 +33,7 @@ def read_printer_setting(setting_id: int, db: Session = Depends(get_db), current
 @router.post("/printer-settings/", response_model=schemas.PrinterSettingsResponse)
 def create_printer_setting(setting: schemas.PrinterSettingsCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
     # Validate outlet belongs to user's organization
-    outlet = db.query(models.Outlet).filter(models.Outlet.id == setting.outlet_id, models.Outlet.organization_id == current_user.organization_id).first()
+    outlet = get_outlet(db, current_user.organization_id, setting.outlet_id)
     if not outlet:
         raise HTTPException(status_code=404, detail="Outlet not found")
     # Ensure only one default per outlet per type
@@ -46,6 +50,8 @@ def create_printer_setting(setting: schemas.PrinterSettingsCreate, db: Session =
     db.add(db_setting)
     db.commit()
     db.refresh(db_setting)
+    ref_cache.invalidate("default_printer", current_user.organization_id)
+    invoice_cache.invalidate_templates(current_user.organization_id)
     return db_setting
 
 @router.put("/printer-settings/{setting_id}", response_model=schemas.PrinterSettingsResponse)
@@ -67,6 +73,8 @@ def update_printer_setting(setting_id: int, setting: schemas.PrinterSettingsUpda
         setattr(db_setting, key, value)
     db.commit()
     db.refresh(db_setting)
+    ref_cache.invalidate("default_printer", current_user.organization_id)
+    invoice_cache.invalidate_templates(current_user.organization_id)
     return db_setting
 
 @router.delete("/printer-settings/{setting_id}")
@@ -76,11 +84,13 @@ def delete_printer_setting(setting_id: int, db: Session = Depends(get_db), curre
         raise HTTPException(status_code=404, detail="Printer setting not found")
     db.delete(db_setting)
     db.commit()
+    ref_cache.invalidate("default_printer", current_user.organization_id)
+    invoice_cache.invalidate_templates(current_user.organization_id)
     return {"message": "Printer setting deleted"}
 
 @router.get("/invoice-templates/", response_model=List[schemas.InvoiceTemplateResponse])
-def read_invoice_templates(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    templates = db.query(models.InvoiceTemplate).join(models.Outlet).filter(models.Outlet.organization_id == current_user.organization_id).offset(skip).limit(limit).all()
+def read_invoice_templates(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    templates = paginate(db.query(models.InvoiceTemplate).join(models.Outlet).filter(models.Outlet.organization_id == current_user.organization_id), models.InvoiceTemplate.id, response, limit, cursor, skip)
     return templates
 
 @router.get("/invoice-templates/{template_id}", response_model=schemas.InvoiceTemplateResponse)
@@ -93,7 +103,7 @@ def read_invoice_template(template_id: int, db: Session = Depends(get_db), curre
 @router.post("/invoice-templates/", response_model=schemas.InvoiceTemplateResponse)
 def create_invoice_template(template: schemas.InvoiceTemplateCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
     # Validate outlet belongs to user's organization
-    outlet = db.query(models.Outlet).filter(models.Outlet.id == template.outlet_id, models.Outlet.organization_id == current_user.organization_id).first()
+    outlet = get_outlet(db, current_user.organization_id, template.outlet_id)
     if not outlet:
         raise HTTPException(status_code=404, detail="Outlet not found")
     # Ensure only one default per outlet
@@ -109,6 +119,8 @@ def create_invoice_template(template: schemas.InvoiceTemplateCreate, db: Session
     db.add(db_template)
     db.commit()
     db.refresh(db_template)
+    ref_cache.invalidate("default_template", current_user.organization_id)
+    invoice_cache.invalidate_templates(current_user.organization_id)
     return db_template
 
 @router.put("/invoice-templates/{template_id}", response_model=schemas.InvoiceTemplateResponse)
@@ -129,6 +141,8 @@ def update_invoice_template(template_id: int, template: schemas.InvoiceTemplateU
         setattr(db_template, key, value)
     db.commit()
     db.refresh(db_template)
+    ref_cache.invalidate("default_template", current_user.organization_id)
+    invoice_cache.invalidate_templates(current_user.organization_id)
     return db_template
 
 @router.delete("/invoice-templates/{template_id}")
@@ -138,19 +152,17 @@ def delete_invoice_template(template_id: int, db: Session = Depends(get_db), cur
         raise HTTPException(status_code=404, detail="Invoice template not found")
     db.delete(db_template)
     db.commit()
+    ref_cache.invalidate("default_template", current_user.organization_id)
+    invoice_cache.invalidate_templates(current_user.organization_id)
     return {"message": "Invoice template deleted"}
 
 @router.get("/outlets/{outlet_id}/default-printer", response_model=schemas.PrinterSettingsResponse)
 def get_default_printer(outlet_id: int, printer_type: str, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
     # Validate outlet belongs to user's organization
-    outlet = db.query(models.Outlet).filter(models.Outlet.id == outlet_id, models.Outlet.organization_id == current_user.organization_id).first()
+    outlet = get_outlet(db, current_user.organization_id, outlet_id)
     if not outlet:
         raise HTTPException(status_code=404, detail="Outlet not found")
-    setting = db.query(models.PrinterSettings).filter(
-        models.PrinterSettings.outlet_id == outlet_id,
-        models.PrinterSettings.printer_type == printer_type,
-        models.PrinterSettings.is_default == True
-    ).first()
+    setting = cached_default_printer(db, current_user.organization_id, outlet_id, printer_type)
     if setting is None:
         raise HTTPException(status_code=404, detail="Default printer not found")
     return setting
@@ -158,13 +170,10 @@ def get_default_printer(outlet_id: int, printer_type: str, db: Session = Depends
 @router.get("/outlets/{outlet_id}/default-template", response_model=schemas.InvoiceTemplateResponse)
 def get_default_template(outlet_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
     # Validate outlet belongs to user's organization
-    outlet = db.query(models.Outlet).filter(models.Outlet.id == outlet_id, models.Outlet.organization_id == current_user.organization_id).first()
+    outlet = get_outlet(db, current_user.organization_id, outlet_id)
     if not outlet:
         raise HTTPException(status_code=404, detail="Outlet not found")
-    template = db.query(models.InvoiceTemplate).filter(
-        models.InvoiceTemplate.outlet_id == outlet_id,
-        models.InvoiceTemplate.is_default == True
-    ).first()
+    template = cached_default_template(db, current_user.organization_id, outlet_id)
     if template is None:
         raise HTTPException(status_code=404, detail="Default template not found")
     return template
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.orm import Session, raiseload, selectinload
+from typing import List, Optional
 from ..database import SessionLocal
 from .. import models, schemas, auth
+from ..pagination import paginate
+from ..barcode_index import barcode_index
+from ..low_stock import low_stock
+from ..catalog_version import bump_catalog_version
 
 router = APIRouter()
 
@@ -14,8 +18,8 @@ def get_db():
         db.close()
 
 @router.get("/suppliers/", response_model=List[schemas.SupplierResponse])
-def read_suppliers(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    suppliers = db.query(models.Supplier).filter(models.Supplier.organization_id == current_user.organization_id).offset(skip).limit(limit).all()
+def read_suppliers(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    suppliers = paginate(db.query(models.Supplier).filter(models.Supplier.organization_id == current_user.organization_id), models.Supplier.id, response, limit, cursor, skip)
     return suppliers
 
 @router.get("/suppliers/{supplier_id}", response_model=schemas.SupplierResponse)
@@ -56,13 +60,19 @@ def delete_supplier(supplier_id: int, db: Session = Depends(get_db), current_use
     return {"message": "Supplier deleted"}
 
 @router.get("/purchases/", response_model=List[schemas.PurchaseResponse])
-def read_purchases(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    purchases = db.query(models.Purchase).offset(skip).limit(limit).all()
+def read_purchases(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    query = db.query(models.Purchase).options(selectinload(models.Purchase.items), raiseload("*"))
+    purchases = paginate(query, models.Purchase.id, response, limit, cursor, skip, descending=True)
     return purchases
 
 @router.get("/purchases/{purchase_id}", response_model=schemas.PurchaseResponse)
 def read_purchase(purchase_id: int, db: Session = Depends(get_db)):
-    purchase = db.query(models.Purchase).filter(models.Purchase.id == purchase_id).first()
+    purchase = (
+        db.query(models.Purchase)
+        .options(selectinload(models.Purchase.items), raiseload("*"))
+        .filter(models.Purchase.id == purchase_id)
+        .first()
+    )
     if purchase is None:
         raise HTTPException(status_code=404, detail="Purchase not found")
     return purchase
@@ -83,6 +93,7 @@ def create_purchase(purchase: schemas.PurchaseCreate, db: Session = Depends(get_
 
     # Create purchase items and update product stock
     total_amount = 0.0
+    version = bump_catalog_version(db, current_user.organization_id)
     for item in purchase.items:
         # Create purchase item
         db_item = models.PurchaseItem(
@@ -99,12 +110,15 @@ def create_purchase(purchase: schemas.PurchaseCreate, db: Session = Depends(get_
             raise HTTPException(status_code=404, detail=f"Product with id {item.product_id} not found")
         product.stock_quantity += item.quantity
         product.cost_price = item.cost_price  # Update cost price to the new purchase price
+        product.catalog_version = version
 
         total_amount += item.quantity * item.cost_price
 
     # Update total amount
     db_purchase.total_amount = total_amount
     db.commit()
+    barcode_index.refresh(db, [item.product_id for item in purchase.items])
+    low_stock.refresh(db, [item.product_id for item in purchase.items])
 
     return db_purchase
 
@@ -129,8 +143,8 @@ def delete_purchase(purchase_id: int, db: Session = Depends(get_db)):
     return {"message": "Purchase deleted"}
 
 @router.get("/purchase-items/", response_model=List[schemas.PurchaseItemResponse])
-def read_purchase_items(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    items = db.query(models.PurchaseItem).offset(skip).limit(limit).all()
+def read_purchase_items(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    items = paginate(db.query(models.PurchaseItem), models.PurchaseItem.id, response, limit, cursor, skip, descending=True)
     return items
 
 @router.get("/purchase-items/{item_id}", response_model=schemas.PurchaseItemResponse)
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from ..database import SessionLocal
 from .. import models, schemas, auth
+from ..pagination import paginate
+from ..ref_cache import get_outlet
 
 router = APIRouter()
 
@@ -14,10 +17,10 @@ def get_db():
         db.close()
 
 @router.get("/users/", response_model=List[schemas.UserResponse])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+def read_users(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
     if skip < 0 or limit < 1 or limit > 100:
         raise HTTPException(status_code=400, detail="Invalid pagination parameters")
-    users = db.query(models.User).filter(models.User.organization_id == current_user.organization_id).offset(skip).limit(limit).all()
+    users = paginate(db.query(models.User).filter(models.User.organization_id == current_user.organization_id), models.User.id, response, limit, cursor, skip)
     return users
 
 @router.get("/users/{user_id}", response_model=schemas.UserResponse)
@@ -29,8 +32,7 @@ def read_user(user_id: int, db: Session = Depends(get_db), current_user: models.
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
-@router.post("/users/", response_model=schemas.UserResponse)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db), current_user: dict = Depends(auth.check_role("admin"))):
+def _new_user_outlet(db: Session, organization_id: str, user: schemas.UserCreate):
     # Check if email already exists
     existing_user = db.query(models.User).filter(models.User.email == user.email).first()
     if existing_user:
@@ -38,47 +40,66 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db), current
 
     # Handle outlet_id: if not provided, use the first available outlet for the organization
     if user.outlet_id is None:
-        outlet = db.query(models.Outlet).filter(models.Outlet.organization_id == current_user.organization_id).first()
+        outlet = db.query(models.Outlet).filter(models.Outlet.organization_id == organization_id).first()
         if not outlet:
             raise HTTPException(status_code=404, detail="No outlets available for this organization")
         user.outlet_id = outlet.id
     else:
         # Verify outlet exists and belongs to the organization
-        outlet = db.query(models.Outlet).filter(models.Outlet.id == user.outlet_id, models.Outlet.organization_id == current_user.organization_id).first()
+        outlet = get_outlet(db, organization_id, user.outlet_id)
         if not outlet:
             raise HTTPException(status_code=404, detail="Outlet not found or does not belong to this organization")
 
-    # Hash the password before saving
-    hashed_password = auth.get_password_hash(user.password)
-    user_data = user.dict()
-    user_data["password"] = hashed_password
-    user_data["organization_id"] = current_user.organization_id
+def _insert_user(db: Session, user_data: dict) -> models.User:
     db_user = models.User(**user_data)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    # The id may be one a deleted user had; replace its "deleted" mark
+    auth.publish_token_version(db_user)
     return db_user
 
-@router.put("/users/{user_id}", response_model=schemas.UserResponse)
-def update_user(user_id: int, user: schemas.UserUpdate, db: Session = Depends(get_db), current_user: dict = Depends(auth.check_role("admin"))):
-    if user_id <= 0:
-        raise HTTPException(status_code=400, detail="Invalid user ID")
-    db_user = db.query(models.User).filter(models.User.id == user_id, models.User.organization_id == current_user.organization_id).first()
+@router.post("/users/", response_model=schemas.UserResponse)
+async def create_user(user: schemas.UserCreate, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.check_role("admin"))):
+    # Database work runs on the threadpool and bcrypt on the hashing pool, like login
+    await run_in_threadpool(_new_user_outlet, db, current_user.organization_id, user)
+
+    # Hash the password before saving
+    hashed_password = await auth.get_password_hash_async(user.password)
+    user_data = user.dict()
+    user_data["password"] = hashed_password
+    user_data["organization_id"] = current_user.organization_id
+    return await run_in_threadpool(_insert_user, db, user_data)
+
+def _apply_user_update(db: Session, organization_id: str, user_id: int, update_data: dict) -> models.User:
+    db_user = db.query(models.User).filter(models.User.id == user_id, models.User.organization_id == organization_id).first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    update_data = user.dict(exclude_unset=True)
     if "email" in update_data:
         existing_user = db.query(models.User).filter(models.User.email == update_data["email"], models.User.id != user_id).first()
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already in use")
+    previous_email = db_user.email
     for key, value in update_data.items():
-        if key == "password":
-            value = auth.get_password_hash(value)
         setattr(db_user, key, value)
+    if auth.TOKEN_VERSION_FIELDS.intersection(update_data):
+        auth.bump_token_version(db_user)
     db.commit()
     db.refresh(db_user)
+    auth.publish_token_version(db_user)
+    auth.invalidate_principal(previous_email)
+    auth.invalidate_principal(db_user.email)
     return db_user
 
+@router.put("/users/{user_id}", response_model=schemas.UserResponse)
+async def update_user(user_id: int, user: schemas.UserUpdate, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.check_role("admin"))):
+    if user_id <= 0:
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+    update_data = user.dict(exclude_unset=True)
+    if "password" in update_data:
+        update_data["password"] = await auth.get_password_hash_async(update_data["password"])
+    return await run_in_threadpool(_apply_user_update, db, current_user.organization_id, user_id, update_data)
+
 @router.delete("/users/{user_id}")
 def delete_user(user_id: int, db: Session = Depends(get_db), current_user: dict = Depends(auth.check_role("admin"))):
     if user_id <= 0:
@@ -86,17 +107,20 @@ def delete_user(user_id: int, db: Session = Depends(get_db), current_user: dict
     db_user = db.query(models.User).filter(models.User.id == user_id, models.User.organization_id == current_user.organization_id).first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
+    email = db_user.email
     db.delete(db_user)
     db.commit()
+    auth.invalidate_principal(email)
+    auth.token_versions.forget(user_id)
     return {"message": "User deleted"}
 
 @router.get("/activity-logs/", response_model=List[schemas.UserActivityLogResponse])
-def read_activity_logs(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+def read_activity_logs(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
     if skip < 0 or limit < 1 or limit > 100:
         raise HTTPException(status_code=400, detail="Invalid pagination parameters")
-    logs = db.query(models.UserActivityLog).filter(models.UserActivityLog.user_id.in_(
+    logs = paginate(db.query(models.UserActivityLog).filter(models.UserActivityLog.user_id.in_(
         db.query(models.User.id).filter(models.User.organization_id == current_user.organization_id)
-    )).offset(skip).limit(limit).all()
+    )), models.UserActivityLog.id, response, limit, cursor, skip, descending=True)
     return logs
 
 @router.post("/activity-logs/", response_model=schemas.UserActivityLogResponse)
@@ -0,0 +1,172 @@
+"""Daily sales rollups per outlet and product, and per outlet and cashier.
+
+Dashboards and reports read ``daily_product_sales`` and
+``daily_cashier_sales`` instead of scanning ``sales`` and ``sale_items``: a
+year of an outlet is a few thousand rollup rows instead of millions of line
+items. Each row holds quantity, revenue, cost, discount, tax and the number
+of sales for one (organization, outlet, UTC day, product) or (organization,
+outlet, UTC day, user, cashier station).
+
+Rollups are maintained in the transaction that writes the sales: checkout
+adds the new sales with one ``INSERT ... SELECT ... ON CONFLICT DO UPDATE``
+per table, and edits or deletes subtract a sale before changing it and add it
+back afterwards. ``rebuild_sales_rollups`` recomputes them from scratch
+(``python rebuild_sales_rollups.py``).
+
+Revenue is ``sum(total_amount)`` per cashier, and per product each sale's
+``total_amount``, discount and tax are allocated to its lines in proportion
+to ``quantity * selling_price`` over the sale's line sum. So
+``revenue + tax - discount`` adds up to ``Sale.net_total`` either way, even
+when the lines do not sum to ``total_amount``; only sales without items are
+missing from the product rollup. Missing outlet, user, station or product ids
+are rolled up under 0.
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import Date, case, delete, distinct, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import FunctionElement
+
+from . import models
+
+ROLLUP_COLUMNS = ("quantity", "revenue", "cost", "discount", "tax", "sale_count")
+
+
+class utc_day(FunctionElement):
+    """UTC calendar day of a timestamp."""
+    type = Date()
+    inherit_cache = True
+
+
+@compiles(utc_day)
+def _compile_utc_day(element, compiler, **kw):
+    return "CAST(timezone('UTC', %s) AS DATE)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(utc_day, "sqlite")
+def _compile_utc_day_sqlite(element, compiler, **kw):
+    # SQLite stores CURRENT_TIMESTAMP in UTC
+    return "date(%s)" % compiler.process(element.clauses, **kw)
+
+
+def product_totals(keys, criteria, sign: int = 1):
+    """SELECT keys + ROLLUP_COLUMNS over sale items joined to their sales, grouped by `keys`.
+
+    `keys` are reused as-is in GROUP BY so that they render with the same bind parameters.
+    """
+    sale, item = models.Sale, models.SaleItem
+    line = item.quantity * item.selling_price
+    lines = select(
+        item.sale_id,
+        func.sum(item.quantity * item.selling_price).label("line_total"),
+        func.count(item.id).label("line_count"),
+    )
+    if criteria:
+        lines = lines.where(item.sale_id.in_(select(sale.id).where(*criteria)))
+    lines = lines.group_by(item.sale_id).subquery()
+    # The line's share of its sale; lines that are all free share it equally
+    share = case((lines.c.line_total != 0, line / lines.c.line_total), else_=1.0 / lines.c.line_count)
+    return select(
+        *keys,
+        (func.sum(item.quantity) * sign).label("quantity"),
+        (func.sum(sale.total_amount * share) * sign).label("revenue"),
+        (func.sum(item.quantity * func.coalesce(item.cost_price, 0)) * sign).label("cost"),
+        (func.sum(func.coalesce(sale.discount, 0) * share) * sign).label("discount"),
+        (func.sum(func.coalesce(sale.tax, 0) * share) * sign).label("tax"),
+        (func.count(distinct(sale.id)) * sign).label("sale_count"),
+    ).join(item, item.sale_id == sale.id).join(lines, lines.c.sale_id == sale.id).where(*criteria).group_by(*keys)
+
+
+def sale_totals(keys, criteria, sign: int = 1):
+    """SELECT keys + ROLLUP_COLUMNS over sales, with quantity and cost summed from their items, grouped by `keys`."""
+    sale, item = models.Sale, models.SaleItem
+    items = select(
+        item.sale_id,
+        func.sum(item.quantity).label("quantity"),
+        func.sum(item.quantity * func.coalesce(item.cost_price, 0)).label("cost"),
+    )
+    if criteria:
+        items = items.where(item.sale_id.in_(select(sale.id).where(*criteria)))
+    items = items.group_by(item.sale_id).subquery()
+    return select(
+        *keys,
+        (func.coalesce(func.sum(items.c.quantity), 0) * sign).label("quantity"),
+        (func.sum(sale.total_amount) * sign).label("revenue"),
+        (func.coalesce(func.sum(items.c.cost), 0) * sign).label("cost"),
+        (func.sum(func.coalesce(sale.discount, 0)) * sign).label("discount"),
+        (func.sum(func.coalesce(sale.tax, 0)) * sign).label("tax"),
+        (func.count(sale.id) * sign).label("sale_count"),
+    ).outerjoin(items, items.c.sale_id == sale.id).where(*criteria).group_by(*keys)
+
+
+def _product_rollup(criteria, sign: int = 1):
+    sale, item = models.Sale, models.SaleItem
+    return product_totals(
+        (sale.organization_id, func.coalesce(sale.outlet_id, 0), utc_day(sale.created_at), func.coalesce(item.product_id, 0)),
+        criteria, sign,
+    )
+
+
+def _cashier_rollup(criteria, sign: int = 1):
+    sale = models.Sale
+    return sale_totals(
+        (sale.organization_id, func.coalesce(sale.outlet_id, 0), utc_day(sale.created_at),
+         func.coalesce(sale.user_id, 0), func.coalesce(sale.cashier_station_id, 0)),
+        criteria, sign,
+    )
+
+
+_ROLLUPS = (
+    (models.DailyProductSales, ("organization_id", "outlet_id", "day", "product_id"), _product_rollup),
+    (models.DailyCashierSales, ("organization_id", "outlet_id", "day", "user_id", "cashier_station_id"), _cashier_rollup),
+)
+
+
+def _upsert(db: Session, model, keys, rows):
+    """INSERT the aggregated `rows` select, adding to rows that already exist."""
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    insert_ = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    stmt = insert_(table).from_select([*keys, *ROLLUP_COLUMNS], rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={column: table.c[column] + stmt.excluded[column] for column in ROLLUP_COLUMNS},
+    )
+    db.execute(stmt)
+
+
+def _apply(db: Session, sale_ids: Iterable[int], sign: int):
+    sale_ids = sorted(set(sale_ids))
+    if not sale_ids:
+        return
+    criteria = [models.Sale.id.in_(sale_ids)]
+    for model, keys, rollup in _ROLLUPS:
+        _upsert(db, model, keys, rollup(criteria, sign))
+    if sign < 0:
+        organizations = select(models.Sale.organization_id).where(*criteria).distinct()
+        for model, _, _ in _ROLLUPS:
+            db.execute(delete(model).where(model.organization_id.in_(organizations), model.sale_count <= 0))
+
+
+def add_sales(db: Session, sale_ids: Iterable[int]):
+    """Add sales (with their items) to the rollups in the current transaction."""
+    _apply(db, sale_ids, 1)
+
+
+def remove_sales(db: Session, sale_ids: Iterable[int]):
+    """Subtract sales from the rollups; call before the sales or their items change."""
+    db.flush()
+    _apply(db, sale_ids, -1)
+
+
+def rebuild_sales_rollups(db: Session, organization_id: Optional[str] = None):
+    """Recompute the rollups of one organization, or all, from sales and sale items; the caller commits."""
+    criteria = [] if organization_id is None else [models.Sale.organization_id == organization_id]
+    for model, keys, rollup in _ROLLUPS:
+        stmt = delete(model)
+        if organization_id is not None:
+            stmt = stmt.where(model.organization_id == organization_id)
+        db.execute(stmt)
+        db.execute(insert(model).from_select([*keys, *ROLLUP_COLUMNS], rollup(criteria)))
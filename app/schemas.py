@@ -1,6 +1,6 @@
-from pydantic import BaseModel, validator, Field
-from typing import Optional, List
-from datetime import datetime
+from pydantic import AliasChoices, BaseModel, validator, Field
+from typing import Any, Dict, Optional, List, Union
+from datetime import date, datetime, timezone
 import re
 
 
@@ -293,6 +293,66 @@ class ProductResponse(ProductBase):
         from_attributes = True
 
 
+class ProductBulkError(BaseModel):
+    index: Optional[int]
+    error: str
+
+
+class ProductBulkCreateResult(BaseModel):
+    """Outcome of a best_effort bulk create in which some rows failed (HTTP 207)."""
+    created: List[ProductResponse]
+    errors: List[ProductBulkError]
+    created_count: int
+
+
+class ProductChangesResponse(BaseModel):
+    version: int
+    changed: List[ProductResponse]
+    deleted: List[int]
+
+
+class ProductLowStockResponse(BaseModel):
+    id: int
+    name: str
+    barcode: Optional[str] = None
+    stock_quantity: int
+    reorder_level: int
+
+
+class ProductBarcodeResponse(BaseModel):
+    id: int
+    barcode: str
+    name: str
+    selling_price: float
+    tax_rate: Optional[float] = None
+    unit_id: Optional[int] = None
+    category_id: Optional[int] = None
+    shelf_no: Optional[str] = None
+
+
+class ProductRepriceRequest(BaseModel):
+    # percent: selling price +/- value %, amount: selling price +/- value, markup: cost price + value %
+    rule: str = Field(..., pattern=r'^(percent|amount|markup)$')
+    value: float
+    round_to: Optional[float] = Field(None, gt=0)
+    round_mode: str = Field("nearest", pattern=r'^(nearest|up|down)$')
+    category_id: Optional[int] = None
+    supplier_id: Optional[int] = None
+    product_ids: Optional[List[int]] = Field(None, min_length=1, max_length=5000)
+
+    @validator('value')
+    def validate_value(cls, v, values):
+        if values.get('rule') == 'markup' and v < 0:
+            raise ValueError('Markup cannot be negative')
+        return v
+
+
+class ProductRepriceResponse(BaseModel):
+    updated_count: int
+    skipped_count: int
+    catalog_version: int
+
+
 class SupplierBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=255)
     contact_person: Optional[str] = Field(None, max_length=255)
@@ -456,6 +516,41 @@ class SaleCreate(SaleBase):
     items: List[SaleItemCreate]
 
 
+class SaleBatchItem(SaleCreate):
+    # Generated by the till; retrying an upload with the same key never records the sale twice
+    idempotency_key: str = Field(..., min_length=1, max_length=64)
+    # When the till made the sale (UTC unless an offset is given); defaults to the upload time
+    created_at: Optional[datetime] = None
+
+    @validator('created_at')
+    def validate_created_at(cls, v):
+        if v is None:
+            return v
+        if v.tzinfo is None:
+            v = v.replace(tzinfo=timezone.utc)
+        return v.astimezone(timezone.utc)
+
+
+class SaleBatchCreate(BaseModel):
+    sales: List[SaleBatchItem] = Field(..., min_length=1, max_length=500)
+
+
+class SaleBatchResult(BaseModel):
+    index: int
+    idempotency_key: str
+    status: str  # created, duplicate or error
+    sale_id: Optional[int] = None
+    status_code: Optional[int] = None
+    error: Optional[Any] = None
+
+
+class SaleBatchResponse(BaseModel):
+    created: int
+    duplicates: int
+    failed: int
+    results: List[SaleBatchResult]
+
+
 class SaleUpdate(BaseModel):
     outlet_id: Optional[int] = None
     cashier_station_id: Optional[int] = None
@@ -492,9 +587,11 @@ class SalePaymentResponse(SalePaymentBase):
 
 class SaleResponse(SaleBase):
     id: int
+    idempotency_key: Optional[str] = None
     created_at: datetime
     items: List[SaleItemResponse]
-    payments: Optional[List[SalePaymentResponse]] = None
+    # Read from Sale.sale_payments
+    payments: Optional[List[SalePaymentResponse]] = Field(None, validation_alias=AliasChoices("payments", "sale_payments"))
 
     class Config:
         from_attributes = True
@@ -640,3 +737,70 @@ class CashierShiftResponse(CashierShiftBase):
 
     class Config:
         from_attributes = True
+
+
+class SalesReportRow(BaseModel):
+    bucket: str
+    # Id of the group (outlet, product, category or user id, or payment method), None when not grouped
+    key: Optional[Union[int, str]] = None
+    label: Optional[str] = None
+    sale_count: int
+    quantity: Optional[int] = None
+    revenue: Optional[float] = None
+    cost: Optional[float] = None
+    discount: Optional[float] = None
+    tax: Optional[float] = None
+    net_total: float
+
+
+class SalesReportResponse(BaseModel):
+    date_from: date
+    date_to: date
+    bucket: str
+    group_by: Optional[str] = None
+    source: str
+    rows: List[SalesReportRow]
+
+
+class GrossProfitRow(BaseModel):
+    bucket: str
+    key: Optional[int] = None
+    label: Optional[str] = None
+    quantity: float
+    revenue: float
+    gross_profit: float
+    # Gross profit as a percentage of revenue
+    margin: float
+
+
+class GrossProfitResponse(BaseModel):
+    date_from: date
+    date_to: date
+    bucket: str
+    group_by: Optional[str] = None
+    rows: List[GrossProfitRow]
+
+
+class ProductAbcRow(BaseModel):
+    product_id: int
+    name: str
+    category_id: Optional[int] = None
+    quantity: float
+    revenue: float
+    revenue_share: float
+    cumulative_share: float
+    abc_class: str
+    # Units sold per day
+    velocity: float
+    stock_quantity: float
+    days_of_cover: Optional[float] = None
+    sell_through: float
+
+
+class ProductAbcResponse(BaseModel):
+    date_from: date
+    date_to: date
+    days: int
+    total_revenue: float
+    class_counts: Dict[str, int]
+    products: List[ProductAbcRow]
@@ -0,0 +1,187 @@
+"""Slow-query log.
+
+Statements slower than SLOW_QUERY_THRESHOLD_MS are written as JSON lines to a
+rotating file next to the local database, together with their normalized SQL,
+the shape of the bound parameters, the route that issued them and the
+database's query plan. Entries are aggregated by fingerprint for the admin API.
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .database import app_data_dir
+from .query_stats import current_stats
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", "200"))
+SLOW_QUERY_LOG_PATH = os.environ.get("SLOW_QUERY_LOG_PATH", os.path.join(app_data_dir, "slow_queries.log"))
+SLOW_QUERY_LOG_MAX_BYTES = 5 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 3
+
+_EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+_slow_log = logging.getLogger("app.slow_queries.file")
+_slow_log.propagate = False
+_slow_log.setLevel(logging.INFO)
+
+
+def _get_file_logger() -> logging.Logger:
+    if not _slow_log.handlers:
+        handler = RotatingFileHandler(
+            SLOW_QUERY_LOG_PATH, maxBytes=SLOW_QUERY_LOG_MAX_BYTES, backupCount=SLOW_QUERY_LOG_BACKUPS, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _slow_log.addHandler(handler)
+    return _slow_log
+
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|:\w+|\$\d+|%s")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """Collapse whitespace and replace literals and placeholders with '?'."""
+    sql = _STRING_LITERAL.sub("?", statement)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("(?...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def fingerprint(normalized_sql: str) -> str:
+    return hashlib.sha1(normalized_sql.encode("utf-8")).hexdigest()[:16]
+
+
+def parameter_shape(parameters, executemany: bool = False) -> Any:
+    """Describe bound parameters by type only, never by value."""
+    if executemany and isinstance(parameters, (list, tuple)):
+        first = parameters[0] if parameters else None
+        return {"rows": len(parameters), "row": parameter_shape(first)}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def _explain(conn, statement: str, parameters) -> Optional[List[str]]:
+    if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    elif dialect == "postgresql":
+        prefix = "EXPLAIN "
+    else:
+        return None
+    # This is the request's own connection. On PostgreSQL a failed statement aborts the whole
+    # transaction, so the EXPLAIN runs in a savepoint and a failure only rolls that back.
+    savepoint = dialect == "postgresql" and conn.in_transaction()
+    try:
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            if savepoint:
+                cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                cursor.execute(prefix + statement, parameters)
+                return [" | ".join(str(col) for col in row) for row in cursor.fetchall()]
+            except Exception:
+                if savepoint:
+                    cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                raise
+            finally:
+                if savepoint:
+                    cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        finally:
+            cursor.close()
+    except Exception as e:
+        return [f"EXPLAIN failed: {e}"]
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("slow_query_start_time")
+    if not start_times:
+        return
+    elapsed_ms = (time.perf_counter() - start_times.pop()) * 1000
+    if elapsed_ms < SLOW_QUERY_THRESHOLD_MS:
+        return
+    try:
+        normalized = normalize_sql(statement)
+        stats = current_stats()
+        entry = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "fingerprint": fingerprint(normalized),
+            "sql": normalized,
+            "parameters": parameter_shape(parameters, executemany),
+            "duration_ms": round(elapsed_ms, 2),
+            "route": stats.route if stats is not None else None,
+            "plan": None if executemany else _explain(conn, statement, parameters),
+        }
+        _get_file_logger().info(json.dumps(entry))
+    except Exception as e:
+        logger.warning(f"Failed to record slow query: {e}")
+
+
+def _read_entries():
+    paths = sorted(glob.glob(SLOW_QUERY_LOG_PATH + ".*"), reverse=True) + [SLOW_QUERY_LOG_PATH]
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def aggregate_slow_queries(limit: int = 50) -> List[Dict[str, Any]]:
+    """Group logged slow queries by fingerprint, slowest total time first."""
+    groups: Dict[str, Dict[str, Any]] = {}
+    for entry in _read_entries():
+        group = groups.get(entry["fingerprint"])
+        if group is None:
+            group = groups[entry["fingerprint"]] = {
+                "fingerprint": entry["fingerprint"],
+                "sql": entry["sql"],
+                "parameters": entry["parameters"],
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "routes": set(),
+            }
+        group["count"] += 1
+        group["total_ms"] += entry["duration_ms"]
+        group["max_ms"] = max(group["max_ms"], entry["duration_ms"])
+        group["last_seen"] = entry["timestamp"]
+        if entry.get("route"):
+            group["routes"].add(entry["route"])
+        if entry.get("plan"):
+            group["plan"] = entry["plan"]
+
+    result = sorted(groups.values(), key=lambda g: g["total_ms"], reverse=True)[:limit]
+    for group in result:
+        group["routes"] = sorted(group["routes"])
+        group["avg_ms"] = round(group["total_ms"] / group["count"], 2)
+        group["total_ms"] = round(group["total_ms"], 2)
+    return result
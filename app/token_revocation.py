@@ -0,0 +1,166 @@
+"""Revocation list for issued JWTs.
+
+Revoked token ids (``jti``) are persisted in ``revoked_tokens`` and mirrored
+in memory as a Bloom filter in front of an exact set. Almost every request
+carries a token that was never revoked, and for those the Bloom filter
+answers with a few integer operations. Rows are kept only until the token
+would have expired anyway and are pruned by a scheduled job.
+"""
+import logging
+import math
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from . import models
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_BLOOM_CAPACITY = int(os.environ.get("REVOCATION_BLOOM_CAPACITY", "100000"))
+REVOCATION_BLOOM_ERROR_RATE = float(os.environ.get("REVOCATION_BLOOM_ERROR_RATE", "0.01"))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing of the cached str hash."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        h1 = hash(key)
+        h2 = (h1 >> 32) | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        h1 = hash(key)
+        h2 = (h1 >> 32) | 1
+        size = self.size
+        for i in range(self.hash_count):
+            pos = (h1 + i * h2) % size
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+class RevocationList:
+    """Revoked jti -> expiry of the token, behind a Bloom filter."""
+
+    def __init__(self, capacity: int = REVOCATION_BLOOM_CAPACITY, error_rate: float = REVOCATION_BLOOM_ERROR_RATE):
+        self.error_rate = error_rate
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._revoked: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        if jti is None or jti not in self._bloom:
+            return False
+        return jti in self._revoked
+
+    def add(self, jti: str, expires_at: datetime):
+        self.update([(jti, expires_at)])
+
+    def update(self, entries: Iterable[Tuple[str, datetime]]):
+        """Add revocations; entries already present are kept, so loads never drop concurrent additions."""
+        with self._lock:
+            revoked = self._revoked
+            for jti, expires_at in entries:
+                if jti in revoked:
+                    continue
+                revoked[jti] = expires_at
+                if self._bloom.count >= self._bloom.capacity:
+                    self._rebuild(revoked)
+                else:
+                    self._bloom.add(jti)
+
+    def prune(self, now: datetime):
+        """Forget revocations of tokens that have expired; they fail signature checks anyway."""
+        with self._lock:
+            self._rebuild({jti: expires_at for jti, expires_at in self._revoked.items() if expires_at >= now})
+
+    def _rebuild(self, revoked: Dict[str, datetime]):
+        bloom = BloomFilter(max(REVOCATION_BLOOM_CAPACITY, len(revoked) * 2), self.error_rate)
+        for jti in revoked:
+            bloom.add(jti)
+        # Publish the new entries before the filter so readers never see a filter hit without its entry
+        self._revoked = revoked
+        self._bloom = bloom
+
+    def __len__(self):
+        return len(self._revoked)
+
+
+revocation_list = RevocationList()
+
+
+def is_revoked(jti: Optional[str]) -> bool:
+    return revocation_list.is_revoked(jti)
+
+
+def revoke_token(db: Session, payload: dict) -> bool:
+    """Persist the revocation of a decoded token and mirror it in memory.
+
+    Returns False if the token was already revoked, including by a concurrent request
+    (the primary key on jti decides), so refresh rotation can reject the loser.
+    """
+    jti = payload.get("jti")
+    if jti is None:
+        return True
+    if revocation_list.is_revoked(jti):
+        return False
+    expires_at = datetime.utcfromtimestamp(payload["exp"])
+    db.add(models.RevokedToken(
+        jti=jti,
+        user_id=payload.get("uid"),
+        token_type=payload.get("type", "access"),
+        expires_at=expires_at,
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        revocation_list.add(jti, expires_at)
+        return False
+    revocation_list.add(jti, expires_at)
+    return True
+
+
+def load_revocations():
+    """Warm the in-memory revocation list from unexpired rows."""
+    db = SessionLocal()
+    try:
+        rows = db.query(models.RevokedToken.jti, models.RevokedToken.expires_at).filter(models.RevokedToken.expires_at >= datetime.utcnow()).all()
+        revocation_list.update(rows)
+        logger.info(f"Loaded {len(rows)} revoked tokens.")
+    finally:
+        db.close()
+
+
+def prune_revocations():
+    """Scheduled job: drop revocations of tokens that have expired anyway."""
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        deleted = db.query(models.RevokedToken).filter(models.RevokedToken.expires_at < now).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    # Pruned in place rather than reloaded, so revocations made meanwhile are kept
+    revocation_list.prune(now)
+    if deleted:
+        logger.info(f"Pruned {deleted} expired token revocations.")
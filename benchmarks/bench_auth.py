@@ -0,0 +1,66 @@
+"""Benchmark per-request authentication overhead.
+
+Compares resolving the current user from a bearer token:
+  * db:     legacy token (sub only), user loaded from the database every request
+  * cache:  legacy token served from the principal cache
+  * claims: token with signed claims, authorized without touching the database
+
+Run from the repository root:  python benchmarks/bench_auth.py [iterations]
+"""
+import os
+import sys
+import tempfile
+import time
+
+os.environ["APPDATA"] = tempfile.mkdtemp()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.security import HTTPAuthorizationCredentials
+from app.database import Base, engine, SessionLocal
+from app import models, auth
+
+
+def setup_user():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    org = models.Organization(name="Bench", email="bench@example.com")
+    db.add(org)
+    db.flush()
+    outlet = models.Outlet(organization_id=org.id, name="Main")
+    db.add(outlet)
+    db.flush()
+    user = models.User(organization_id=org.id, name="Bench", email="cashier@example.com",
+                       password="x", outlet_id=outlet.id, role="cashier")
+    db.add(user)
+    db.commit()
+    claims = auth.token_claims(user)
+    db.close()
+    return claims
+
+
+def measure(label, fn, iterations):
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<8} {elapsed / iterations * 1e6:10.1f} us/request")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    claims = setup_user()
+    legacy = HTTPAuthorizationCredentials(scheme="Bearer", credentials=auth.create_access_token({"sub": claims["sub"]}))
+    stateless = HTTPAuthorizationCredentials(scheme="Bearer", credentials=auth.create_access_token(claims))
+
+    def db_lookup():
+        auth.principal_cache.clear()
+        auth.get_current_user(legacy)
+
+    measure("db", db_lookup, iterations)
+    measure("cache", lambda: auth.get_current_user(legacy), iterations)
+    measure("claims", lambda: auth.get_current_user(stateless), iterations)
+
+
+if __name__ == "__main__":
+    main()
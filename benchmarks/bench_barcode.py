@@ -0,0 +1,107 @@
+"""Benchmark barcode scan lookup latency.
+
+Seeds a catalog, warms the barcode index and reports latency percentiles for
+random scans:
+  * index: BarcodeIndex lookup alone
+  * asgi:  GET /api/products/by-barcode/{code} driven straight through the ASGI
+           app (authentication, routing, serialization; no network or HTTP client)
+
+Target: p99 below 1 ms for the index and for the in-process request.
+
+Run from the repository root:  python benchmarks/bench_barcode.py [products] [scans]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ["APPDATA"] = tempfile.mkdtemp()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from app.database import Base, engine, SessionLocal
+from app import models, auth
+from app.barcode_index import barcode_index
+from app.routers import products
+
+
+def setup_catalog(count):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    org = models.Organization(name="Bench", email="bench@example.com")
+    db.add(org)
+    db.flush()
+    outlet = models.Outlet(organization_id=org.id, name="Main")
+    db.add(outlet)
+    db.flush()
+    user = models.User(organization_id=org.id, name="Bench", email="cashier@example.com",
+                       password="x", outlet_id=outlet.id, role="cashier")
+    db.add(user)
+    db.flush()
+    db.execute(models.Product.__table__.insert(), [
+        {"organization_id": org.id, "name": f"Product {i}", "barcode": f"{6000000000000 + i}",
+         "cost_price": 1.0, "selling_price": 1.5, "stock_quantity": 10, "tax_rate": 0.0}
+        for i in range(count)
+    ])
+    db.commit()
+    claims = auth.token_claims(user)
+    db.close()
+    return claims
+
+
+def percentiles(label, samples):
+    samples.sort()
+    pick = lambda p: samples[min(len(samples) - 1, int(len(samples) * p))] * 1e6
+    print(f"{label:<6} p50 {pick(0.50):8.1f} us   p99 {pick(0.99):8.1f} us   max {samples[-1] * 1e6:8.1f} us")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 30000
+    scans = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    claims = setup_catalog(count)
+    barcode_index.warm()
+    codes = [f"{6000000000000 + random.randrange(count)}" for _ in range(scans)]
+
+    samples = []
+    for code in codes:
+        start = time.perf_counter()
+        barcode_index.lookup(claims["org"], code)
+        samples.append(time.perf_counter() - start)
+    percentiles("index", samples)
+
+    app = FastAPI()
+    app.include_router(products.router, prefix="/api")
+    authorization = ("Bearer " + auth.create_access_token(claims)).encode()
+    samples = []
+    asyncio.run(scan_asgi(app, authorization, codes[:1], []))  # warm up
+    asyncio.run(scan_asgi(app, authorization, codes, samples))
+    percentiles("asgi", samples)
+
+
+async def scan_asgi(app, authorization, codes, samples):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    for code in codes:
+        status = []
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": f"/api/products/by-barcode/{code}", "raw_path": b"", "root_path": "",
+            "query_string": b"", "headers": [(b"authorization", authorization)],
+            "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 8000),
+        }
+        start = time.perf_counter()
+        await app(scope, receive, send)
+        samples.append(time.perf_counter() - start)
+        assert status == [200], status
+
+
+if __name__ == "__main__":
+    main()
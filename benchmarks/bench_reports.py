@@ -0,0 +1,121 @@
+"""Benchmark the sales report on a synthetic dataset.
+
+Seeds a year of sales (5 lines each) across outlets, cashiers and products,
+rebuilds the daily rollups and times GET /api/reports/sales-style queries:
+  * rollups: day/week/month buckets read from daily_*_sales
+  * sales:   the same report aggregated from sales and sale_items, for comparison
+  * hour:    hour buckets, which are always aggregated from sales
+
+Run from the repository root:  python benchmarks/bench_reports.py [lines]
+(default 5,000,000 sale lines; seeding that many takes a few minutes)
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+os.environ["APPDATA"] = tempfile.mkdtemp()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import Base, engine, SessionLocal
+from app import models
+from app.reports import _sales_query, sales_report
+from app.sales_rollup import rebuild_sales_rollups
+
+LINES_PER_SALE = 5
+OUTLETS = 5
+CASHIERS = 20
+PRODUCTS = 2000
+CATEGORIES = 40
+BATCH = 50000
+
+
+def seed(lines):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    org = models.Organization(name="Bench", email="bench@example.com")
+    db.add(org)
+    db.flush()
+    outlets = [models.Outlet(organization_id=org.id, name=f"Outlet {i}") for i in range(OUTLETS)]
+    categories = [models.Category(organization_id=org.id, name=f"Category {i}") for i in range(CATEGORIES)]
+    db.add_all(outlets + categories)
+    db.flush()
+    users = [models.User(organization_id=org.id, name=f"Cashier {i}", email=f"cashier{i}@example.com",
+                         password="x", outlet_id=outlets[i % OUTLETS].id, role="cashier") for i in range(CASHIERS)]
+    db.add_all(users)
+    db.flush()
+    db.execute(models.Product.__table__.insert(), [
+        {"organization_id": org.id, "name": f"Product {i}", "category_id": categories[i % CATEGORIES].id,
+         "cost_price": 1.0, "selling_price": 1.5, "stock_quantity": 10, "tax_rate": 0.0}
+        for i in range(PRODUCTS)
+    ])
+    product_ids = [id_ for (id_,) in db.query(models.Product.id)]
+    organization_id = org.id
+    cashiers = [(user.id, user.outlet_id) for user in users]
+    db.commit()
+
+    rng = random.Random(42)
+    start = datetime.combine(date.today() - timedelta(days=364), datetime.min.time())
+    sales, items = [], []
+    sale_id = 0
+    for _ in range(lines // LINES_PER_SALE):
+        sale_id += 1
+        user_id, outlet_id = cashiers[rng.randrange(CASHIERS)]
+        total = 0.0
+        for _ in range(LINES_PER_SALE):
+            quantity = rng.randint(1, 3)
+            items.append({"sale_id": sale_id, "product_id": rng.choice(product_ids), "quantity": quantity,
+                          "selling_price": 1.5, "cost_price": 1.0})
+            total += quantity * 1.5
+        sales.append({"id": sale_id, "organization_id": organization_id, "outlet_id": outlet_id, "user_id": user_id,
+                      "total_amount": total, "discount": 0.0, "tax": 0.0,
+                      "created_at": start + timedelta(seconds=rng.randrange(365 * 86400))})
+        if len(items) >= BATCH:
+            db.execute(models.Sale.__table__.insert(), sales)
+            db.execute(models.SaleItem.__table__.insert(), items)
+            sales, items = [], []
+    if sales:
+        db.execute(models.Sale.__table__.insert(), sales)
+        db.execute(models.SaleItem.__table__.insert(), items)
+    db.commit()
+    db.close()
+    return organization_id
+
+
+def timed(label, fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<34} {best * 1000:10.1f} ms   {len(rows):6d} rows")
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    start = time.perf_counter()
+    organization_id = seed(lines)
+    print(f"seeded {lines} sale lines in {time.perf_counter() - start:.1f}s")
+
+    db = SessionLocal()
+    start = time.perf_counter()
+    rebuild_sales_rollups(db, organization_id)
+    db.commit()
+    rollup_rows = db.query(models.DailyProductSales).count() + db.query(models.DailyCashierSales).count()
+    print(f"rebuilt rollups ({rollup_rows} rows) in {time.perf_counter() - start:.1f}s")
+
+    date_to = date.today()
+    date_from = date_to - timedelta(days=364)
+    for bucket, group_by in [("day", None), ("month", "outlet"), ("week", "cashier"), ("month", "category"), ("month", "product")]:
+        timed(f"rollups {bucket:<5} {group_by or '-'}", lambda: sales_report(db, organization_id, date_from, date_to, bucket, group_by))
+        timed(f"sales   {bucket:<5} {group_by or '-'}", lambda: db.execute(
+            _sales_query(organization_id, date_from, date_to, bucket, group_by, None)).all(), repeat=1)
+    timed("hour    (last 7 days)", lambda: sales_report(db, organization_id, date_to - timedelta(days=6), date_to, "hour"))
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,20 @@ from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from app.database import Base, engine, SessionLocal, central_engine, POSTGRESQL_DATABASE_URL, get_db_status
 from app import models
-from app.routers import users, outlets, products, suppliers, sales, auth, settings, cashier_shifts, purchases, payments, organizations, licenses, customers
+from app.routers import users, outlets, products, suppliers, sales, auth, settings, cashier_shifts, purchases, payments, organizations, licenses, customers, admin, exports, reports
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from app.sync import sync_data
+from app import passwords
+from app.token_revocation import load_revocations, prune_revocations
 from alembic import command
 from alembic.config import Config
 from alembic.script import ScriptDirectory
 from alembic.migration import MigrationContext
+from app.query_stats import QueryStatsMiddleware
+from app.idempotency import IdempotencyMiddleware, prune_idempotency_keys
+from app.product_search import setup_product_search
+from app.barcode_index import warm_barcode_index
 import logging
 
 def run_central_migrations():
@@ -53,15 +59,24 @@ async def lifespan(app: FastAPI):
     # Startup logic
     run_central_migrations()
     scheduler.add_job(sync_data, trigger=IntervalTrigger(minutes=30), id="sync_job")
+    load_revocations()
+    warm_barcode_index()
+    scheduler.add_job(prune_revocations, trigger=IntervalTrigger(hours=1), id="prune_revocations_job")
+    scheduler.add_job(prune_idempotency_keys, trigger=IntervalTrigger(hours=1), id="prune_idempotency_keys_job")
     scheduler.start()
     logging.info("Scheduler started: Sync job scheduled every 30 minutes.")
     yield
     # Shutdown logic
     scheduler.shutdown()
+    passwords.shutdown()
     logging.info("Scheduler shut down.")
 
 app = FastAPI(title="Inventory POS System", lifespan=lifespan)
 
+# Replay responses of retried POSTs that carry an Idempotency-Key. Added before
+# CORS so that CORS wraps it and replayed or rejected responses get its headers.
+app.add_middleware(IdempotencyMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -69,16 +84,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "Idempotent-Replayed"],
 )
 
+# Per-request SQL statement count, DB time and N+1 detection (Server-Timing header)
+app.add_middleware(QueryStatsMiddleware)
+
 # Create tables
 Base.metadata.create_all(bind=engine)
+setup_product_search(engine)
 
 # Create tables in central DB if PostgreSQL is available
 status = get_db_status()
 try:
     if status == "postgresql":
         Base.metadata.create_all(bind=central_engine)
+        setup_product_search(central_engine)
         logging.info("Central database tables created or verified.")
     else:
         logging.info(f"Central database not PostgreSQL ({status}): Tables not created.")
@@ -105,7 +126,13 @@ app.include_router(payments.router, prefix="/api", tags=["payments"])
 app.include_router(organizations.router, prefix="/api", tags=["organizations"])
 app.include_router(licenses.router, prefix="/api", tags=["licenses"])
 app.include_router(customers.router, prefix="/api/customers", tags=["customers"])
+app.include_router(admin.router, prefix="/api", tags=["admin"])
+app.include_router(exports.router, prefix="/api", tags=["exports"])
+app.include_router(reports.router, prefix="/api", tags=["reports"])
 
 if __name__ == "__main__":
+    import multiprocessing
     import uvicorn
+    # Required if PASSWORD_HASH_EXECUTOR=process in the frozen executable
+    multiprocessing.freeze_support()
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Recompute the daily sales rollups from sales and sale items.
+Run after importing or syncing sales that bypassed checkout, or to repair drift.
+"""
+
+from app.database import SessionLocal
+from app.sales_rollup import rebuild_sales_rollups
+
+def rebuild(organization_id: str = None):
+    """
+    Rebuild the rollups of one organization, or of all organizations.
+
+    Args:
+        organization_id: Organization to rebuild (optional, default all)
+    """
+    db = SessionLocal()
+    try:
+        rebuild_sales_rollups(db, organization_id)
+        db.commit()
+        print(f"Sales rollups rebuilt for {organization_id or 'all organizations'}")
+    except Exception as e:
+        db.rollback()
+        print(f"Error rebuilding sales rollups: {e}")
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    import sys
+
+    rebuild(sys.argv[1] if len(sys.argv) > 1 else None)
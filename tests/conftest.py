@@ -0,0 +1,83 @@
+import re
+import uuid
+
+import pytest
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+_DB_TIMING = re.compile(r'db;desc="(\d+) queries"')
+
+
+@pytest.fixture(scope="session")
+def auth_headers():
+    login_data = {
+        "email": "admin@inventory.com",  # Assuming admin user exists
+        "password": "admin123"
+    }
+    try:
+        response = requests.post(f"{BASE_URL}/api/auth/token", json=login_data)
+    except requests.ConnectionError:
+        pytest.skip(f"API server not running at {BASE_URL}")
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def me(auth_headers):
+    return requests.get(f"{BASE_URL}/api/auth/me", headers=auth_headers).json()
+
+
+@pytest.fixture
+def product_factory(auth_headers):
+    """Create a product, in a category and unit of its own, in the admin's organization."""
+    def create(**fields):
+        suffix = uuid.uuid4().hex[:8]
+        category = requests.post(f"{BASE_URL}/api/categories/", json={"name": f"Test {suffix}"}, headers=auth_headers).json()
+        unit = requests.post(f"{BASE_URL}/api/units/", json={"name": f"test-{suffix}", "symbol": "ts"}, headers=auth_headers).json()
+        response = requests.post(f"{BASE_URL}/api/products/", json={
+            "name": f"Test SKU {suffix}",
+            "barcode": f"TEST-{suffix}",
+            "category_id": category["id"],
+            "unit_id": unit["id"],
+            "cost_price": 1.0,
+            "selling_price": 2.0,
+            "stock_quantity": 10,
+            **fields,
+        }, headers=auth_headers)
+        assert response.status_code == 200, response.text
+        return response.json()
+    return create
+
+
+@pytest.fixture
+def sale_factory(me):
+    """Build the body of a sale of `quantity` units of `product` at its selling price, by the admin at their outlet."""
+    def build(product, quantity=1, **fields):
+        return {
+            "outlet_id": me["outlet_id"],
+            "user_id": me["id"],
+            "total_amount": product["selling_price"] * quantity,
+            "items": [{"product_id": product["id"], "quantity": quantity, "selling_price": product["selling_price"]}],
+            **fields,
+        }
+    return build
+
+
+@pytest.fixture
+def query_budget():
+    """Assert that a response was served with at most `max_queries` SQL statements.
+
+    Reads the statement count the QueryStatsMiddleware reports in the Server-Timing
+    header and fails if any statement was flagged as repeated (N+1).
+    """
+    def check(response, max_queries):
+        header = response.headers.get("Server-Timing", "")
+        match = _DB_TIMING.search(header)
+        assert match, f"No db timing in Server-Timing header: {header!r}"
+        count = int(match.group(1))
+        request = response.request
+        assert count <= max_queries, f"{request.method} {request.url} issued {count} queries (budget {max_queries})"
+        assert "db-repeat" not in header, f"{request.method} {request.url} repeated statements (N+1): {header}"
+        return count
+    return check
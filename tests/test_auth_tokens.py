@@ -0,0 +1,90 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+
+def _login():
+    response = requests.post(f"{BASE_URL}/api/auth/token", json={"email": "admin@inventory.com", "password": "admin123"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _bearer(tokens):
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+def _refresh(refresh_token):
+    return requests.post(f"{BASE_URL}/api/auth/refresh", params={"refresh_token": refresh_token})
+
+
+def test_logout_revokes_access_and_refresh_tokens():
+    tokens = _login()
+    assert requests.get(f"{BASE_URL}/api/auth/me", headers=_bearer(tokens)).status_code == 200
+
+    response = requests.post(f"{BASE_URL}/api/auth/logout", params={"refresh_token": tokens["refresh_token"]}, headers=_bearer(tokens))
+    assert response.status_code == 200, response.text
+
+    assert requests.get(f"{BASE_URL}/api/auth/me", headers=_bearer(tokens)).status_code == 401
+    assert _refresh(tokens["refresh_token"]).status_code == 401
+
+
+def test_logout_leaves_other_sessions_valid():
+    kept, dropped = _login(), _login()
+    assert requests.post(f"{BASE_URL}/api/auth/logout", headers=_bearer(dropped)).status_code == 200
+
+    assert requests.get(f"{BASE_URL}/api/auth/me", headers=_bearer(dropped)).status_code == 401
+    assert requests.get(f"{BASE_URL}/api/auth/me", headers=_bearer(kept)).status_code == 200
+
+
+def test_refresh_rotates_the_refresh_token():
+    tokens = _login()
+    first = _refresh(tokens["refresh_token"])
+    assert first.status_code == 200, first.text
+    rotated = first.json()
+    assert requests.get(f"{BASE_URL}/api/auth/me", headers=_bearer(rotated)).status_code == 200
+
+    reused = _refresh(tokens["refresh_token"])
+    assert reused.status_code == 401
+    assert _refresh(rotated["refresh_token"]).status_code == 200
+
+
+def test_concurrent_refreshes_with_one_token_succeed_once():
+    refresh_token = _login()["refresh_token"]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(lambda _: _refresh(refresh_token), range(8)))
+
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [200] + [401] * 7, statuses
+
+
+def test_registered_user_can_log_in(auth_headers):
+    email = f"register-{uuid.uuid4().hex[:8]}@example.com"
+    response = requests.post(f"{BASE_URL}/api/auth/register", json={"name": "Registered", "email": email, "password": "register-pass"})
+    assert response.status_code == 200, response.text
+    user = response.json()
+    assert "password" not in user
+
+    duplicate = requests.post(f"{BASE_URL}/api/auth/register", json={"name": "Again", "email": email, "password": "register-pass"})
+    assert duplicate.status_code == 400
+
+    login = requests.post(f"{BASE_URL}/api/auth/token", json={"email": email, "password": "register-pass"})
+    assert login.status_code == 200, login.text
+    requests.delete(f"{BASE_URL}/api/users/{user['id']}", headers=auth_headers)
+
+
+def test_barcode_lookup_authorizes_like_other_routes(product_factory):
+    product = product_factory()
+    tokens = _login()
+    url = f"{BASE_URL}/api/products/by-barcode/{product['barcode']}"
+
+    found = requests.get(url, headers=_bearer(tokens))
+    assert found.status_code == 200, found.text
+    assert found.json()["id"] == product["id"]
+    assert requests.get(url).status_code in (401, 403)
+    assert requests.get(url, headers={"Authorization": "Bearer not-a-token"}).status_code == 401
+
+    assert requests.post(f"{BASE_URL}/api/auth/logout", headers=_bearer(tokens)).status_code == 200
+    assert requests.get(url, headers=_bearer(tokens)).status_code == 401
@@ -0,0 +1,16 @@
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+
+def test_product_list_etag_changes_when_a_sale_takes_stock(auth_headers, product_factory, sale_factory):
+    product = product_factory()
+    first = requests.get(f"{BASE_URL}/api/products/", headers=auth_headers)
+    etag = first.headers["ETag"]
+    assert requests.get(f"{BASE_URL}/api/products/", headers={**auth_headers, "If-None-Match": etag}).status_code == 304
+
+    assert requests.post(f"{BASE_URL}/api/sales/", json=sale_factory(product, 3), headers=auth_headers).status_code == 200
+    after = requests.get(f"{BASE_URL}/api/products/", params={"limit": 1000}, headers={**auth_headers, "If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != etag
+    assert next(row for row in after.json() if row["id"] == product["id"])["stock_quantity"] == 7
@@ -0,0 +1,28 @@
+import json
+import uuid
+
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+
+def test_categories_created_by_import_are_usable_at_once(auth_headers, product_factory):
+    template = product_factory()
+    suffix = uuid.uuid4().hex[:8]
+    probe = requests.post(f"{BASE_URL}/api/categories/", json={"name": f"Probe {suffix}"}, headers=auth_headers).json()
+    next_id = probe["id"] + 1
+    product = {"name": f"Imported {suffix}", "cost_price": 1.0, "selling_price": 2.0, "unit_id": template["unit_id"]}
+
+    # Looked up (and not found) before the import creates it
+    missing = requests.post(f"{BASE_URL}/api/products/", json={**product, "category_id": next_id}, headers=auth_headers)
+    assert missing.status_code == 400
+
+    csv = f"name,barcode,category,unit_id,cost_price,selling_price\nImport {suffix},IMPORT-{suffix},Imported {suffix},{template['unit_id']},1,2\n"
+    response = requests.post(f"{BASE_URL}/api/products/import", files={"file": ("catalog.csv", csv)}, headers=auth_headers)
+    summary = json.loads(response.text.strip().splitlines()[-1])
+    assert summary["done"] and summary["created"] == 1, summary
+    category = requests.get(f"{BASE_URL}/api/categories/{next_id}", headers=auth_headers).json()
+    assert category["name"] == f"Imported {suffix}"
+
+    created = requests.post(f"{BASE_URL}/api/products/", json={**product, "category_id": next_id}, headers=auth_headers)
+    assert created.status_code == 200, created.text
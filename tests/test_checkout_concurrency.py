@@ -0,0 +1,29 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+CONCURRENT_CHECKOUTS = 50
+INITIAL_STOCK = 20
+
+
+def test_concurrent_checkouts_never_oversell(auth_headers, product_factory, sale_factory):
+    product = product_factory(stock_quantity=INITIAL_STOCK)
+    sale = sale_factory(product)
+
+    def checkout(_):
+        return requests.post(f"{BASE_URL}/api/sales/", json=sale, headers=auth_headers).status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENT_CHECKOUTS) as pool:
+        statuses = list(pool.map(checkout, range(CONCURRENT_CHECKOUTS)))
+    elapsed = time.perf_counter() - started
+
+    stock = requests.get(f"{BASE_URL}/api/products/{product['id']}", headers=auth_headers).json()["stock_quantity"]
+    print(f"{CONCURRENT_CHECKOUTS} concurrent checkouts in {elapsed:.2f}s ({CONCURRENT_CHECKOUTS / elapsed:.1f} TPS), "
+          f"{statuses.count(200)} sold, {statuses.count(409)} rejected, stock left {stock}")
+    assert set(statuses) <= {200, 409}, statuses
+    assert statuses.count(200) == INITIAL_STOCK
+    assert stock == 0
@@ -0,0 +1,56 @@
+import uuid
+
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+
+def test_retried_sale_is_recorded_once(auth_headers, product_factory, sale_factory):
+    product = product_factory()
+    sale = sale_factory(product)
+    headers = {**auth_headers, "Idempotency-Key": uuid.uuid4().hex}
+
+    first = requests.post(f"{BASE_URL}/api/sales/", json=sale, headers=headers)
+    retry = requests.post(f"{BASE_URL}/api/sales/", json=sale, headers=headers)
+    assert first.status_code == 200, first.text
+    assert retry.status_code == 200
+    assert retry.headers.get("Idempotent-Replayed") == "true"
+    assert retry.json() == first.json()
+
+    stock = requests.get(f"{BASE_URL}/api/products/{product['id']}", headers=auth_headers).json()["stock_quantity"]
+    assert stock == 9
+
+
+def test_reused_key_with_different_body_is_rejected(auth_headers, product_factory, sale_factory):
+    sale = sale_factory(product_factory())
+    headers = {**auth_headers, "Idempotency-Key": uuid.uuid4().hex}
+
+    assert requests.post(f"{BASE_URL}/api/sales/", json=sale, headers=headers).status_code == 200
+    response = requests.post(f"{BASE_URL}/api/sales/", json={**sale, "total_amount": 4.0}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_replayed_and_rejected_responses_carry_cors_headers(auth_headers, product_factory, sale_factory):
+    sale = sale_factory(product_factory())
+    headers = {**auth_headers, "Idempotency-Key": uuid.uuid4().hex, "Origin": "http://till.example.com"}
+
+    first = requests.post(f"{BASE_URL}/api/sales/", json=sale, headers=headers)
+    retry = requests.post(f"{BASE_URL}/api/sales/", json=sale, headers=headers)
+    conflict = requests.post(f"{BASE_URL}/api/sales/", json={**sale, "total_amount": 4.0}, headers=headers)
+    for response in (first, retry, conflict):
+        assert response.headers.get("Access-Control-Allow-Origin"), response.headers
+    assert retry.headers.get("Idempotent-Replayed") == "true"
+    assert "Idempotent-Replayed" in retry.headers.get("Access-Control-Expose-Headers", "")
+    assert conflict.status_code == 422
+
+
+def test_logged_out_token_gets_no_replay(product_factory, sale_factory):
+    login = requests.post(f"{BASE_URL}/api/auth/token", json={"email": "admin@inventory.com", "password": "admin123"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}", "Idempotency-Key": uuid.uuid4().hex}
+    sale = sale_factory(product_factory())
+
+    assert requests.post(f"{BASE_URL}/api/sales/", json=sale, headers=headers).status_code == 200
+    assert requests.post(f"{BASE_URL}/api/auth/logout", headers=headers).status_code == 200
+    retry = requests.post(f"{BASE_URL}/api/sales/", json=sale, headers=headers)
+    assert retry.status_code == 401
+    assert "Idempotent-Replayed" not in retry.headers
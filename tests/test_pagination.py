@@ -0,0 +1,33 @@
+import base64
+import json
+
+import pytest
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+
+def _cursor(key):
+    return base64.urlsafe_b64encode(json.dumps([key]).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def test_cursor_walks_pages_without_overlap(auth_headers, product_factory):
+    for _ in range(3):
+        product_factory()
+    first = requests.get(f"{BASE_URL}/api/products/", params={"limit": 2}, headers=auth_headers)
+    assert first.status_code == 200
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = requests.get(f"{BASE_URL}/api/products/", params={"limit": 2, "cursor": cursor}, headers=auth_headers)
+    assert second.status_code == 200
+    first_ids = {product["id"] for product in first.json()}
+    second_ids = {product["id"] for product in second.json()}
+    assert second_ids and not first_ids & second_ids
+    assert min(second_ids) > max(first_ids)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", _cursor("1"), _cursor(1.5), _cursor(True), _cursor(None), _cursor([1])])
+def test_malformed_cursor_is_rejected(auth_headers, cursor):
+    response = requests.get(f"{BASE_URL}/api/products/", params={"cursor": cursor}, headers=auth_headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
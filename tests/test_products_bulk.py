@@ -0,0 +1,48 @@
+import uuid
+
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+
+def _rows(product, count):
+    return [{
+        "name": f"Bulk {uuid.uuid4().hex[:8]}",
+        "barcode": f"BULK-{uuid.uuid4().hex[:12]}",
+        "category_id": product["category_id"],
+        "unit_id": product["unit_id"],
+        "cost_price": 1.0,
+        "selling_price": 2.0,
+    } for _ in range(count)]
+
+
+def test_best_effort_reports_failed_rows_with_207(auth_headers, product_factory):
+    product = product_factory()
+    rows = _rows(product, 2) + [{**_rows(product, 1)[0], "barcode": product["barcode"]}]
+
+    response = requests.post(f"{BASE_URL}/api/products/bulk/", params={"mode": "best_effort"}, json=rows, headers=auth_headers)
+    assert response.status_code == 207, response.text
+    result = response.json()
+    assert result["created_count"] == 2
+    assert [created["barcode"] for created in result["created"]] == [row["barcode"] for row in rows[:2]]
+    assert [error["index"] for error in result["errors"]] == [2]
+
+    found = requests.get(f"{BASE_URL}/api/products/by-barcode/{rows[0]['barcode']}", headers=auth_headers)
+    assert found.status_code == 200
+
+
+def test_best_effort_without_errors_returns_the_products(auth_headers, product_factory):
+    rows = _rows(product_factory(), 2)
+    response = requests.post(f"{BASE_URL}/api/products/bulk/", params={"mode": "best_effort"}, json=rows, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert [created["barcode"] for created in response.json()] == [row["barcode"] for row in rows]
+
+
+def test_all_or_nothing_creates_nothing_on_error(auth_headers, product_factory):
+    product = product_factory()
+    rows = _rows(product, 1) + [{**_rows(product, 1)[0], "unit_id": 10 ** 9}]
+
+    response = requests.post(f"{BASE_URL}/api/products/bulk/", json=rows, headers=auth_headers)
+    assert response.status_code == 400
+    assert response.json()["detail"]["created_count"] == 0
+    assert requests.get(f"{BASE_URL}/api/products/by-barcode/{rows[0]['barcode']}", headers=auth_headers).status_code == 404
@@ -0,0 +1,72 @@
+import uuid
+
+import pytest
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+# (path, max SQL statements per request including authentication)
+ENDPOINT_BUDGETS = [
+    ("/api/categories/", 3),
+    ("/api/units/", 2),
+    ("/api/products/", 3),
+    ("/api/customers/", 3),
+    ("/api/suppliers/", 3),
+    ("/api/outlets/", 3),
+    ("/api/cashier-stations/", 3),
+    ("/api/cashier-shifts/", 3),
+    ("/api/payments/", 3),
+    ("/api/sales/", 3),
+    ("/api/purchases/", 2),
+]
+
+
+@pytest.mark.parametrize("path,max_queries", ENDPOINT_BUDGETS)
+def test_list_endpoint_query_budget(path, max_queries, auth_headers, query_budget):
+    response = requests.get(f"{BASE_URL}{path}", headers=auth_headers)
+    assert response.status_code == 200
+    query_budget(response, max_queries)
+
+
+def _seed_sales_and_purchases(headers, me, product, sale, count=5):
+    sale = {**sale, "total_amount": sale["total_amount"] * 2, "items": sale["items"] * 2}
+    purchase = {"outlet_id": me["outlet_id"], "total_amount": 2.0,
+                "items": [{"product_id": product["id"], "quantity": 1, "cost_price": 1.0}] * 2}
+    sale_ids = [requests.post(f"{BASE_URL}/api/sales/", json=sale, headers=headers).json()["id"] for _ in range(count)]
+    purchase_ids = [requests.post(f"{BASE_URL}/api/purchases/", json=purchase, headers=headers).json()["id"] for _ in range(count)]
+    return sale_ids, purchase_ids
+
+
+def test_nested_responses_are_eager_loaded(auth_headers, query_budget, me, product_factory, sale_factory):
+    """Sales and purchases serialize their items; the budget must not grow with the page size."""
+    product = product_factory(stock_quantity=100)
+    sale_ids, purchase_ids = _seed_sales_and_purchases(auth_headers, me, product, sale_factory(product))
+    for path, max_queries in [
+        ("/api/sales/", 3),
+        (f"/api/sales/{sale_ids[0]}", 3),
+        ("/api/purchases/", 2),
+        (f"/api/purchases/{purchase_ids[0]}", 2),
+    ]:
+        response = requests.get(f"{BASE_URL}{path}", headers=auth_headers)
+        assert response.status_code == 200, response.text
+        query_budget(response, max_queries)
+
+
+def test_invoice_reprint_is_cached(auth_headers, query_budget, me, product_factory, sale_factory):
+    template = requests.post(f"{BASE_URL}/api/invoice-templates/", json={
+        "outlet_id": me["outlet_id"], "name": f"Budget {uuid.uuid4().hex[:8]}", "header_text": "Thanks", "is_default": True,
+    }, headers=auth_headers).json()
+    sale = requests.post(f"{BASE_URL}/api/sales/", json=sale_factory(product_factory()), headers=auth_headers)
+    assert sale.status_code == 200, sale.text
+    sale_id = sale.json()["id"]
+    first = requests.get(f"{BASE_URL}/api/sales/{sale_id}/invoice", headers=auth_headers)
+    assert first.status_code == 200, first.text
+    reprint = requests.get(f"{BASE_URL}/api/sales/{sale_id}/invoice", headers=auth_headers)
+    query_budget(reprint, 0)
+    assert reprint.json() == first.json()
+
+    requests.put(f"{BASE_URL}/api/invoice-templates/{template['id']}", json={"header_text": "Come again"}, headers=auth_headers)
+    requests.put(f"{BASE_URL}/api/sales/{sale_id}", json={"discount": 1.0}, headers=auth_headers)
+    invoice = requests.get(f"{BASE_URL}/api/sales/{sale_id}/invoice", headers=auth_headers).json()
+    assert invoice["template"]["header_text"] == "Come again"
+    assert invoice["discount"] == 1.0
@@ -0,0 +1,102 @@
+from datetime import datetime
+
+import pytest
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+
+@pytest.fixture
+def sell(auth_headers, product_factory, sale_factory):
+    """Sell `quantity` of a new product at 2.5 with a discount of 1 and tax of 0.5."""
+    def create(quantity=2):
+        product = product_factory(selling_price=2.5)
+        sale = requests.post(f"{BASE_URL}/api/sales/", json=sale_factory(product, quantity, discount=1.0, tax=0.5), headers=auth_headers)
+        assert sale.status_code == 200, sale.text
+        return product
+    return create
+
+
+def test_sales_report_by_product_reads_rollups(auth_headers, query_budget, sell):
+    product = sell()
+    response = requests.get(f"{BASE_URL}/api/reports/sales", params={"group_by": "product"}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    query_budget(response, 2)
+    report = response.json()
+    assert report["source"] == "rollups"
+    row = next(row for row in report["rows"] if row["key"] == product["id"])
+    assert row["bucket"] == datetime.utcnow().date().isoformat()
+    assert row["quantity"] == 2
+    assert row["revenue"] == 5.0
+    assert row["cost"] == 2.0
+    assert abs(row["net_total"] - 4.5) < 1e-9
+
+
+def test_sales_report_by_category_and_hour(auth_headers, sell):
+    product = sell(quantity=3)
+    category = requests.get(f"{BASE_URL}/api/categories/{product['category_id']}", headers=auth_headers).json()
+    by_category = requests.get(f"{BASE_URL}/api/reports/sales", params={"group_by": "category", "bucket": "month"}, headers=auth_headers).json()
+    row = next(row for row in by_category["rows"] if row["key"] == category["id"])
+    assert row["label"] == category["name"]
+    assert row["quantity"] == 3
+
+    by_hour = requests.get(f"{BASE_URL}/api/reports/sales", params={"bucket": "hour"}, headers=auth_headers).json()
+    assert by_hour["source"] == "sales"
+    assert by_hour["rows"][-1]["bucket"].endswith(":00:00")
+
+
+def test_sales_report_rejects_unknown_bucket(auth_headers):
+    response = requests.get(f"{BASE_URL}/api/reports/sales", params={"bucket": "year"}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_product_abc_report(auth_headers, query_budget, sell):
+    product = sell(quantity=4)
+    response = requests.get(f"{BASE_URL}/api/reports/products/abc", params={"category_id": product["category_id"]}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    query_budget(response, 2)
+    report = response.json()
+    assert report["class_counts"] == {"A": 1, "B": 0, "C": 0}
+    row = report["products"][0]
+    assert row["product_id"] == product["id"]
+    assert row["abc_class"] == "A"
+    assert row["cumulative_share"] == 1.0
+    assert abs(row["velocity"] - 4 / report["days"]) < 1e-9
+    assert row["stock_quantity"] == 6
+    assert abs(row["sell_through"] - 0.4) < 1e-9
+
+
+def test_product_abc_report_rejects_bad_shares(auth_headers):
+    response = requests.get(f"{BASE_URL}/api/reports/products/abc", params={"a_share": 0.9, "b_share": 0.5}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_gross_profit_report_by_product(auth_headers, query_budget, sell):
+    product = sell(quantity=2)
+    response = requests.get(f"{BASE_URL}/api/reports/gross-profit", params={"group_by": "product", "bucket": "day"}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    query_budget(response, 2)
+    row = next(row for row in response.json()["rows"] if row["key"] == product["id"])
+    assert row["revenue"] == 5.0
+    assert row["gross_profit"] == 3.0
+    assert abs(row["margin"] - 60.0) < 1e-9
+
+
+def test_product_rows_add_up_to_net_total_when_lines_differ_from_total(auth_headers, product_factory, sale_factory):
+    first, second = product_factory(selling_price=3.0), product_factory(selling_price=1.0)
+    sale = sale_factory(first, 1, total_amount=6.0, discount=1.0, tax=0.5)
+    sale["items"].append({"product_id": second["id"], "quantity": 1, "selling_price": 1.0})
+    response = requests.post(f"{BASE_URL}/api/sales/", json=sale, headers=auth_headers)
+    assert response.status_code == 200, response.text
+
+    by_product = requests.get(f"{BASE_URL}/api/reports/sales", params={"group_by": "product"}, headers=auth_headers).json()["rows"]
+    rows = {row["key"]: row for row in by_product if row["key"] in (first["id"], second["id"])}
+    # Lines are 3 + 1 = 4 against a total of 6: each line gets its share of the total, discount and tax
+    assert abs(rows[first["id"]]["revenue"] - 4.5) < 1e-9
+    assert abs(rows[second["id"]]["revenue"] - 1.5) < 1e-9
+    assert abs(sum(row["net_total"] for row in rows.values()) - 5.5) < 1e-9
+
+    totals = requests.get(f"{BASE_URL}/api/reports/sales", headers=auth_headers).json()["rows"]
+    assert abs(sum(row["net_total"] for row in by_product) - sum(row["net_total"] for row in totals)) < 1e-6
+    hourly = requests.get(f"{BASE_URL}/api/reports/sales", params={"bucket": "hour", "group_by": "product"}, headers=auth_headers).json()["rows"]
+    assert abs(sum(row["net_total"] for row in hourly) - sum(row["net_total"] for row in totals)) < 1e-6
@@ -0,0 +1,72 @@
+import uuid
+from datetime import datetime, timedelta
+
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+
+def _upload(headers, sales):
+    response = requests.post(f"{BASE_URL}/api/sales/batch", json={"sales": sales}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _stock(headers, product):
+    return requests.get(f"{BASE_URL}/api/products/{product['id']}", headers=headers).json()["stock_quantity"]
+
+
+def test_duplicates_within_and_across_batches(auth_headers, product_factory, sale_factory):
+    product = product_factory()
+    first, second = uuid.uuid4().hex, uuid.uuid4().hex
+    sale = sale_factory(product)
+
+    batch = _upload(auth_headers, [
+        {**sale, "idempotency_key": first},
+        {**sale, "idempotency_key": first},
+        {**sale, "idempotency_key": second},
+    ])
+    assert [result["status"] for result in batch["results"]] == ["created", "duplicate", "created"]
+    assert [result["index"] for result in batch["results"]] == [0, 1, 2]
+    assert batch["results"][1]["sale_id"] == batch["results"][0]["sale_id"]
+    assert (batch["created"], batch["duplicates"], batch["failed"]) == (2, 1, 0)
+
+    retry = _upload(auth_headers, [{**sale, "idempotency_key": second}, {**sale, "idempotency_key": first}])
+    assert [result["status"] for result in retry["results"]] == ["duplicate", "duplicate"]
+    assert [result["sale_id"] for result in retry["results"]] == [batch["results"][2]["sale_id"], batch["results"][0]["sale_id"]]
+    assert _stock(auth_headers, product) == 8
+
+
+def test_shortage_part_way_records_every_sale_that_fits(auth_headers, product_factory, sale_factory):
+    product = product_factory(stock_quantity=3)
+    sales = [{**sale_factory(product, quantity), "idempotency_key": uuid.uuid4().hex} for quantity in (1, 3, 2)]
+    sales.insert(1, {**sale_factory(product), "idempotency_key": uuid.uuid4().hex, "customer_id": 999999})
+
+    batch = _upload(auth_headers, sales)
+    results = batch["results"]
+    assert [result["status"] for result in results] == ["created", "error", "error", "created"]
+    assert results[1]["status_code"] == 404
+    assert results[2]["status_code"] == 409
+    assert results[2]["idempotency_key"] == sales[2]["idempotency_key"]
+    assert (batch["created"], batch["duplicates"], batch["failed"]) == (2, 0, 2)
+    assert _stock(auth_headers, product) == 0
+    for result, sale in zip(results, sales):
+        if result["status"] == "created":
+            recorded = requests.get(f"{BASE_URL}/api/sales/{result['sale_id']}", headers=auth_headers).json()
+            assert recorded["items"][0]["quantity"] == sale["items"][0]["quantity"]
+
+
+def test_offline_sales_keep_the_till_time(auth_headers, product_factory, sale_factory):
+    product = product_factory()
+    made_at = (datetime.utcnow() - timedelta(days=3)).replace(microsecond=0)
+    batch = _upload(auth_headers, [
+        {**sale_factory(product), "idempotency_key": uuid.uuid4().hex, "created_at": made_at.isoformat()},
+        {**sale_factory(product), "idempotency_key": uuid.uuid4().hex, "created_at": (datetime.utcnow() + timedelta(hours=1)).isoformat()},
+    ])
+    assert [result["status"] for result in batch["results"]] == ["created", "error"]
+    assert batch["results"][1]["status_code"] == 400
+
+    sale = requests.get(f"{BASE_URL}/api/sales/{batch['results'][0]['sale_id']}", headers=auth_headers).json()
+    assert sale["created_at"].startswith(made_at.date().isoformat())
+    report = requests.get(f"{BASE_URL}/api/reports/sales", params={"group_by": "product"}, headers=auth_headers).json()
+    assert [row["bucket"] for row in report["rows"] if row["key"] == product["id"]] == [made_at.date().isoformat()]
@@ -0,0 +1,44 @@
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+
+def _stock(headers, product):
+    return requests.get(f"{BASE_URL}/api/products/{product['id']}", headers=headers).json()["stock_quantity"]
+
+
+def test_voiding_a_sale_restores_stock(auth_headers, product_factory, sale_factory):
+    product = product_factory()
+    sale = requests.post(f"{BASE_URL}/api/sales/", json=sale_factory(product, 3), headers=auth_headers).json()
+    assert _stock(auth_headers, product) == 7
+
+    assert requests.delete(f"{BASE_URL}/api/sales/{sale['id']}", headers=auth_headers).status_code == 200
+    assert _stock(auth_headers, product) == 10
+
+
+def test_editing_sale_lines_moves_stock(auth_headers, product_factory, sale_factory):
+    product, other = product_factory(), product_factory()
+    sale = requests.post(f"{BASE_URL}/api/sales/", json=sale_factory(product, 3), headers=auth_headers).json()
+    item_id = sale["items"][0]["id"]
+
+    response = requests.put(f"{BASE_URL}/api/sale-items/{item_id}", json={"quantity": 5}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert _stock(auth_headers, product) == 5
+
+    response = requests.put(f"{BASE_URL}/api/sale-items/{item_id}", json={"product_id": other["id"], "quantity": 2}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert (_stock(auth_headers, product), _stock(auth_headers, other)) == (10, 8)
+
+    assert requests.delete(f"{BASE_URL}/api/sale-items/{item_id}", headers=auth_headers).status_code == 200
+    assert _stock(auth_headers, other) == 10
+
+
+def test_editing_a_line_beyond_stock_is_rejected(auth_headers, product_factory, sale_factory):
+    product = product_factory()
+    sale = requests.post(f"{BASE_URL}/api/sales/", json=sale_factory(product, 3), headers=auth_headers).json()
+
+    response = requests.put(f"{BASE_URL}/api/sale-items/{sale['items'][0]['id']}", json={"quantity": 20}, headers=auth_headers)
+    assert response.status_code == 409
+    assert _stock(auth_headers, product) == 7
+    items = requests.get(f"{BASE_URL}/api/sales/{sale['id']}", headers=auth_headers).json()["items"]
+    assert items[0]["quantity"] == 3
@@ -0,0 +1,57 @@
+import uuid
+
+import pytest
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+
+@pytest.fixture
+def user_session(auth_headers, me):
+    """Create a cashier in the admin's organization and log in as them; yields (user, their headers)."""
+    suffix = uuid.uuid4().hex[:8]
+    email, password = f"cashier-{suffix}@example.com", "cashier-pass"
+    response = requests.post(f"{BASE_URL}/api/users/", json={
+        "name": f"Cashier {suffix}",
+        "email": email,
+        "password": password,
+        "outlet_id": me["outlet_id"],
+    }, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    user = response.json()
+    login = requests.post(f"{BASE_URL}/api/auth/token", json={"email": email, "password": password})
+    assert login.status_code == 200, login.text
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    assert requests.get(f"{BASE_URL}/api/auth/me", headers=headers).status_code == 200
+    yield user, headers
+    requests.delete(f"{BASE_URL}/api/users/{user['id']}", headers=auth_headers)
+
+
+@pytest.mark.parametrize("change", [
+    {"role": "manager"},
+    {"status": "suspended"},
+    {"email": f"moved-{uuid.uuid4().hex[:8]}@example.com"},
+])
+def test_changing_authorization_fields_rejects_old_tokens(auth_headers, user_session, change):
+    user, headers = user_session
+    response = requests.put(f"{BASE_URL}/api/users/{user['id']}", json=change, headers=auth_headers)
+    assert response.status_code == 200, response.text
+
+    assert requests.get(f"{BASE_URL}/api/auth/me", headers=headers).status_code == 401
+
+
+def test_renaming_keeps_tokens_valid(auth_headers, user_session):
+    user, headers = user_session
+    response = requests.put(f"{BASE_URL}/api/users/{user['id']}", json={"name": "Renamed"}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+
+    me = requests.get(f"{BASE_URL}/api/auth/me", headers=headers)
+    assert me.status_code == 200
+    assert me.json()["name"] == "Renamed"
+
+
+def test_deleted_user_tokens_are_rejected(auth_headers, user_session):
+    user, headers = user_session
+    assert requests.delete(f"{BASE_URL}/api/users/{user['id']}", headers=auth_headers).status_code == 200
+
+    assert requests.get(f"{BASE_URL}/api/auth/me", headers=headers).status_code == 401